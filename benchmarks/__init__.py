@@ -0,0 +1 @@
+"""Headless benchmarks for the core services; run with `python -m benchmarks.run`."""
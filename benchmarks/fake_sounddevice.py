@@ -0,0 +1,94 @@
+"""Stand-in for the `sounddevice` module so capture can be benchmarked without PortAudio or a microphone.
+
+install() registers it as `sounddevice`; InputStream then feeds the callback synthetic blocks from a thread, paced
+at `speed` times real time (0 = as fast as possible), and records how long each callback took.
+"""
+import sys
+import threading
+import time
+
+import numpy as np
+
+
+class CallbackStop(Exception):
+    pass
+
+
+class CallbackAbort(Exception):
+    pass
+
+
+class default:
+    samplerate = 44100
+    blocksize = 512
+    speed = 1.0 # Multiple of real time that blocks are delivered at; set by the benchmark
+    seed = 0
+
+
+def query_devices(device=None, kind=None):
+    devices = [{"name": "Fake input", "max_input_channels": 1, "max_output_channels": 0, "default_samplerate": default.samplerate}]
+    return devices[0] if kind or device is not None else devices
+
+
+class InputStream:
+    last = None # Most recently closed stream, for inspecting its callback timings
+
+    def __init__(self, samplerate=None, blocksize=None, channels=1, dtype='float32', callback=None, **_kwargs):
+        self.samplerate = samplerate or default.samplerate
+        self.blocksize = blocksize or default.blocksize
+        self.channels = channels
+        self.dtype = dtype
+        self.callback = callback
+        self.callback_seconds = [] # Wall time spent inside each callback
+        self.late_blocks = 0 # Blocks delivered after their real-time deadline because a callback overran
+        self.active = False
+        self._thread = None
+
+    def _blocks(self):
+        # Pre-generate one second of a noisy tone and cycle through it so synthesis never shows up in the timings.
+        rng = np.random.default_rng(default.seed)
+        t = np.arange(self.samplerate) / self.samplerate
+        tone = (0.3 * np.sin(2 * np.pi * 220 * t) + 0.05 * rng.standard_normal(self.samplerate)).astype(self.dtype)
+        tone = np.repeat(tone[:, None], self.channels, axis=1)
+        while True:
+            for start in range(0, self.samplerate - self.blocksize + 1, self.blocksize):
+                yield tone[start:start + self.blocksize]
+
+    def _run(self):
+        interval = self.blocksize / self.samplerate / default.speed if default.speed else 0.0
+        deadline = time.perf_counter()
+        for block in self._blocks():
+            if not self.active: return
+            start = time.perf_counter()
+            try: self.callback(block.copy(), self.blocksize, None, None)
+            except (CallbackStop, CallbackAbort): self.active = False; return
+            finally: self.callback_seconds.append(time.perf_counter() - start)
+            if not interval: continue
+            deadline += interval
+            delay = deadline - time.perf_counter()
+            if delay > 0: time.sleep(delay)
+            else: self.late_blocks += 1
+
+    def start(self):
+        self.active = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.active = False
+        if self._thread: self._thread.join()
+        InputStream.last = self
+
+    close = abort = stop
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def install():
+    sys.modules["sounddevice"] = sys.modules[__name__]
+    return sys.modules[__name__]
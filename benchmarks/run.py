@@ -0,0 +1,297 @@
+"""Reproducible benchmarks for search, timeline, dashboard, export and capture, run headlessly on synthetic journals.
+
+    python -m benchmarks.run --sizes 10000 100000 1000000 --audio-fraction 0.2 --output results.json
+    python -m benchmarks.run --sizes 10000 --compare results.json
+
+Journals are generated deterministically from (size, audio fraction, seed) and cached in --workdir, so runs on
+different versions of the code measure the same data. Each case reports median/p95 wall time over --repeat runs
+and the Python peak allocation of one extra traced run; the process's peak RSS is recorded once at the end.
+Capture goes through core.audio.record_stream against a fake `sounddevice` that plays a synthetic signal, and the
+record.vad_* cases report how much of a synthetic speech-in-background-noise signal the voice-activity gate keeps.
+"""
+import argparse
+import datetime
+import fnmatch
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+from . import fake_sounddevice
+
+fake_sounddevice.install() # Before anything can import the real module
+
+from legacy_recorder.core import (EXPORT_WRITERS, EntryStore, LevelMeter, VoiceActivityGate, audio_codec_available, open_audio_writer,
+                                  record_stream, run_export)
+
+try: import resource # Not available on Windows
+except ImportError: resource = None
+
+WORDS = ("today family prayer grateful gratitude lord morning evening children wisdom lesson learned work church "
+         "friend mother father patience forgive hope strength quiet walk garden rain remember promise health home").split()
+TAGS = ("prayer", "family", "wisdom", "lessons", "gratitude", "work", "health", "travel")
+RARE_WORD = "zephyrine" # Appears in about one entry in ten thousand
+LAST_DAY = datetime.date(2025, 12, 31)
+YEARS = 10
+
+
+def generate_journal(path, size, audio_fraction, seed, batch_size=10000):
+    """Write a journal of `size` entries spread over YEARS years to `path` through EntryStore.add_entries."""
+    rng = np.random.default_rng(seed)
+    # A Zipf-ish vocabulary: the app's words first, then synthetic ones, so term frequencies look like prose.
+    vocabulary = np.array(WORDS + [f"w{i:x}" for i in range(20000)])
+    weights = 1.0 / np.arange(1, len(vocabulary) + 1)
+    weights /= weights.sum()
+    first = LAST_DAY - datetime.timedelta(days=365 * YEARS)
+    span = (LAST_DAY - first).total_seconds() + 86399
+    part = Path(f"{path}.part")
+    for leftover in Path(path).parent.glob(part.name + "*"): leftover.unlink()
+    store = EntryStore(str(part))
+    try:
+        for start in range(0, size, batch_size):
+            count = min(batch_size, size - start)
+            offsets = np.sort(rng.uniform(start / size, (start + count) / size, count)) * span
+            is_audio = rng.random(count) < audio_fraction
+            lengths = rng.integers(8, 120, count)
+            words = vocabulary[rng.choice(len(vocabulary), int(lengths.sum()), p=weights)]
+            ends = np.cumsum(lengths)
+            tag_picks = rng.integers(0, len(TAGS), (count, 2))
+            rows = []
+            for i in range(count):
+                when = datetime.datetime.combine(first, datetime.time()) + datetime.timedelta(seconds=float(offsets[i]))
+                tags = ", ".join(sorted({TAGS[j] for j in tag_picks[i][:rng.integers(0, 3)]}))
+                if is_audio[i]:
+                    content = f"/journal/entries/{when.year}/{when:%B}/{when.day:02d}_audio_{int(when.timestamp())}.{('wav', 'flac', 'opus')[i % 3]}"
+                else:
+                    text = list(words[ends[i] - lengths[i]:ends[i]])
+                    if rng.random() < 0.01: text[:2] = ["morning", "prayer"]
+                    if rng.random() < 1e-4: text[-1] = RARE_WORD
+                    content = " ".join(text).capitalize() + "."
+                rows.append((when.strftime("%Y-%m-%d"), 'audio' if is_audio[i] else 'text', content, tags, when.strftime("%Y-%m-%d %H:%M:%S")))
+            store.add_entries(rows)
+            print(f"\rgenerating {size} entries: {start + count}/{size}", end="", file=sys.stderr, flush=True)
+        print(file=sys.stderr)
+    finally: store.close()
+    os.replace(part, path)
+
+
+def journal_path(workdir, size, audio_fraction, seed):
+    path = Path(workdir) / f"journal-{size}-{audio_fraction:g}-{seed}.db"
+    if not path.exists(): generate_journal(path, size, audio_fraction, seed)
+    return path
+
+
+def summarize(seconds):
+    ms = sorted(s * 1000 for s in seconds)
+    return {"median_ms": round(statistics.median(ms), 3), "p95_ms": round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 3),
+            "min_ms": round(ms[0], 3), "max_ms": round(ms[-1], 3), "runs": len(ms)}
+
+
+def measure(case, repeat):
+    """Time `case` (a callable returning a JSON-able detail value) `repeat` times, then once more under tracemalloc."""
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        detail = case()
+        seconds.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        case()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally: tracemalloc.stop()
+    return {**summarize(seconds), "peak_python_kib": round(peak / 1024, 1), "detail": detail}
+
+
+def query_cases(store, size, workdir):
+    """name -> callable for every read path the GUI and CLI hit."""
+    def search(query, tags=()):
+        return lambda: len(store.search(query, limit=200, tags=tags))
+
+    def type_ahead(word, cold):
+        # What the search box does per debounced keystroke: rank ids for the prefix, then build the first page.
+        def run():
+            if cold: store._search_cache.clear()
+            for end in range(1, len(word) + 1):
+                query = store.type_ahead_query(word[:end])
+                store.search_rows(query, store.search_ids(query, 5000)[:50])
+            return len(word)
+        return run
+
+    def scroll(pages):
+        def run():
+            rows = store.timeline_page(50)
+            for _ in range(pages - 1):
+                if not rows: break
+                rows = store.timeline_page(50, after=(rows[-1][5], rows[-1][0]))
+            return pages
+        return run
+
+    def dashboard(cold):
+        def run():
+            if cold: store._stats_cache.clear()
+            store.dashboard_stats(); store.count_entries(); store.tag_counts(30)
+            return sum(store.activity_counts(LAST_DAY - datetime.timedelta(days=364), LAST_DAY).values())
+        return run
+
+    def export(label, prefix):
+        writer_class = EXPORT_WRITERS[label]
+        target = Path(workdir) / f"export-{size}{writer_class.extension}"
+        def run():
+            count = run_export(store, writer_class(), target, *store.day_range(prefix))
+            target.unlink(missing_ok=True)
+            return count
+        return run
+
+    return {
+        "search.common": search("family"),
+        "search.rare": search(RARE_WORD),
+        "search.phrase": search('"morning prayer"'),
+        "search.prefix": search("grat*"),
+        "search.common+tag": search("family", ("prayer",)),
+        "search.tags_only": search("", ("wisdom", "family")),
+        "search.type_ahead.cold": type_ahead("gratitude", cold=True),
+        "search.type_ahead.cached": type_ahead("gratitude", cold=False),
+        "timeline.first_page": lambda: len(store.timeline_page(50)),
+        "timeline.scroll_20_pages": scroll(20),
+        "timeline.offset_middle": lambda: len(store.timeline_page(50, offset=size // 2)),
+        "dashboard.cold": dashboard(cold=True),
+        "dashboard.warm": dashboard(cold=False),
+        "export.txt_month": export("TXT", f"{LAST_DAY:%Y-%m}"),
+        "export.txt_all": export("TXT", ""),
+        "export.jsonl_all": export("JSON Lines", ""),
+    }
+
+
+def record_case(workdir, codec, seconds, speed):
+    """Capture `seconds` of fake input at `speed` times real time the way LegacyRecorder.record_audio does."""
+    def run():
+        fake_sounddevice.default.speed = speed
+        writer = open_audio_writer(Path(workdir) / f"bench_audio_{codec}", codec, fake_sounddevice.default.samplerate)
+        meter, stop_at = LevelMeter(), time.perf_counter() + seconds / speed
+        try: record_stream(writer, meter, lambda: time.perf_counter() < stop_at, poll_interval=0.01)
+        finally: writer.close()
+        stream = fake_sounddevice.InputStream.last
+        callbacks = summarize(stream.callback_seconds)
+        writer.filepath.unlink(missing_ok=True)
+        budget_ms = stream.blocksize / stream.samplerate * 1000
+        return {"frames": writer.frames_written, "dropped_blocks": writer.dropped_blocks, "late_blocks": stream.late_blocks,
+                "callback_ms": callbacks, "callback_budget_ms": round(budget_ms, 3)}
+    return run
+
+
+class CountingWriter:
+    sample_rate = 44100
+    frames_written = 0
+
+    def write(self, block):
+        self.frames_written += len(block)
+
+
+def vad_case(background, seconds=10.0, seed=0):
+    """Feed the voice-activity gate three 1 s voiced bursts over `background` ("noise" or "hum") in 512-frame
+    blocks. Kept audio should cover the bursts plus pre-roll and hangover, and nothing when there is no speech."""
+    rate = CountingWriter.sample_rate
+    t = np.arange(int(seconds * rate)) / rate
+    room = (np.random.default_rng(seed).normal(0, 0.02, len(t)) if background == "noise" # About -34 dBFS: a quiet room
+            else 0.05 * np.sin(2 * np.pi * 60 * t)) # Mains hum
+    voice = sum(np.sin(2 * np.pi * f * t) / k for k, f in enumerate((150, 300, 450, 600), 1)) * 0.2 * (0.6 + 0.4 * np.sin(2 * np.pi * 4 * t))
+    bursts = np.zeros(len(t))
+    for start in (0.2, 0.5, 0.8): bursts[int(start * len(t)):int(start * len(t)) + rate] = 1
+    def gate(signal):
+        gate = VoiceActivityGate(CountingWriter())
+        for start in range(0, len(signal), 512): gate.write(signal[start:start + 512, None].astype('float32'))
+        return gate
+    def run():
+        quiet, speech = gate(room), gate(room + voice * bursts)
+        return {"noise_floor_db": round(quiet.noise_floor_db, 1), "background_kept_s": quiet.frames_written / rate,
+                "speech_s": bursts.sum() / rate, "speech_kept_s": round(speech.frames_written / rate, 2), "segments": speech.segments}
+    return run
+
+
+def environment():
+    try: commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, cwd=Path(__file__).parent).stdout.strip() or None
+    except OSError: commit = None
+    return {"timestamp": datetime.datetime.now().isoformat(timespec="seconds"), "commit": commit,
+            "python": platform.python_version(), "sqlite": sqlite3.sqlite_version, "numpy": np.__version__,
+            "platform": platform.platform(), "processor": platform.processor() or platform.machine()}
+
+
+def peak_rss_kib():
+    if resource is None: return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak # bytes on macOS, KiB elsewhere
+
+
+def compare(previous, current):
+    print(f"\n{'case':34} {'size':>8} {'before ms':>11} {'after ms':>11} {'change':>8}")
+    for size, result in current["results"].items():
+        old_cases = previous.get("results", {}).get(size, {}).get("cases", {})
+        for name, case in result["cases"].items():
+            if name not in old_cases: continue
+            before, after = old_cases[name]["median_ms"], case["median_ms"]
+            change = f"{(after - before) / before * 100:+.0f}%" if before else "n/a"
+            print(f"{name:34} {size:>8} {before:11.2f} {after:11.2f} {change:>8}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000], help="journal sizes in entries")
+    parser.add_argument("--audio-fraction", type=float, default=0.2, help="share of entries that are audio (default 0.2)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per case (default 5)")
+    parser.add_argument("--cases", nargs="+", default=["*"], help="glob patterns of cases to run, e.g. 'search.*'")
+    parser.add_argument("--record-seconds", type=float, default=30.0, help="seconds of audio per capture run")
+    parser.add_argument("--record-speed", type=float, default=10.0, help="capture at this multiple of real time")
+    parser.add_argument("--workdir", type=Path, default=Path(tempfile.gettempdir()) / "legacy-recorder-bench",
+                        help="where generated journals are cached between runs")
+    parser.add_argument("--output", type=Path, help="write results as JSON")
+    parser.add_argument("--compare", type=Path, help="earlier results JSON to compare medians against")
+    args = parser.parse_args(argv)
+    args.workdir.mkdir(parents=True, exist_ok=True)
+    wanted = lambda name: any(fnmatch.fnmatch(name, pattern) for pattern in args.cases)
+
+    report = {"meta": {**environment(), "args": {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()}}, "results": {}}
+    for size in args.sizes:
+        path = journal_path(args.workdir, size, args.audio_fraction, args.seed)
+        store = EntryStore(str(path))
+        try:
+            cases = {}
+            for name, case in query_cases(store, size, args.workdir).items():
+                if not wanted(name): continue
+                cases[name] = measure(case, args.repeat)
+                print(f"{size:>8} {name:34} {cases[name]['median_ms']:10.2f} ms", file=sys.stderr)
+        finally: store.close()
+        report["results"][str(size)] = {"db_bytes": path.stat().st_size, "cases": cases}
+
+    record = {}
+    for codec in ("wav", "flac"):
+        name = f"record.{codec}"
+        if not wanted(name) or not audio_codec_available(codec): continue
+        record[name] = measure(record_case(args.workdir, codec, args.record_seconds, args.record_speed), max(1, args.repeat // 2))
+        print(f"{'':>8} {name:34} {record[name]['detail']['callback_ms']['p95_ms']:10.3f} ms p95 per callback", file=sys.stderr)
+    for background in ("noise", "hum"):
+        name = f"record.vad_{background}"
+        if not wanted(name): continue
+        record[name] = measure(vad_case(background), max(1, args.repeat // 2))
+        print(f"{'':>8} {name:34} {record[name]['detail']['speech_kept_s']:10.2f} s kept of {record[name]['detail']['speech_s']:.0f} s speech", file=sys.stderr)
+    if record: report["results"]["capture"] = {"cases": record}
+    report["meta"]["peak_rss_kib"] = peak_rss_kib()
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"Results written to {args.output}", file=sys.stderr)
+    else: print(json.dumps(report, indent=2))
+    if args.compare: compare(json.loads(args.compare.read_text(encoding="utf-8")), report)
+
+
+if __name__ == "__main__":
+    main()
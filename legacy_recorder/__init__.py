@@ -0,0 +1 @@
+"""Legacy Recorder: headless journal services (legacy_recorder.core) and the `legacy-recorder` command line."""
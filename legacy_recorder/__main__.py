@@ -0,0 +1,5 @@
+import sys
+
+from legacy_recorder.cli import main
+
+sys.exit(main())
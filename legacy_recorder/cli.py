@@ -0,0 +1,213 @@
+"""`legacy-recorder` command line: add, search, export, stats, import and transcribe without the desktop app.
+
+Only argparse is imported up front; each subcommand imports the core services it needs, so start-up stays
+in the milliseconds and nothing here touches a display or an audio device.
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+from pathlib import Path
+
+
+def default_app_dir():
+    return Path(os.environ.get("LEGACY_RECORDER_HOME") or Path.home() / "LegacyRecorder")
+
+
+class ConsoleProgress:
+    """Task stand-in for core services: progress goes to stderr, Ctrl+C is the cancel button."""
+    def __init__(self, label):
+        self.label = label
+
+    def check_cancelled(self):
+        pass
+
+    def report_progress(self, done, total):
+        if sys.stderr.isatty(): print(f"\r{self.label} {done}/{total}", end="", file=sys.stderr, flush=True)
+
+    def done(self):
+        if sys.stderr.isatty(): print(file=sys.stderr)
+
+
+def open_store(args):
+    from legacy_recorder.core import EntryStore
+    args.app_dir.mkdir(parents=True, exist_ok=True)
+    return EntryStore(args.app_dir / "legacy.db")
+
+
+def cmd_add(args):
+    from legacy_recorder.core import TextMirror
+    date = args.date or datetime.date.today().isoformat()
+    datetime.date.fromisoformat(date)
+    store = open_store(args)
+    if args.audio:
+        entry_id = store.add_entry(date, 'audio', str(Path(args.audio).resolve()), args.tags)
+    else:
+        content = sys.stdin.read() if args.text in (None, "-") else args.text
+        if not content.strip(): raise SystemExit("Nothing to add: pass the entry text or pipe it on stdin.")
+        entry_id = store.add_entry(date, 'text', content.strip(), args.tags)
+        mirror = TextMirror(args.app_dir / "entries")
+        mirror.write(entry_id, date, content.strip()); mirror.flush()
+    print(entry_id)
+
+
+def cmd_search(args):
+    store = open_store(args)
+    results = store.search(args.query or "", limit=args.limit, tags=args.tag, match_all=not args.any)
+    for entry_id, date, entry_type, content, tags, timestamp, snippet in results:
+        if args.json:
+            print(json.dumps({"id": entry_id, "date": date, "type": entry_type, "content": content, "tags": tags, "timestamp": timestamp}, ensure_ascii=False))
+            continue
+        preview = (content + (f"  “{snippet}”" if snippet else "")) if entry_type == 'audio' else (snippet or content[:120]).replace("\n", " ")
+        print(f"{entry_id:>6}  {date}  {'🎙️' if entry_type == 'audio' else '📝'}  {preview}" + (f"  [{tags}]" if tags else ""))
+
+
+def day_bounds(args):
+    from legacy_recorder.core import EntryStore
+    if args.start or args.end:
+        parse = lambda text: int(datetime.date.fromisoformat(text).strftime("%Y%m%d"))
+        return (parse(args.start) if args.start else 0, parse(args.end) if args.end else 99999999,
+                f"{args.start or 'start'} to {args.end or 'today'}")
+    return (*EntryStore.day_range(args.period or ""), args.period or "All years")
+
+
+def cmd_export(args):
+    from legacy_recorder.core import EXPORT_WRITERS, run_export
+    writers = {writer.extension.lstrip("."): writer for writer in EXPORT_WRITERS.values()}
+    writer_class = writers[args.format]
+    first_day, last_day, title = day_bounds(args)
+    progress = ConsoleProgress("Exporting")
+    count = run_export(open_store(args), writer_class(embed_audio=args.embed_audio), args.output, first_day, last_day,
+                       args.tag, not args.any, title, progress)
+    progress.done()
+    print(f"Exported {count} entries to {args.output}" if count else "No entries matched.")
+
+
+def cmd_stats(args):
+    store = open_store(args)
+    stats = store.dashboard_stats()
+    stats["top_tags"] = dict(store.tag_counts(args.tags))
+    if args.json: print(json.dumps(stats, ensure_ascii=False, indent=2)); return
+    print(f"Entries: {stats['total_entries']} ({stats['text_entries']} text, {stats['audio_entries']} audio)")
+    print(f"Last entry: {stats['last_entry_date'] or '-'}")
+    if stats["top_tags"]: print("Top tags: " + ", ".join(f"{name} ({count})" for name, count in stats["top_tags"].items()))
+
+
+def cmd_import(args):
+    """Import a JSON Lines export, or every text/Markdown/audio file under one or more folders."""
+    from legacy_recorder.core import BulkImporter, TextMirror
+    store, mirror = open_store(args), TextMirror(args.app_dir / "entries")
+    if len(args.sources) == 1 and Path(args.sources[0]).suffix.lower() == ".jsonl": return import_jsonl(store, mirror, args.sources[0])
+    progress = ConsoleProgress("Importing")
+    stats = BulkImporter(store, args.app_dir / "entries", mirror, copy_audio=not args.link_audio).run(args.sources, progress)
+    progress.done()
+    print(f"Imported {stats['text']} text and {stats['audio']} audio entries from {stats['files']} files "
+          f"({stats['duplicates']} duplicates skipped, {stats['failed']} failed).")
+
+
+def cmd_transcribe(args):
+    """Queue audio entries without transcripts and transcribe them with a local model; safe to stop and re-run."""
+    from legacy_recorder.core.transcribe import TranscriptionQueue
+    store = open_store(args)
+    queued = store.enqueue_transcriptions(args.entry or None, args.priority)
+    counts = store.transcription_counts()
+    print(f"{counts['transcribed']} transcribed, {counts['pending']} queued ({queued} just added), {counts['failed']} failed earlier.")
+    if args.status or not counts["pending"]: return
+    if not args.model: raise SystemExit("Pass --model with the path to a local speech model.")
+    try: queue = TranscriptionQueue(store, args.backend, args.model, args.workers, args.threads, args.batch_size)
+    except (OSError, RuntimeError) as e: raise SystemExit(f"legacy-recorder: {e}")
+    progress = ConsoleProgress("Transcribing")
+    stats = queue.run(progress)
+    progress.done()
+    print(f"Transcribed {stats['transcribed']} recordings ({stats['failed']} failed).")
+
+
+def import_jsonl(store, mirror, source):
+    # Every line is checked before anything is stored, and text is only mirrored once the rows are committed, so a
+    # bad line leaves neither rows nor mirror files behind. Timestamps from `export --format jsonl` are kept.
+    rows, now = [], datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    with open(source, encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip(): continue
+            try:
+                record = json.loads(line)
+                tags = record.get("tags") or ""
+                if isinstance(tags, list): tags = ", ".join(tags)
+                datetime.date.fromisoformat(record["date"])
+                timestamp = record.get("timestamp") or now
+                datetime.datetime.fromisoformat(timestamp)
+                rows.append((record["date"], record.get("type", "text"), record["content"], tags, timestamp))
+            except (ValueError, KeyError, TypeError) as e: raise SystemExit(f"{source}:{line_no}: {e}")
+    ids = store.add_entries(rows)
+    for entry_id, (date, entry_type, content, _tags, _timestamp) in zip(ids, rows):
+        if entry_type == "text": mirror.write(entry_id, date, content)
+    mirror.flush()
+    print(f"Imported {len(rows)} entries.")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="legacy-recorder", description="Legacy Recorder journal tools (no GUI).")
+    parser.add_argument("--data-dir", dest="app_dir", type=Path, default=default_app_dir(),
+                        help="journal folder (default: $LEGACY_RECORDER_HOME or ~/LegacyRecorder)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="add a text entry (or register an audio file)")
+    add.add_argument("text", nargs="?", help="entry text; '-' or omitted reads stdin")
+    add.add_argument("--tags", default="", help="comma-separated tags")
+    add.add_argument("--date", help="YYYY-MM-DD (default: today)")
+    add.add_argument("--audio", help="add an audio entry pointing at this file instead")
+    add.set_defaults(handler=cmd_add)
+
+    search = commands.add_parser("search", help='full-text search: words, "phrases", prefix*')
+    search.add_argument("query", nargs="?")
+    search.add_argument("--tag", action="append", default=[], help="only entries with this tag (repeatable)")
+    search.add_argument("--any", action="store_true", help="match any --tag instead of all")
+    search.add_argument("--limit", type=int, default=50)
+    search.add_argument("--json", action="store_true", help="print JSON Lines")
+    search.set_defaults(handler=cmd_search)
+
+    export = commands.add_parser("export", help="export entries to a file")
+    export.add_argument("format", choices=["txt", "md", "jsonl", "html", "docx"])
+    export.add_argument("output")
+    export.add_argument("--period", help="YYYY or YYYY-MM (default: everything)")
+    export.add_argument("--from", dest="start", help="first day, YYYY-MM-DD")
+    export.add_argument("--to", dest="end", help="last day, YYYY-MM-DD")
+    export.add_argument("--tag", action="append", default=[])
+    export.add_argument("--any", action="store_true")
+    export.add_argument("--embed-audio", action="store_true", help="HTML: embed recordings instead of linking them")
+    export.set_defaults(handler=cmd_export)
+
+    stats = commands.add_parser("stats", help="entry counts and top tags")
+    stats.add_argument("--tags", type=int, default=10, help="how many top tags to list")
+    stats.add_argument("--json", action="store_true")
+    stats.set_defaults(handler=cmd_stats)
+
+    importer = commands.add_parser("import", help="import a JSON Lines export or folders of text/Markdown/audio files")
+    importer.add_argument("sources", nargs="+", metavar="source")
+    importer.add_argument("--link-audio", action="store_true", help="reference audio files where they are instead of copying them into the journal")
+    importer.set_defaults(handler=cmd_import)
+
+    transcribe = commands.add_parser("transcribe", help="transcribe audio entries offline so search can find what was said")
+    transcribe.add_argument("--backend", choices=["vosk", "whisper.cpp"], default="vosk")
+    transcribe.add_argument("--model", help="local model: a Vosk model folder or a whisper.cpp ggml file")
+    transcribe.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2), help="worker processes (default: half the cores)")
+    transcribe.add_argument("--threads", type=int, default=1, help="threads per worker (whisper.cpp)")
+    transcribe.add_argument("--batch-size", type=int, default=4, help="recordings per worker job")
+    transcribe.add_argument("--entry", type=int, action="append", default=[], help="only this entry id (repeatable)")
+    transcribe.add_argument("--priority", type=int, default=0, help="queue priority; higher runs first")
+    transcribe.add_argument("--status", action="store_true", help="only queue and show counts")
+    transcribe.set_defaults(handler=cmd_transcribe)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try: args.handler(args)
+    except KeyboardInterrupt: return 130
+    except ValueError as e: print(f"legacy-recorder: {e}", file=sys.stderr); return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
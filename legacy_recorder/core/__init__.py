@@ -0,0 +1,36 @@
+"""Display-free journal services shared by the desktop app and the command line.
+
+Storage, export, mirror, backup and the transcription queue import only the standard library. The audio and waveform-peak services need
+NumPy/SciPy, so their names load on first access and text-only tools never pay for those imports.
+"""
+from .backup import BackupManager
+from .export import (EXPORT_WRITERS, DocxExportWriter, ExportEntry, ExportWriter, HtmlExportWriter, JsonLinesExportWriter,
+                     MarkdownExportWriter, TxtExportWriter, run_export)
+from .importer import BulkImporter
+from .metrics import METRICS, Metrics
+from .mirror import TextMirror
+from .storage import EntryStore
+from .tasks import TaskCancelled
+from .transcribe import BACKENDS as TRANSCRIPTION_BACKENDS, TranscriptionQueue, available_backends
+
+_AUDIO_NAMES = {
+    "AUDIO_CODECS", "AudioTranscoder", "DecodedSource", "LevelMeter", "LinearResampler", "MappedWavSource", "PreRollBuffer",
+    "StreamingAudioWriter", "StreamingSoundFileWriter", "StreamingWavWriter", "VoiceActivityGate", "audio_codec_available",
+    "open_audio_source", "open_audio_writer", "record_stream",
+}
+_PEAK_NAMES = {"PeakBuilder", "PeakCache", "Peaks", "compute_peaks"}
+
+__all__ = ["BackupManager", "BulkImporter", "EXPORT_WRITERS", "DocxExportWriter", "EntryStore", "ExportEntry", "ExportWriter", "HtmlExportWriter",
+           "JsonLinesExportWriter", "METRICS", "MarkdownExportWriter", "Metrics", "TRANSCRIPTION_BACKENDS", "TaskCancelled", "TextMirror",
+           "TranscriptionQueue", "TxtExportWriter", "available_backends", "run_export",
+           *sorted(_AUDIO_NAMES), *sorted(_PEAK_NAMES)]
+
+
+def __getattr__(name):
+    if name in _AUDIO_NAMES:
+        from . import audio
+        return getattr(audio, name)
+    if name in _PEAK_NAMES:
+        from . import peaks
+        return getattr(peaks, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
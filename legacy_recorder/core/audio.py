@@ -0,0 +1,406 @@
+"""Audio file services: codecs, streaming writers, transcoding and random-access readers for playback."""
+
+import math
+import os
+import queue
+import struct
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+import numpy as np
+import scipy.io.wavfile as wav
+try: import soundfile as sf # Optional: FLAC/Opus storage
+except (ImportError, OSError): sf = None
+
+from .metrics import METRICS
+from .tasks import TaskCancelled
+
+
+# Storage codecs: file suffix, libsndfile (format, subtype) and the sample rate to capture at (None = app default).
+AUDIO_CODECS = {
+    "wav": (".wav", None, None),
+    "flac": (".flac", ("FLAC", "PCM_16"), None),
+    "opus": (".opus", ("OGG", "OPUS"), 48000), # Opus only supports 8/12/16/24/48 kHz
+}
+
+
+def audio_codec_available(codec):
+    if codec == "wav": return True
+    if sf is None or codec not in AUDIO_CODECS: return False
+    fmt, subtype = AUDIO_CODECS[codec][1]
+    return subtype in sf.available_subtypes(fmt)
+
+
+class StreamingAudioWriter:
+    """Appends float32 audio blocks to a file from a writer thread so the audio callback never touches the disk."""
+    def __init__(self, filepath, sample_rate, channels=1, max_queued_blocks=512):
+        self.filepath = Path(filepath)
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.frames_written = 0
+        self.dropped_blocks = 0
+        self._queue = queue.Queue(maxsize=max_queued_blocks)
+        self._thread = None
+        self.error = None
+        self.peaks = None # Optional core.peaks.PeakBuilder, fed on the writer thread
+
+    def open(self):
+        self.filepath.parent.mkdir(parents=True, exist_ok=True)
+        self._open_file()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def write(self, block):
+        # Called from the audio callback: never block, drop the block if the writer has fallen behind.
+        try: self._queue.put_nowait(block.copy())
+        except queue.Full:
+            self.dropped_blocks += 1
+            METRICS.count("audio.dropped_blocks")
+
+    def close(self):
+        if self._thread is None: return self.frames_written
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        self._close_file()
+        return self.frames_written
+
+    def _run(self):
+        while True:
+            block = self._queue.get()
+            if block is None: return
+            if self.error: continue
+            try:
+                self._write_block(block)
+                self.frames_written += len(block)
+                if self.peaks is not None: self.peaks.add(block)
+            except Exception as e: self.error = e
+
+
+class StreamingWavWriter(StreamingAudioWriter):
+    """Float32 WAV writer; the RIFF/fact/data sizes are patched when the stream closes."""
+    WAVE_FORMAT_IEEE_FLOAT = 3
+    HEADER_SIZE = 58 # RIFF(12) + fmt(26) + fact(12) + data header(8)
+
+    def _open_file(self):
+        self._file = open(self.filepath, 'wb')
+        self._file.write(self._header(0))
+
+    def _write_block(self, block):
+        self._file.write(memoryview(np.ascontiguousarray(block, dtype='<f4')).cast('B'))
+
+    def _close_file(self):
+        try:
+            self._file.seek(0)
+            self._file.write(self._header(self.frames_written))
+        finally: self._file.close()
+
+    def _header(self, frames):
+        block_align = self.channels * 4
+        data_size = frames * block_align
+        return (b'RIFF' + struct.pack('<I', self.HEADER_SIZE - 8 + data_size) + b'WAVE'
+                + b'fmt ' + struct.pack('<IHHIIHHH', 18, self.WAVE_FORMAT_IEEE_FLOAT, self.channels, self.sample_rate,
+                                        self.sample_rate * block_align, block_align, 32, 0)
+                + b'fact' + struct.pack('<II', 4, frames)
+                + b'data' + struct.pack('<I', data_size))
+
+
+class StreamingSoundFileWriter(StreamingAudioWriter):
+    """Encodes FLAC/Opus incrementally through libsndfile as blocks arrive."""
+    def __init__(self, filepath, sample_rate, codec, channels=1, max_queued_blocks=512):
+        super().__init__(filepath, sample_rate, channels, max_queued_blocks)
+        self.format, self.subtype = AUDIO_CODECS[codec][1]
+
+    def _open_file(self):
+        self._file = sf.SoundFile(str(self.filepath), 'w', samplerate=self.sample_rate, channels=self.channels, format=self.format, subtype=self.subtype)
+
+    def _write_block(self, block):
+        self._file.write(block)
+
+    def _close_file(self):
+        self._file.close()
+
+
+def open_audio_writer(stem_path, codec, default_sample_rate):
+    """Start a streaming writer for `stem_path` + the codec's suffix, falling back to WAV if the codec is unavailable."""
+    if not audio_codec_available(codec):
+        if codec != "wav": print(f"Audio codec '{codec}' unavailable (is soundfile installed?); recording WAV instead")
+        codec = "wav"
+    suffix, _sf_format, codec_rate = AUDIO_CODECS[codec]
+    filepath = Path(stem_path).with_suffix(suffix)
+    if codec == "wav": return StreamingWavWriter(filepath, default_sample_rate).open()
+    return StreamingSoundFileWriter(filepath, codec_rate or default_sample_rate, codec).open()
+
+
+class LevelMeter:
+    """Decimated level data from the capture callback for the GUI to poll.
+
+    process() runs on the audio thread and only computes one RMS/peak pair and one min/max pair per block, in
+    place on the block; results are published by replacing immutable values, so readers never need a lock.
+    """
+    def __init__(self, history_blocks=200, peak_decay_per_second=1.2):
+        self.peak_decay_per_second = peak_decay_per_second
+        self.history = deque(maxlen=history_blocks) # (min, max) per block for the scrolling waveform
+        self.reset()
+
+    def reset(self):
+        self.latest = (0.0, 0.0) # (rms, peak)
+        self.history.clear()
+        self.held_peak = 0.0
+        self._last_poll = None
+
+    def process(self, block):
+        samples = block.reshape(-1)
+        if samples.size == 0: return
+        low, high = float(samples.min()), float(samples.max())
+        self.latest = (math.sqrt(float(np.dot(samples, samples)) / samples.size), max(high, -low))
+        self.history.append((low, high))
+
+    def poll(self):
+        """Called from the GUI at a fixed rate: returns (rms, held_peak) with peak-hold decay applied."""
+        now = time.perf_counter()
+        rms, peak = self.latest
+        if self._last_poll is not None: self.held_peak = max(0.0, self.held_peak - self.peak_decay_per_second * (now - self._last_poll))
+        self.held_peak = max(self.held_peak, peak)
+        self._last_poll = now
+        return rms, self.held_peak
+
+class PreRollBuffer:
+    """Fixed-size ring of the most recent mono samples; push() is at most two slice copies, no allocation."""
+    def __init__(self, capacity):
+        self.data = np.zeros(max(1, capacity), dtype='float32')
+        self.pos = 0 # Next write index
+        self.filled = 0
+
+    def push(self, samples):
+        size = len(self.data)
+        if len(samples) >= size:
+            self.data[:] = samples[-size:]; self.pos = 0; self.filled = size; return
+        first = min(len(samples), size - self.pos)
+        self.data[self.pos:self.pos + first] = samples[:first]
+        self.data[:len(samples) - first] = samples[first:]
+        self.pos = (self.pos + len(samples)) % size
+        self.filled = min(size, self.filled + len(samples))
+
+    def drain(self):
+        """Buffered samples oldest first as a (n, 1) block; empties the buffer."""
+        start = (self.pos - self.filled) % len(self.data)
+        if start + self.filled <= len(self.data): out = self.data[start:start + self.filled].copy()
+        else: out = np.concatenate((self.data[start:], self.data[:self.pos]))
+        self.filled = 0
+        return out.reshape(-1, 1)
+
+
+class VoiceActivityGate:
+    """Writer front-end that only passes speech: drop-in for the writer in record_stream.
+
+    Each block is split into 10 ms frames and classified in one vectorized pass: a frame is speech when its energy
+    is `margin_db` above the noise floor and either its zero-crossing rate is speech-like or it is loud enough to
+    be unambiguous. The floor is the `floor_percentile` of every frame's energy over the last `floor_window`
+    seconds, speech or not, so steady room noise or mains hum sets it rather than passing as speech. `attack_frames` consecutive speech frames open a segment, which starts with the
+    buffered pre-roll so the first syllable is kept. Once the input has been silent for `max_silence` seconds the
+    gate closes, so each long pause is trimmed to at most max_silence plus pre-roll before it reaches the file.
+    """
+    def __init__(self, writer, pre_roll=0.5, max_silence=1.5, margin_db=9.0, min_db=-55.0, zcr_max=0.35,
+                 attack_frames=3, frame_seconds=0.01, floor_window=5.0, floor_percentile=10):
+        self.writer = writer
+        self.sample_rate = writer.sample_rate
+        self.frame_len = max(1, int(writer.sample_rate * frame_seconds))
+        self.pre_roll = PreRollBuffer(int(writer.sample_rate * pre_roll))
+        self.max_silence_samples = int(writer.sample_rate * max_silence)
+        self.margin_db, self.min_db, self.zcr_max = margin_db, min_db, zcr_max
+        self.attack = np.ones(attack_frames)
+        self.noise_floor_db = -60.0
+        self.recent_db = PreRollBuffer(int(floor_window / frame_seconds)) # Frame energies the floor is estimated from
+        self.floor_percentile = floor_percentile
+        self.open = False
+        self.silent_samples = 0
+        self.voiced_run = 0 # Speech frames at the end of the previous block, so onsets can straddle blocks
+        self.segments = 0
+        self.trimmed_samples = 0
+
+    def __getattr__(self, name):
+        # filepath, frames_written, dropped_blocks, error and close() come from the wrapped writer.
+        if name == "writer": raise AttributeError(name)
+        return getattr(self.writer, name)
+
+    def speech_frames(self, samples):
+        """Boolean speech decision per frame of a mono block; also updates the noise floor."""
+        frame_len = min(self.frame_len, len(samples))
+        frames = samples[:len(samples) // frame_len * frame_len].reshape(-1, frame_len)
+        energy_db = 10 * np.log10(np.einsum('ij,ij->i', frames, frames) / frame_len + 1e-12)
+        zcr = np.count_nonzero(np.diff(np.signbit(frames), axis=1), axis=1) / frame_len
+        # Estimated before classifying and independently of it, so a floor that starts too low still catches up.
+        history = self.recent_db
+        history.push(energy_db.astype('float32'))
+        recent = history.data[:history.filled] # Order doesn't matter for a percentile
+        k = len(recent) * self.floor_percentile // 100
+        self.noise_floor_db = float(np.partition(recent, k)[k])
+        threshold = max(self.min_db, self.noise_floor_db + self.margin_db)
+        return (energy_db > threshold) & ((zcr < self.zcr_max) | (energy_db > threshold + self.margin_db))
+
+    def write(self, block):
+        samples = block.reshape(-1)
+        if samples.size == 0: return
+        speech = self.speech_frames(samples)
+        if not self.open:
+            run = np.concatenate((np.ones(min(self.voiced_run, len(self.attack) - 1)), speech))
+            if len(run) >= len(self.attack) and np.convolve(run, self.attack, 'valid').max() >= len(self.attack):
+                self.open, self.silent_samples = True, 0
+                self.segments += 1
+                if self.pre_roll.filled: self.writer.write(self.pre_roll.drain())
+                self.writer.write(block)
+            else:
+                self.trimmed_samples += max(0, self.pre_roll.filled + len(samples) - len(self.pre_roll.data))
+                self.pre_roll.push(samples)
+        else:
+            self.writer.write(block)
+            self.silent_samples = 0 if speech.any() else self.silent_samples + len(samples)
+            if self.silent_samples >= self.max_silence_samples: self.open = False
+        trailing = np.flatnonzero(~speech)
+        self.voiced_run = len(speech) - 1 - trailing[-1] if len(trailing) else self.voiced_run + len(speech)
+
+
+def record_stream(writer, meter, is_running, poll_interval=0.1):
+    """Capture mono float32 from the default input device into `writer` (and `meter`) until is_running() is false.
+
+    sounddevice is imported here rather than at module level so headless callers that never record (and the
+    benchmarks, which install a fake backend) do not need PortAudio.
+    """
+    import sounddevice as sd
+    def callback(indata, frames, time_info, status):
+        if not METRICS.enabled:
+            if is_running(): writer.write(indata); meter.process(indata)
+            return
+        start = time.perf_counter()
+        if status: METRICS.count(f"audio.input_status: {status}") # e.g. "input overflow": PortAudio lost samples
+        if is_running(): writer.write(indata); meter.process(indata)
+        METRICS.record("audio.input_callback", time.perf_counter() - start)
+    with sd.InputStream(callback=callback, samplerate=writer.sample_rate, channels=1, dtype='float32'):
+        while is_running(): time.sleep(poll_interval)
+
+
+class LinearResampler:
+    """Streaming linear-interpolation resampler for mono float blocks; continuous across block boundaries."""
+    def __init__(self, src_rate, dst_rate):
+        self.step = src_rate / dst_rate
+        self.pos = 0.0 # Source index of the next output sample, relative to the current buffer
+        self.tail = None
+
+    def process(self, block):
+        buf = block if self.tail is None else np.concatenate((self.tail, block))
+        last = len(buf) - 1
+        if last < self.pos: self.tail = buf; return buf[:0]
+        count = int((last - self.pos) // self.step) + 1
+        positions = self.pos + np.arange(count) * self.step
+        out = np.interp(positions, np.arange(len(buf)), buf).astype(np.float32)
+        self.pos = positions[-1] + self.step - last
+        self.tail = buf[-1:]
+        return out
+
+
+class AudioTranscoder:
+    """Re-encodes existing WAV recordings to a compressed codec in the background.
+
+    Each file is encoded to a .part file, renamed into place, and only then is the entry's content path
+    rewritten in one transaction before the WAV is removed. An interrupted run therefore leaves every entry
+    pointing at a complete file and simply resumes with the WAVs still referenced.
+    """
+    CHUNK_FRAMES = 65536
+
+    def __init__(self, store, codec):
+        self.store = store
+        self.codec = codec
+
+    def run(self, task=None):
+        if self.codec == "wav" or not audio_codec_available(self.codec):
+            raise RuntimeError(f"Audio codec '{self.codec}' is not available for transcoding")
+        pending = self.store.audio_entries_with_suffix(".wav")
+        stats = {"files": 0, "failed": 0, "skipped": 0, "bytes_before": 0, "bytes_after": 0}
+        for done, (entry_id, content) in enumerate(pending, 1):
+            if task: task.check_cancelled()
+            src = Path(content)
+            if src.exists():
+                try:
+                    self._transcode_entry(entry_id, content, src, stats)
+                except TaskCancelled: raise
+                except Exception as e:
+                    stats["failed"] += 1
+                    print(f"Could not transcode {src}: {e}")
+            if task: task.report_progress(done, len(pending))
+        stats["bytes_saved"] = stats["bytes_before"] - stats["bytes_after"]
+        return stats
+
+    def _transcode_entry(self, entry_id, content, src, stats):
+        dst, before, after = self.transcode_file(src)
+        try: updated = self.store.update_entry_content(entry_id, content, str(dst))
+        except BaseException: dst.unlink(missing_ok=True); raise
+        if not updated:
+            # The entry was deleted or re-pointed while encoding: its WAV is not ours to remove.
+            dst.unlink(missing_ok=True)
+            stats["skipped"] += 1
+            return
+        stats["files"] += 1; stats["bytes_before"] += before; stats["bytes_after"] += after
+        # Only now does the entry reference the compressed copy, so the WAV can go; failing here just leaves a spare file.
+        try: src.unlink()
+        except OSError as e: print(f"Transcoded {src} but could not remove it: {e}")
+
+    def transcode_file(self, src):
+        suffix, (fmt, subtype), codec_rate = AUDIO_CODECS[self.codec]
+        dst = src.with_suffix(suffix)
+        part = dst.with_name(dst.name + ".part")
+        with sf.SoundFile(str(src)) as reader:
+            out_rate = codec_rate or reader.samplerate
+            resampler = LinearResampler(reader.samplerate, out_rate) if out_rate != reader.samplerate else None
+            with sf.SoundFile(str(part), 'w', samplerate=out_rate, channels=1, format=fmt, subtype=subtype) as writer:
+                for block in reader.blocks(blocksize=self.CHUNK_FRAMES, dtype='float32', always_2d=True):
+                    mono = block.mean(axis=1) if block.shape[1] > 1 else block[:, 0]
+                    writer.write(resampler.process(mono) if resampler else mono)
+        os.replace(part, dst)
+        return dst, src.stat().st_size, dst.stat().st_size
+
+
+class MappedWavSource:
+    """WAV samples memory-mapped by scipy; pages are only read as playback reaches them."""
+    SCALE = {np.dtype('int16'): 1 / 32768, np.dtype('int32'): 1 / 2147483648, np.dtype('uint8'): 1 / 128}
+
+    def __init__(self, filepath):
+        self.samplerate, self.data = wav.read(str(filepath), mmap=True)
+        self.frames = len(self.data)
+
+    def read(self, start, count):
+        block = np.asarray(self.data[start:start + count])
+        if block.ndim > 1: block = block.mean(axis=1)
+        if block.dtype == np.uint8: return (block.astype(np.float32) - 128) * self.SCALE[block.dtype]
+        if block.dtype in self.SCALE: return block.astype(np.float32) * self.SCALE[block.dtype]
+        return block.astype(np.float32, copy=False)
+
+    def close(self):
+        self.data = None
+
+
+class DecodedSource:
+    """Chunked libsndfile decoder for FLAC/Opus (and WAV variants scipy can't map)."""
+    def __init__(self, filepath):
+        self.file = sf.SoundFile(str(filepath))
+        self.samplerate, self.frames = self.file.samplerate, self.file.frames
+
+    def read(self, start, count):
+        if self.file.tell() != start: self.file.seek(start)
+        block = self.file.read(count, dtype='float32', always_2d=True)
+        return block.mean(axis=1) if block.shape[1] > 1 else block[:, 0]
+
+    def close(self):
+        self.file.close()
+
+
+def open_audio_source(filepath):
+    """Random-access float32 mono reader for playback: memory-mapped for WAV, chunked decoding for everything else."""
+    if str(filepath).lower().endswith(".wav") or sf is None:
+        try: return MappedWavSource(filepath)
+        except Exception:
+            if sf is None: raise # e.g. 24-bit WAV, which scipy can't map; libsndfile could have decoded it
+    return DecodedSource(filepath)
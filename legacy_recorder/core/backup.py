@@ -0,0 +1,210 @@
+"""Incremental, content-addressed backup and restore of the journal."""
+
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import threading
+from functools import wraps
+from pathlib import Path
+
+
+def _exclusive(method):
+    # Backups, prunes, verifies and restores share the chunk store: prune must never delete chunks an in-flight
+    # snapshot has written but not yet listed in a manifest, so they run one at a time whichever thread calls them.
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock: return method(self, *args, **kwargs)
+    return wrapper
+
+
+class BackupManager:
+    """Incremental, content-addressed snapshots of the journal.
+
+    Files are cut into fixed-size chunks stored once under chunks/<sha256>; a snapshot is a JSON manifest
+    listing each file's chunks. Files whose size and mtime match the previous snapshot reuse its chunk list
+    without being read, so after the first run only new or changed recordings are copied. legacy.db is copied
+    with SQLite's online backup API, so snapshots are consistent while the app keeps writing.
+    """
+    CHUNK_SIZE = 1 << 20
+    SOURCES = ("entries", "config") # Relative to the app directory
+    DB_NAME = "legacy.db"
+    STAGED_RESTORE = "restore_pending" # Applied by apply_staged_restore() before the database is opened
+    STAGED_MARKER, STAGED_LISTING = "COMPLETE", "RESTORED_FILES.json" # Written last / listing the snapshot's files
+
+    def __init__(self, store, app_dir, backup_dir):
+        self.store = store
+        self.app_dir, self.backup_dir = Path(app_dir), Path(backup_dir)
+        self.chunk_dir, self.snapshot_dir = self.backup_dir / "chunks", self.backup_dir / "snapshots"
+        self._lock = threading.RLock()
+
+    def snapshots(self):
+        """Snapshot ids, newest first."""
+        if not self.snapshot_dir.exists(): return []
+        return sorted((path.stem for path in self.snapshot_dir.glob("*.json")), reverse=True)
+
+    def load_manifest(self, snapshot_id):
+        with open(self.snapshot_dir / f"{snapshot_id}.json", encoding='utf-8') as f: return json.load(f)
+
+    @_exclusive
+    def backup(self, task=None):
+        """Take a snapshot; returns stats {snapshot, files, reused, chunks_written, bytes_written}."""
+        self.chunk_dir.mkdir(parents=True, exist_ok=True); self.snapshot_dir.mkdir(parents=True, exist_ok=True)
+        snapshots = self.snapshots()
+        previous = self.load_manifest(snapshots[0])["files"] if snapshots else {}
+        stats = {"files": 0, "reused": 0, "chunks_written": 0, "bytes_written": 0}
+        snapshot_id = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        if snapshot_id in snapshots: snapshot_id += f"-{len(snapshots)}"
+        files = {}
+        db_copy = self.backup_dir / f"{self.DB_NAME}.tmp"
+        try:
+            self.store.backup_to(db_copy)
+            files[self.DB_NAME] = self._store_file(db_copy, stats)
+        finally:
+            if db_copy.exists(): db_copy.unlink()
+        paths = [path for source in self.SOURCES for path in sorted((self.app_dir / source).rglob("*")) if path.is_file()]
+        for i, path in enumerate(paths, 1):
+            if task: task.check_cancelled()
+            rel = path.relative_to(self.app_dir).as_posix()
+            st = path.stat()
+            old = previous.get(rel)
+            if old and old["size"] == st.st_size and old["mtime_ns"] == st.st_mtime_ns and self._has_chunks(old["chunks"]):
+                files[rel] = old; stats["reused"] += 1
+            else:
+                files[rel] = self._store_file(path, stats)
+            if task and i % 50 == 0: task.report_progress(i, len(paths))
+        stats["files"] = len(files)
+        manifest = {"id": snapshot_id, "created": datetime.datetime.now().isoformat(timespec="seconds"), "files": files}
+        self._write_atomic(self.snapshot_dir / f"{snapshot_id}.json", json.dumps(manifest).encode('utf-8'))
+        stats["snapshot"] = snapshot_id
+        return stats
+
+    def _store_file(self, path, stats):
+        digest, chunks = hashlib.sha256(), []
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(self.CHUNK_SIZE), b''):
+                digest.update(chunk)
+                chunks.append(self._put_chunk(chunk, stats))
+            st = os.fstat(f.fileno())
+        return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest.hexdigest(), "chunks": chunks}
+
+    def _chunk_path(self, chunk_hash):
+        return self.chunk_dir / chunk_hash[:2] / chunk_hash
+
+    def _has_chunks(self, chunk_hashes):
+        return all(self._chunk_path(h).exists() for h in chunk_hashes)
+
+    def _put_chunk(self, data, stats):
+        chunk_hash = hashlib.sha256(data).hexdigest()
+        path = self._chunk_path(chunk_hash)
+        if not path.exists():
+            path.parent.mkdir(exist_ok=True)
+            self._write_atomic(path, data)
+            stats["chunks_written"] += 1; stats["bytes_written"] += len(data)
+        return chunk_hash
+
+    @staticmethod
+    def _write_atomic(path, data):
+        part = path.with_name(path.name + ".part")
+        with open(part, 'wb') as f: f.write(data); f.flush(); os.fsync(f.fileno())
+        os.replace(part, path)
+
+    def _read_chunk(self, chunk_hash):
+        with open(self._chunk_path(chunk_hash), 'rb') as f: data = f.read()
+        if hashlib.sha256(data).hexdigest() != chunk_hash: raise ValueError(f"Backup chunk {chunk_hash} is corrupt")
+        return data
+
+    @_exclusive
+    def verify(self, snapshot_id, task=None):
+        """Re-hash every chunk the snapshot references; returns a list of problems (empty when intact)."""
+        problems, files = [], self.load_manifest(snapshot_id)["files"]
+        for i, (rel, info) in enumerate(files.items(), 1):
+            if task: task.check_cancelled(); task.report_progress(i, len(files))
+            digest = hashlib.sha256()
+            try:
+                for chunk_hash in info["chunks"]: digest.update(self._read_chunk(chunk_hash))
+            except (OSError, ValueError) as e: problems.append(f"{rel}: {e}"); continue
+            if digest.hexdigest() != info["sha256"]: problems.append(f"{rel}: content does not match the snapshot")
+        return problems
+
+    @_exclusive
+    def restore(self, snapshot_id, target_dir, task=None):
+        """Rebuild the snapshot under target_dir. Each file is reassembled into a .part file and only renamed
+        into place once its SHA-256 matches the manifest; returns the number of files restored."""
+        target_dir, files = Path(target_dir), self.load_manifest(snapshot_id)["files"]
+        for i, (rel, info) in enumerate(files.items(), 1):
+            if task: task.check_cancelled(); task.report_progress(i, len(files))
+            dest = target_dir / rel
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            part, digest = dest.with_name(dest.name + ".part"), hashlib.sha256()
+            try:
+                with open(part, 'wb') as f:
+                    for chunk_hash in info["chunks"]:
+                        data = self._read_chunk(chunk_hash); digest.update(data); f.write(data)
+                if digest.hexdigest() != info["sha256"]: raise ValueError(f"Restored {rel} does not match the snapshot")
+                os.replace(part, dest)
+            except BaseException:
+                if part.exists(): part.unlink()
+                raise
+        return len(files)
+
+    @_exclusive
+    def stage_restore(self, snapshot_id, task=None):
+        """Restore into <app_dir>/restore_pending; the swap happens at next start, before legacy.db is opened."""
+        staging = self.app_dir / self.STAGED_RESTORE
+        if staging.exists(): shutil.rmtree(staging)
+        count = self.restore(snapshot_id, staging, task)
+        (staging / self.STAGED_LISTING).write_text(json.dumps(sorted(self.load_manifest(snapshot_id)["files"])), encoding='utf-8')
+        (staging / self.STAGED_MARKER).write_text(snapshot_id)
+        return count
+
+    @_exclusive
+    def prepare_restore(self, snapshot_id, task=None):
+        """Safety snapshot of the current state, verify `snapshot_id`, then stage it, all under one hold of the
+        lock so no prune can drop the snapshot's chunks in between. Returns the number of files staged."""
+        self.backup(task)
+        problems = self.verify(snapshot_id, task)
+        if problems: raise ValueError("Snapshot failed verification:\n" + "\n".join(problems[:10]))
+        return self.stage_restore(snapshot_id, task)
+
+    @classmethod
+    def apply_staged_restore(cls, app_dir):
+        """Move a fully staged restore over the live files. Returns the snapshot id applied, or None.
+
+        This is a true rollback: files under SOURCES that the snapshot doesn't contain (entries recorded after it)
+        are deleted; the safety snapshot taken before staging still holds them. The marker is removed last, so
+        a start interrupted part-way through simply applies the rest next time."""
+        app_dir = Path(app_dir)
+        staging = app_dir / cls.STAGED_RESTORE
+        marker, listing = staging / cls.STAGED_MARKER, staging / cls.STAGED_LISTING
+        if not marker.exists():
+            if staging.exists(): shutil.rmtree(staging) # Interrupted staging; the live files were never touched
+            return None
+        snapshot_id = marker.read_text().strip()
+        if listing.exists(): # Restores staged by older versions carry no listing and keep extra files
+            keep = set(json.loads(listing.read_text(encoding='utf-8')))
+            for source in cls.SOURCES:
+                for path in sorted((app_dir / source).rglob("*")):
+                    if path.is_file() and path.relative_to(app_dir).as_posix() not in keep: path.unlink()
+        for suffix in ("-wal", "-shm"):
+            stale = app_dir / f"{cls.DB_NAME}{suffix}"
+            if stale.exists(): stale.unlink()
+        for path in sorted(staging.rglob("*")):
+            if path.is_file() and path not in (marker, listing):
+                dest = app_dir / path.relative_to(staging)
+                dest.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(path, dest)
+        shutil.rmtree(staging)
+        return snapshot_id
+
+    @_exclusive
+    def prune(self, keep):
+        """Drop all but the newest `keep` snapshots and delete chunks no remaining snapshot references."""
+        snapshots = self.snapshots()
+        for snapshot_id in snapshots[keep:]: (self.snapshot_dir / f"{snapshot_id}.json").unlink()
+        live = {h for snapshot_id in snapshots[:keep] for info in self.load_manifest(snapshot_id)["files"].values() for h in info["chunks"]}
+        removed = 0
+        for path in self.chunk_dir.glob("*/*"):
+            if path.name not in live: path.unlink(); removed += 1
+        return removed
@@ -0,0 +1,205 @@
+"""Streaming export pipeline: one row source, pluggable TXT/Markdown/JSON Lines/HTML/DOCX writers."""
+
+import base64
+import datetime
+import html
+import io
+import json
+import os
+import re
+import zipfile
+from collections import namedtuple
+from pathlib import Path
+
+from .storage import EntryStore
+
+
+class ExportEntry(namedtuple("ExportEntry", "id date type content tags timestamp")):
+    @property
+    def when(self):
+        return datetime.datetime.fromisoformat(self.timestamp.replace('Z', '+00:00'))
+
+
+class ExportWriter:
+    """One export format. The pipeline calls open() once, write_entry() per row as rows stream from the
+    database, then close(); writers emit output as they go instead of building the document in memory."""
+    label = extension = None
+
+    def __init__(self, embed_audio=False):
+        self.embed_audio = embed_audio
+        self.file = None
+
+    def open(self, filepath, title):
+        self.file = open(filepath, 'w', encoding='utf-8', buffering=1 << 16)
+        self.write_header(title)
+
+    def write_header(self, title):
+        pass
+
+    def write_entry(self, entry):
+        raise NotImplementedError
+
+    def write_footer(self):
+        pass
+
+    def close(self):
+        if self.file is None: return
+        try: self.write_footer()
+        finally: self.file.close(); self.file = None
+
+
+class TxtExportWriter(ExportWriter):
+    label, extension = "TXT", ".txt"
+
+    def write_header(self, title):
+        self.file.write(f"Legacy Recorder Export\nPeriod: {title}\nGenerated: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n{'='*50}\n\n")
+
+    def write_entry(self, entry):
+        self.file.write(f"Date: {entry.when.strftime('%B %d, %Y at %I:%M %p')}\nType: {'Text Entry' if entry.type == 'text' else 'Audio Entry'}\n")
+        if entry.tags: self.file.write(f"Tags: {entry.tags}\n")
+        self.file.write(f"{'-'*30}\n{entry.content if entry.type == 'text' else f'Audio file: {Path(entry.content).name}'}\n\n{'='*50}\n\n")
+
+
+class MarkdownExportWriter(ExportWriter):
+    label, extension = "Markdown", ".md"
+
+    def write_header(self, title):
+        self.file.write(f"# Legacy Recorder Export\n\n*{title} — generated {datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}*\n\n")
+
+    def write_entry(self, entry):
+        self.file.write(f"## {entry.when.strftime('%A, %B %d, %Y at %I:%M %p')}\n\n")
+        tags = EntryStore.split_tags(entry.tags)
+        if tags: self.file.write("🏷️ " + " ".join(f"`{tag}`" for tag in tags) + "\n\n")
+        if entry.type == 'text': self.file.write(f"{entry.content}\n\n---\n\n")
+        else: self.file.write(f"🎙️ [{Path(entry.content).name}]({Path(entry.content).absolute().as_uri()})\n\n---\n\n")
+
+
+class JsonLinesExportWriter(ExportWriter):
+    label, extension = "JSON Lines", ".jsonl"
+
+    def write_entry(self, entry):
+        record = {"id": entry.id, "date": entry.date, "type": entry.type, "content": entry.content,
+                  "tags": EntryStore.split_tags(entry.tags), "timestamp": entry.timestamp}
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+class HtmlExportWriter(ExportWriter):
+    """Single-file HTML archive. Audio is either linked by file URI or embedded as a base64 data URI that is
+    encoded straight from the audio file in chunks."""
+    label, extension = "HTML archive", ".html"
+    AUDIO_MIME = {".wav": "audio/wav", ".flac": "audio/flac", ".opus": "audio/ogg", ".ogg": "audio/ogg"}
+    STYLE = ("body{font-family:system-ui,sans-serif;max-width:760px;margin:2em auto;padding:0 1em;color:#222}"
+             "article{border-bottom:1px solid #ddd;padding:1em 0}h2{font-size:1.1em;margin:0 0 .3em}"
+             ".tags{color:#777;font-size:.9em}.text{white-space:pre-wrap}audio{width:100%}")
+
+    def write_header(self, title):
+        self.file.write(f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>Legacy Recorder Export — {html.escape(title)}</title>"
+                        f"<style>{self.STYLE}</style></head><body>\n<h1>Legacy Recorder Export</h1>\n"
+                        f"<p class=\"tags\">{html.escape(title)} — generated {datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}</p>\n")
+
+    def write_entry(self, entry):
+        self.file.write(f"<article><h2>{entry.when.strftime('%A, %B %d, %Y at %I:%M %p')}</h2>")
+        if entry.tags: self.file.write(f"<p class=\"tags\">🏷️ {html.escape(entry.tags)}</p>")
+        if entry.type == 'text': self.file.write(f"<div class=\"text\">{html.escape(entry.content)}</div>")
+        else: self._write_audio(Path(entry.content))
+        self.file.write("</article>\n")
+
+    def _write_audio(self, path):
+        name = html.escape(path.name)
+        if not path.exists(): self.file.write(f"<p>🎙️ {name} (missing)</p>"); return
+        if not self.embed_audio:
+            self.file.write(f"<p>🎙️ {name}</p><audio controls preload=\"none\" src=\"{html.escape(path.absolute().as_uri())}\"></audio>"); return
+        self.file.write(f"<p>🎙️ {name}</p><audio controls preload=\"none\" src=\"data:{self.AUDIO_MIME.get(path.suffix.lower(), 'audio/wav')};base64,")
+        with open(path, 'rb') as audio:
+            for chunk in iter(lambda: audio.read(3 * 65536), b''): # Multiple of 3, so chunk encodings concatenate cleanly
+                self.file.write(base64.b64encode(chunk).decode('ascii'))
+        self.file.write("\"></audio>")
+
+    def write_footer(self):
+        self.file.write("</body></html>\n")
+
+
+class DocxExportWriter(ExportWriter):
+    """Writes WordprocessingML directly into the .docx zip, one paragraph at a time, so large exports never
+    build a document tree (and python-docx isn't needed)."""
+    label, extension = "DOCX", ".docx"
+    W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+    CONTENT_TYPES = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                     '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                     '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                     '<Default Extension="xml" ContentType="application/xml"/>'
+                     '<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+                     '</Types>')
+    RELS = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>'
+            '</Relationships>')
+    INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+    def __init__(self, embed_audio=False):
+        super().__init__(embed_audio)
+        self.zip = None
+
+    def open(self, filepath, title):
+        self.zip = zipfile.ZipFile(filepath, 'w', zipfile.ZIP_DEFLATED)
+        try:
+            self.zip.writestr('[Content_Types].xml', self.CONTENT_TYPES)
+            self.zip.writestr('_rels/.rels', self.RELS)
+            self.file = io.TextIOWrapper(self.zip.open('word/document.xml', 'w', force_zip64=True), encoding='utf-8', write_through=False)
+            self.file.write(f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><w:document xmlns:w="{self.W_NS}"><w:body>')
+            self._paragraph("Legacy Recorder Export", bold=True, size=36)
+            self._paragraph(f"{title} — generated {datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}", color="777777")
+        except BaseException:
+            # Release the zip handle here: a half-written .part file can't be removed on Windows while it is open.
+            try:
+                if self.file is not None: self.file.close()
+            except (OSError, ValueError): pass
+            finally: self.file = None; self.zip.close(); self.zip = None
+            raise
+
+    def _paragraph(self, text, bold=False, size=None, color=None):
+        props = ("<w:b/>" if bold else "") + (f'<w:color w:val="{color}"/>' if color else "") + (f'<w:sz w:val="{size}"/>' if size else "")
+        run_props = f"<w:rPr>{props}</w:rPr>" if props else ""
+        text = html.escape(self.INVALID_XML_CHARS.sub("", text), quote=False)
+        self.file.write(f'<w:p><w:r>{run_props}<w:t xml:space="preserve">{text}</w:t></w:r></w:p>')
+
+    def write_entry(self, entry):
+        self._paragraph(entry.when.strftime('%A, %B %d, %Y at %I:%M %p'), bold=True, size=28)
+        if entry.tags: self._paragraph(f"Tags: {entry.tags}", color="777777")
+        if entry.type == 'text':
+            for line in entry.content.split("\n"): self._paragraph(line)
+        else: self._paragraph(f"Audio file: {Path(entry.content).name}")
+        self._paragraph("")
+
+    def write_footer(self):
+        self.file.write("<w:sectPr/></w:body></w:document>")
+
+    def close(self):
+        try: super().close()
+        finally:
+            if self.zip is not None: self.zip.close(); self.zip = None
+
+
+EXPORT_WRITERS = {writer.label: writer for writer in (TxtExportWriter, MarkdownExportWriter, JsonLinesExportWriter, HtmlExportWriter, DocxExportWriter)}
+
+
+def run_export(store, writer, filepath, first_day, last_day, tags=(), match_all=True, title="", task=None):
+    """Stream matching entries through `writer` into filepath. Output goes to a .part file that replaces the
+    target only on success; returns the number of entries written."""
+    total = store.count_entries_between(first_day, last_day, tags, match_all)
+    if not total: return 0
+    part_path = f"{filepath}.part"
+    count = 0
+    try:
+        try:
+            writer.open(part_path, title)
+            for count, row in enumerate(store.iter_entries(first_day, last_day, tags, match_all), 1):
+                if task: task.check_cancelled()
+                writer.write_entry(ExportEntry._make(row))
+                if task and count % 200 == 0: task.report_progress(count, total)
+        finally: writer.close()
+        os.replace(part_path, filepath)
+    except BaseException:
+        if os.path.exists(part_path): os.remove(part_path)
+        raise
+    return count
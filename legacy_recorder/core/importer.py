@@ -0,0 +1,183 @@
+"""Bulk import of existing journals: text/Markdown folders, the app's own entries tree and audio folders."""
+import datetime
+import hashlib
+import os
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+HASH_BLOCK = 1 << 20
+
+
+def hash_file(path):
+    """(SHA-256 of a file's bytes, None), or (None, error message) if it can't be read; module-level so the
+    process pool can pickle it. Errors are returned rather than raised so one unreadable file doesn't end pool.map."""
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(HASH_BLOCK), b''): digest.update(block)
+    except OSError as e: return None, str(e)
+    return digest.hexdigest(), None
+
+
+class BulkImporter:
+    """Imports folders of journal files in large batches.
+
+    Files are hashed in a process pool; each batch of entries is written with one executemany in one
+    transaction together with the hashes of the files it consumed (EntryStore.add_entries), so re-running an
+    interrupted import skips everything already stored. Text whose content already exists as an entry, and
+    audio already referenced by one, is logged as a duplicate instead of imported again.
+    """
+    TEXT_SUFFIXES = {".txt", ".md", ".markdown"}
+    AUDIO_SUFFIXES = {".wav", ".flac", ".opus", ".ogg"}
+    BATCH_SIZE = 2000
+    DATE_IN_NAME = re.compile(r'(?<!\d)(\d{4})[-_.]?(\d{2})[-_.]?(\d{2})(?!\d)')
+    EPOCH_IN_NAME = re.compile(r'_audio_(\d{9,10})(?!\d)') # The app's own <dd>_audio_<epoch> recordings
+    DAY_PREFIX = re.compile(r'^(\d{1,2})_')
+    MIRROR_NAME = re.compile(r'^\d{2}_written_\d+\.txt$') # TextMirror's <dd>_written_<id>.txt
+    META_LINE = re.compile(r'^(date|tags|type)\s*:\s*(.*)$', re.IGNORECASE)
+    MONTHS = {datetime.date(2000, m, 1).strftime("%B").lower(): m for m in range(1, 13)}
+
+    def __init__(self, store, entries_dir, mirror=None, copy_audio=True, workers=None):
+        self.store = store
+        self.entries_dir = Path(entries_dir)
+        self.mirror = mirror
+        self.copy_audio = copy_audio
+        self.workers = workers
+
+    def scan(self, roots):
+        files = []
+        for root in (Path(root).absolute() for root in roots):
+            candidates = [root] if root.is_file() else root.rglob("*")
+            files += [path for path in candidates if path.is_file() and path.suffix.lower() in self.TEXT_SUFFIXES | self.AUDIO_SUFFIXES]
+        return sorted(set(files))
+
+    def run(self, roots, task=None):
+        """Import every journal file under `roots`; returns stats {files, text, audio, duplicates, failed}."""
+        files = self.scan(roots)
+        stats = {"files": len(files), "text": 0, "audio": 0, "duplicates": 0, "failed": 0}
+        if not files: return stats
+        done = self.store.imported_file_hashes()
+        known_text = {self._content_hash(content) for _id, _date, content in self.store.iter_text_entries()}
+        known_audio = {os.path.normcase(os.path.abspath(content)) for _id, content in self.store.audio_entries_with_suffix("")}
+        rows, hashes, duplicates, sources = [], [], [], []
+        imported_text = {} # entry id -> source path, mirrored once every source has been read
+        # Managed by hand rather than with `with`: on cancellation the queued hashing is dropped instead of waited for.
+        pool = ProcessPoolExecutor(max_workers=self.workers)
+        try:
+            for i, (path, (file_hash, error)) in enumerate(zip(files, pool.map(hash_file, files, chunksize=64)), 1):
+                if task: task.check_cancelled()
+                if error is not None: stats["failed"] += 1; print(f"Could not import {path}: {error}"); continue
+                if file_hash in done: continue
+                done.add(file_hash)
+                try: row = self._entry_for(path, file_hash, known_text, known_audio)
+                except (OSError, UnicodeDecodeError, ValueError) as e:
+                    stats["failed"] += 1; print(f"Could not import {path}: {e}"); continue
+                if row is None: duplicates.append(file_hash); stats["duplicates"] += 1
+                else: rows.append(row); hashes.append(file_hash); sources.append(path); stats[row[1]] += 1
+                if len(rows) + len(duplicates) >= self.BATCH_SIZE: self._flush(rows, hashes, duplicates, sources, imported_text)
+                if task and i % 200 == 0: task.report_progress(i, len(files))
+            pool.shutdown()
+            self._flush(rows, hashes, duplicates, sources, imported_text)
+        except BaseException: pool.shutdown(wait=False, cancel_futures=True); raise
+        finally: self._write_mirrors(imported_text) # Also for the batches committed before a cancel
+        if task: task.report_progress(len(files), len(files))
+        return stats
+
+    def _flush(self, rows, hashes, duplicates, sources, imported_text):
+        if not rows and not duplicates: return
+        ids = self.store.add_entries(rows, hashes, duplicates)
+        imported_text.update((entry_id, source) for entry_id, row, source in zip(ids, rows, sources) if row[1] == 'text')
+        rows.clear(); hashes.clear(); duplicates.clear(); sources.clear()
+
+    def _write_mirrors(self, imported_text):
+        """Mirror every imported text entry, so TextMirror.rebuild_missing has nothing left to add. A source that was
+        itself a mirror file from the app's entries tree is named after an id the new entry doesn't have; the new
+        mirror replaces it. This runs after all sources are read, so a new mirror can't overwrite one still unread."""
+        if not self.mirror or not imported_text: return
+        written = set()
+        for entry_id, date, content in self.store.iter_text_entries():
+            if entry_id not in imported_text: continue
+            try: written.add(self.mirror.path_for(entry_id, date))
+            except ValueError: continue
+            self.mirror.write(entry_id, date, content)
+        self.mirror.flush()
+        for source in imported_text.values():
+            if self.entries_dir in source.parents and self.MIRROR_NAME.match(source.name) and source not in written:
+                try: source.unlink()
+                except OSError as e: print(f"Could not remove old mirror file {source}: {e}")
+
+    @staticmethod
+    def _content_hash(content):
+        return hashlib.sha256(content.strip().encode('utf-8')).digest()
+
+    def _entry_for(self, path, file_hash, known_text, known_audio):
+        """(date, type, content, tags, timestamp) for one file, or None if it duplicates an existing entry."""
+        if path.suffix.lower() in self.AUDIO_SUFFIXES:
+            key = os.path.normcase(os.path.abspath(path))
+            if key in known_audio: return None
+            known_audio.add(key)
+            when = self.parse_date(path)
+            return (when.strftime("%Y-%m-%d"), 'audio', str(self._place_audio(path, when, file_hash)), "", self._utc_timestamp(when))
+        content, meta = self.parse_text(path.read_text(encoding='utf-8-sig'))
+        if not content: raise ValueError("empty entry")
+        key = self._content_hash(content)
+        if key in known_text: return None
+        known_text.add(key)
+        when = self.parse_date(path, meta.get("date"))
+        return (when.strftime("%Y-%m-%d"), 'text', content, meta.get("tags", ""), self._utc_timestamp(when))
+
+    @staticmethod
+    def _utc_timestamp(when):
+        # `when` is local time, as is the entry's date; the timestamp column holds UTC like CURRENT_TIMESTAMP does.
+        return when.astimezone(datetime.timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+    def _place_audio(self, path, when, file_hash):
+        if not self.copy_audio or self.entries_dir in path.parents: return path.absolute()
+        dest = self.entries_dir / str(when.year) / when.strftime("%B") / f"{when.day:02d}_audio_import_{file_hash[:12]}{path.suffix.lower()}"
+        if not dest.exists():
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            part = dest.with_name(dest.name + ".part")
+            shutil.copy2(path, part); os.replace(part, dest)
+        return dest
+
+    @classmethod
+    def parse_text(cls, text):
+        """Split a file into (content, metadata). Understands the app's mirror header (Date/Type, then a dashed
+        rule), Markdown front matter between '---' lines, and leading 'Date:'/'Tags:' lines."""
+        lines, meta = text.splitlines(), {}
+        if lines and lines[0].strip() == "---" and "---" in (line.strip() for line in lines[1:]):
+            end = next(i for i, line in enumerate(lines[1:], 1) if line.strip() == "---")
+            header, lines = lines[1:end], lines[end + 1:]
+        else:
+            header = []
+            while lines and cls.META_LINE.match(lines[0].strip()): header.append(lines.pop(0))
+            if header and lines and set(lines[0].strip()) == {"-"}: lines.pop(0)
+        for line in header:
+            match = cls.META_LINE.match(line.strip())
+            if match: meta[match.group(1).lower()] = match.group(2).strip().strip('"\'[]')
+        return "\n".join(lines).strip(), meta
+
+    @classmethod
+    def parse_date(cls, path, meta_date=None):
+        """Entry time from metadata, then the file name (YYYY-MM-DD / YYYYMMDD, the app's audio epoch), then the
+        app's <year>/<Month>/<dd>_ layout, falling back to the file's modification time."""
+        mtime = datetime.datetime.fromtimestamp(path.stat().st_mtime)
+        for candidate in (meta_date or "", path.stem):
+            match = cls.DATE_IN_NAME.search(candidate)
+            if match:
+                try: return cls._on_day(datetime.date(*map(int, match.groups())), mtime)
+                except ValueError: pass
+        match = cls.EPOCH_IN_NAME.search(path.stem)
+        if match: return datetime.datetime.fromtimestamp(int(match.group(1)))
+        month, year, day = cls.MONTHS.get(path.parent.name.lower()), path.parent.parent.name, cls.DAY_PREFIX.match(path.name)
+        if month and year.isdigit() and day:
+            try: return cls._on_day(datetime.date(int(year), month, int(day.group(1))), mtime)
+            except ValueError: pass
+        return mtime
+
+    @staticmethod
+    def _on_day(day, mtime):
+        # Keep the file's time of day when it was written that day; otherwise midday keeps the ordering sensible.
+        return mtime if mtime.date() == day else datetime.datetime.combine(day, datetime.time(12))
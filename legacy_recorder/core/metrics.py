@@ -0,0 +1,123 @@
+"""Hot-path timers and counters for diagnosing stutters, plus an optional rolling JSON log.
+
+Instrumented code checks `METRICS.enabled` (one attribute read) before taking any timestamp, so the cost when
+diagnostics are off is a branch per call. When on, each sample is a lock, two additions and a deque append.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+
+class _Series:
+    __slots__ = ("count", "total", "max", "recent")
+
+    def __init__(self, window):
+        self.count, self.total, self.max = 0, 0.0, 0.0
+        self.recent = deque(maxlen=window) # Latest samples, for the p95
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max: self.max = seconds
+        self.recent.append(seconds)
+
+
+class Metrics:
+    """Named duration series (timer/record) and counters (count). Safe to update from any thread."""
+    def __init__(self, window=512):
+        self.enabled = False
+        self.window = window
+        self._lock = threading.Lock()
+        self._series = {}
+        self._counters = {}
+        self._since = time.time()
+        self._log_stop = None
+
+    def record(self, name, seconds):
+        if not self.enabled: return
+        with self._lock:
+            series = self._series.get(name)
+            if series is None: series = self._series[name] = _Series(self.window)
+            series.add(seconds)
+
+    def count(self, name, n=1):
+        if not self.enabled: return
+        with self._lock: self._counters[name] = self._counters.get(name, 0) + n
+
+    @contextmanager
+    def timer(self, name):
+        if not self.enabled: yield; return
+        start = time.perf_counter()
+        try: yield
+        finally: self.record(name, time.perf_counter() - start)
+
+    def timed(self, name):
+        """Decorator form of timer() for methods such as view builders."""
+        def decorate(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled: return func(*args, **kwargs)
+                start = time.perf_counter()
+                try: return func(*args, **kwargs)
+                finally: self.record(name, time.perf_counter() - start)
+            return wrapper
+        return decorate
+
+    def reset(self):
+        with self._lock:
+            self._series.clear(); self._counters.clear()
+            self._since = time.time()
+
+    def snapshot(self):
+        """{"since", "timers": {name: {count, mean_ms, p95_ms, max_ms, total_ms}}, "counters": {name: n}}."""
+        with self._lock:
+            series = {name: (s.count, s.total, s.max, sorted(s.recent)) for name, s in self._series.items()}
+            counters = dict(self._counters)
+            since = self._since
+        timers = {}
+        for name, (count, total, peak, recent) in series.items():
+            p95 = recent[min(len(recent) - 1, int(len(recent) * 0.95))]
+            timers[name] = {"count": count, "mean_ms": round(total / count * 1000, 3), "p95_ms": round(p95 * 1000, 3),
+                            "max_ms": round(peak * 1000, 3), "total_ms": round(total * 1000, 1)}
+        return {"since": since, "timers": timers, "counters": counters}
+
+    def format(self, limit=25):
+        """Plain-text table of the slowest timers (by total time) and all counters, for the diagnostics panel."""
+        snap = self.snapshot()
+        lines = [f"{'timer':44} {'count':>7} {'mean':>8} {'p95':>8} {'max':>8}"]
+        for name, t in sorted(snap["timers"].items(), key=lambda item: -item[1]["total_ms"])[:limit]:
+            lines.append(f"{name[:44]:44} {t['count']:7d} {t['mean_ms']:8.2f} {t['p95_ms']:8.2f} {t['max_ms']:8.2f}")
+        if snap["counters"]:
+            lines.append("")
+            lines += [f"{name[:44]:44} {n:7d}" for name, n in sorted(snap["counters"].items())]
+        return "\n".join(lines)
+
+    def start_log(self, path, interval=10.0, max_bytes=1 << 20, backups=3):
+        """Append a snapshot to `path` as one JSON line every `interval` seconds from a daemon thread, rotating
+        to path.1 .. path.<backups> once the file passes max_bytes."""
+        self.stop_log()
+        stop = self._log_stop = threading.Event()
+        def run():
+            while not stop.wait(interval):
+                try: self.write_log(path, max_bytes, backups)
+                except OSError as e: print(f"Could not write metrics log: {e}")
+        threading.Thread(target=run, daemon=True).start()
+
+    def stop_log(self):
+        if self._log_stop: self._log_stop.set(); self._log_stop = None
+
+    def write_log(self, path, max_bytes=1 << 20, backups=3):
+        if os.path.exists(path) and os.path.getsize(path) >= max_bytes:
+            for i in range(backups - 1, 0, -1):
+                if os.path.exists(f"{path}.{i}"): os.replace(f"{path}.{i}", f"{path}.{i + 1}")
+            os.replace(path, f"{path}.1")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({"time": time.time(), **self.snapshot()}) + "\n")
+
+
+METRICS = Metrics() # Process-wide instance used by the store, audio services and GUI
@@ -0,0 +1,93 @@
+"""Plain-text mirror files for text entries."""
+
+import datetime
+import os
+import threading
+from pathlib import Path
+
+
+class TextMirror:
+    """Plain-text copy of every text entry under entries/<year>/<Month>/<dd>_written_<id>.txt.
+
+    One file per entry id, so entries never overwrite each other. Writes are queued and flushed together a
+    moment later (repeat writes of an entry coalesce); each file goes to a temp name and is renamed into place,
+    and each touched directory is synced once per flush rather than once per file.
+    """
+    FLUSH_DELAY = 0.5
+    CHECKED_MARKER = ".checked-through" # Highest entry id rebuild_missing has already verified
+
+    def __init__(self, entries_dir):
+        self.entries_dir = Path(entries_dir)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock() # The timer and an explicit flush() would otherwise share <name>.tmp files
+        self._timer = None
+
+    def path_for(self, entry_id, date):
+        day = datetime.date.fromisoformat(date)
+        return self.entries_dir / str(day.year) / day.strftime("%B") / f"{day.day:02d}_written_{entry_id}.txt"
+
+    @staticmethod
+    def render(date, content):
+        return f"Date: {date}\nType: Text Entry\n{'-'*50}\n{content}"
+
+    def write(self, entry_id, date, content):
+        with self._lock:
+            self._pending[entry_id] = (date, content)
+            if self._timer is None:
+                self._timer = threading.Timer(self.FLUSH_DELAY, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """Write everything queued; returns the number of files written. If a write fails, the entries not yet
+        written go back in the queue (behind any newer write of the same entry) and the error is raised."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = list(self._pending.items()), {}
+                if self._timer is not None: self._timer.cancel(); self._timer = None
+            directories, processed, files = set(), 0, 0
+            try:
+                for entry_id, (date, content) in pending:
+                    try: path = self.path_for(entry_id, date)
+                    except ValueError: processed += 1; continue # Unparseable date; nothing sensible to name the file after
+                    if path.parent not in directories: path.parent.mkdir(parents=True, exist_ok=True); directories.add(path.parent)
+                    tmp = path.with_name(path.name + ".tmp")
+                    with open(tmp, 'w', encoding='utf-8') as f:
+                        f.write(self.render(date, content)); f.flush(); os.fsync(f.fileno())
+                    os.replace(tmp, path)
+                    processed += 1; files += 1
+            except BaseException:
+                with self._lock:
+                    for entry_id, value in pending[processed:]: self._pending.setdefault(entry_id, value)
+                raise
+            if os.name != 'nt': # Windows can't open directories to fsync them; rename there is already durable via NTFS journaling
+                for directory in directories:
+                    fd = os.open(directory, os.O_RDONLY)
+                    try: os.fsync(fd)
+                    finally: os.close(fd)
+            return files
+
+    def rebuild_missing(self, store, task=None, full=False):
+        """Consistency check: queue a mirror for every text entry whose file is missing, then flush in one batch.
+        Each month directory is listed once rather than stat-ing every file. Unless `full`, only entries added
+        since the last check are looked at (a crash before the delayed flush is what leaves mirrors missing), so
+        the check at each start-up doesn't grow with the whole journal."""
+        marker = self.entries_dir / self.CHECKED_MARKER
+        try: checked = 0 if full else int(marker.read_text(encoding='utf-8'))
+        except (OSError, ValueError): checked = 0
+        listings, last_id = {}, checked
+        for entry_id, date, content in store.iter_text_entries(after_id=checked):
+            if task: task.check_cancelled()
+            last_id = entry_id
+            try: path = self.path_for(entry_id, date)
+            except ValueError: continue # Unparseable date; nothing sensible to name the file after
+            if path.parent not in listings: listings[path.parent] = set(os.listdir(path.parent)) if path.parent.is_dir() else set()
+            if path.name not in listings[path.parent]:
+                with self._lock: self._pending[entry_id] = (date, content)
+        rebuilt = self.flush()
+        if last_id != checked:
+            marker.parent.mkdir(parents=True, exist_ok=True)
+            tmp = marker.with_name(marker.name + ".tmp")
+            tmp.write_text(str(last_id), encoding='utf-8'); os.replace(tmp, marker)
+        return rebuilt
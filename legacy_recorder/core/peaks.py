@@ -0,0 +1,177 @@
+"""Precomputed waveform envelopes so audio entries can be drawn without decoding their files.
+
+A peaks file holds int8 (min, max) pairs at several zoom levels (256, 1024, 4096 and 16384 samples per pair).
+The finest level is computed in one vectorized pass over the audio, either as it is recorded (PeakBuilder fed from
+the writer thread) or the first time a timeline row shows the entry; each coarser level is reduced from the one below it. Files live
+in a cache directory keyed by entry id and record the audio file's size and mtime, so a transcoded or replaced
+recording is recomputed rather than drawn stale.
+"""
+import os
+import struct
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+BASE = 256 # Samples per (min, max) pair at the finest level
+FACTOR = 4 # Each level is this much coarser than the previous one
+LEVELS = 4
+HEADER = struct.Struct('<4sBBHIQQQ') # magic, version, levels, reserved, sample rate, frames, source size, source mtime_ns
+LEVEL_HEADER = struct.Struct('<II') # samples per pair, pairs
+MAGIC, VERSION = b'LRPK', 1
+
+
+class Peaks:
+    """Multi-resolution envelope: `levels` is a list of (samples_per_pair, int8 array of shape (pairs, 2))."""
+    def __init__(self, sample_rate, frames, levels):
+        self.sample_rate = sample_rate
+        self.frames = frames
+        self.levels = levels
+
+    @property
+    def duration(self):
+        return self.frames / self.sample_rate if self.sample_rate else 0.0
+
+    def envelope(self, width):
+        """(mins, maxs) as float32 in [-1, 1] with at most `width` points, from the coarsest level that still has
+        at least `width` pairs."""
+        width = max(1, int(width))
+        pairs = next((pairs for _spp, pairs in reversed(self.levels) if len(pairs) >= width), self.levels[0][1])
+        if len(pairs) > width:
+            edges = np.linspace(0, len(pairs), width + 1).astype(np.intp)[:-1]
+            pairs = np.stack((np.minimum.reduceat(pairs[:, 0], edges), np.maximum.reduceat(pairs[:, 1], edges)), axis=1)
+        scaled = pairs.astype(np.float32) / 127
+        return scaled[:, 0], scaled[:, 1]
+
+    def to_bytes(self, source_size=0, source_mtime_ns=0):
+        parts = [HEADER.pack(MAGIC, VERSION, len(self.levels), 0, self.sample_rate, self.frames, source_size, source_mtime_ns)]
+        parts += [LEVEL_HEADER.pack(spp, len(pairs)) for spp, pairs in self.levels]
+        parts += [np.ascontiguousarray(pairs, dtype=np.int8).tobytes() for _spp, pairs in self.levels]
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """(Peaks, (source_size, source_mtime_ns)); raises ValueError for anything that isn't a complete peaks file."""
+        if len(data) < HEADER.size: raise ValueError("truncated peaks file")
+        magic, version, count, _reserved, sample_rate, frames, size, mtime_ns = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION: raise ValueError("not a peaks file")
+        offset, shapes = HEADER.size, []
+        for _ in range(count):
+            shapes.append(LEVEL_HEADER.unpack_from(data, offset)); offset += LEVEL_HEADER.size
+        levels = []
+        for spp, pairs in shapes:
+            if offset + pairs * 2 > len(data): raise ValueError("truncated peaks file")
+            levels.append((spp, np.frombuffer(data, np.int8, pairs * 2, offset).reshape(pairs, 2))); offset += pairs * 2
+        if not levels: raise ValueError("empty peaks file")
+        return cls(sample_rate, frames, levels), (size, mtime_ns)
+
+
+class PeakBuilder:
+    """Accumulates the finest envelope level block by block; finish() derives the coarser levels."""
+    def __init__(self, sample_rate):
+        self.sample_rate = sample_rate
+        self.frames = 0
+        self._mins, self._maxs = [], []
+        self._carry = np.zeros(0, dtype=np.float32) # Samples short of a whole BASE run, kept for the next block
+
+    def add(self, block):
+        samples = np.asarray(block, dtype=np.float32).reshape(-1)
+        self.frames += len(samples)
+        if len(self._carry): samples = np.concatenate((self._carry, samples))
+        whole = len(samples) // BASE * BASE
+        if whole:
+            runs = samples[:whole].reshape(-1, BASE)
+            self._mins.append(runs.min(axis=1)); self._maxs.append(runs.max(axis=1))
+        self._carry = samples[whole:].copy()
+
+    def finish(self):
+        mins, maxs = list(self._mins), list(self._maxs)
+        if len(self._carry): mins.append(self._carry.min(keepdims=True)); maxs.append(self._carry.max(keepdims=True))
+        low = np.concatenate(mins) if mins else np.zeros(1, dtype=np.float32)
+        high = np.concatenate(maxs) if maxs else np.zeros(1, dtype=np.float32)
+        # Round outwards so quantization never makes a peak look quieter than it is.
+        pairs = np.stack((np.floor(np.clip(low, -1, 1) * 127), np.ceil(np.clip(high, -1, 1) * 127)), axis=1).astype(np.int8)
+        levels = [(BASE, pairs)]
+        for _ in range(LEVELS - 1):
+            if len(pairs) <= 1: break
+            padded = np.pad(pairs, ((0, -len(pairs) % FACTOR), (0, 0)), mode='edge').reshape(-1, FACTOR, 2)
+            pairs = np.stack((padded[:, :, 0].min(axis=1), padded[:, :, 1].max(axis=1)), axis=1)
+            levels.append((levels[-1][0] * FACTOR, pairs))
+        return Peaks(self.sample_rate, self.frames, levels)
+
+
+def compute_peaks(filepath, task=None, chunk_frames=BASE * 4096):
+    """Read an audio file once, a chunk at a time, and return its Peaks."""
+    from .audio import open_audio_source
+    source = open_audio_source(filepath)
+    try:
+        builder = PeakBuilder(source.samplerate)
+        for start in range(0, source.frames, chunk_frames):
+            if task: task.check_cancelled()
+            builder.add(source.read(start, chunk_frames))
+        return builder.finish()
+    finally: source.close()
+
+
+class PeakCache:
+    """Peaks files under `cache_dir` (<entry id>.peaks) with a small in-memory LRU in front of them."""
+    def __init__(self, cache_dir, memory_items=256):
+        self.cache_dir = Path(cache_dir)
+        self.memory_items = memory_items
+        self._memory = OrderedDict() # entry_id -> (audio path, source stamp, Peaks)
+        self._lock = threading.Lock()
+
+    def path_for(self, entry_id):
+        return self.cache_dir / f"{entry_id}.peaks"
+
+    @staticmethod
+    def _stamp(audio_path):
+        stat = os.stat(audio_path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def peek(self, entry_id, audio_path):
+        """Peaks from the memory LRU only, without touching the disk; safe to call from the GUI thread."""
+        with self._lock:
+            hit = self._memory.get(entry_id)
+            if hit and hit[0] == str(audio_path): self._memory.move_to_end(entry_id); return hit[2]
+        return None
+
+    def get(self, entry_id, audio_path):
+        """Cached Peaks for the entry, or None if missing or made from a different version of the audio file."""
+        try: stamp = self._stamp(audio_path)
+        except OSError: return None
+        with self._lock:
+            hit = self._memory.get(entry_id)
+            if hit and hit[:2] == (str(audio_path), stamp): self._memory.move_to_end(entry_id); return hit[2]
+        try: peaks, file_stamp = Peaks.from_bytes(self.path_for(entry_id).read_bytes())
+        except (OSError, ValueError, struct.error): return None
+        if file_stamp != stamp: return None
+        self._remember(entry_id, audio_path, stamp, peaks)
+        return peaks
+
+    def load(self, entry_id, audio_path, task=None):
+        """Current Peaks for the entry, computing them if the cache has none; None if the audio file is gone."""
+        peaks = self.get(entry_id, audio_path)
+        if peaks is None and os.path.exists(audio_path): peaks = self.build(entry_id, audio_path, task)
+        return peaks
+
+    def put(self, entry_id, audio_path, peaks):
+        stamp = self._stamp(audio_path)
+        path = self.path_for(entry_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        part = path.with_name(f"{path.name}.{threading.get_ident()}.part") # Two rows may build the same entry
+        part.write_bytes(peaks.to_bytes(*stamp))
+        os.replace(part, path)
+        self._remember(entry_id, audio_path, stamp, peaks)
+
+    def build(self, entry_id, audio_path, task=None):
+        peaks = compute_peaks(audio_path, task)
+        self.put(entry_id, audio_path, peaks)
+        return peaks
+
+    def _remember(self, entry_id, audio_path, stamp, peaks):
+        with self._lock:
+            self._memory[entry_id] = (str(audio_path), stamp, peaks)
+            self._memory.move_to_end(entry_id)
+            while len(self._memory) > self.memory_items: self._memory.popitem(last=False)
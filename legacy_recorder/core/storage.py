@@ -0,0 +1,531 @@
+"""SQLite storage for legacy.db: schema migrations, entries, search, tags and dashboard statistics."""
+
+import datetime
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from .metrics import METRICS
+from .tasks import TaskCancelled
+
+
+class EntryStore:
+    """Data-access layer for legacy.db, shared by the GUI, recorder and scheduler threads.
+
+    Each thread gets its own pooled connection (WAL lets readers proceed while another thread writes) and
+    writers are serialized in-process so they never wait on SQLite's busy handler. Statements are fixed
+    strings so sqlite3's per-connection statement cache reuses the prepared form.
+    """
+    PRAGMAS = (
+        "PRAGMA journal_mode=WAL", "PRAGMA synchronous=NORMAL", "PRAGMA busy_timeout=5000",
+        "PRAGMA temp_store=MEMORY", "PRAGMA cache_size=-8000", "PRAGMA foreign_keys=ON",
+    )
+    # Applied in order; PRAGMA user_version records how many have run against the file.
+    MIGRATIONS = ("_migrate_base_schema", "_migrate_indexes", "_migrate_tag_tables", "_migrate_tag_counts", "_migrate_import_log",
+                  "_migrate_transcripts", "_migrate_prefix_index")
+    SQL_INSERT_ENTRY = "INSERT INTO entries (date, type, content, tags) VALUES (?, ?, ?, ?)"
+    SQL_INSERT_ENTRY_AT = "INSERT INTO entries (date, type, content, tags, timestamp) VALUES (?, ?, ?, ?, ?)"
+    SQL_ENTRY_SEQUENCE = "SELECT COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'entries'), 0)"
+    SQL_LOG_IMPORT = "INSERT OR IGNORE INTO import_log (file_hash, entry_id) VALUES (?, ?)"
+    SQL_GET_ENTRY = "SELECT date, content, tags, timestamp FROM entries WHERE id = ?"
+    SQL_RECENT_ENTRIES = "SELECT id, date, type, content, tags, timestamp FROM entries ORDER BY timestamp DESC LIMIT ?"
+    # Ranking and snippet extraction are separate passes: snippets are only built for the rows actually shown.
+    SQL_SEARCH_RANKED_IDS = "SELECT rowid FROM entries_fts WHERE entries_fts MATCH ? {tag_filter}ORDER BY bm25(entries_fts, 1.0, 2.0, 1.0) LIMIT ?"
+    # Column -1 lets FTS5 pick the best-matching column, so audio results get a snippet of their transcript.
+    SQL_SEARCH_SNIPPETS = ("SELECT e.id, e.date, e.type, e.content, e.tags, e.timestamp, snippet(entries_fts, -1, ?, ?, '…', 24) "
+                           "FROM entries_fts JOIN entries e ON e.id = entries_fts.rowid "
+                           "WHERE entries_fts MATCH ? AND entries_fts.rowid IN ({ids})")
+    SQL_SEARCH_ROWS = "SELECT id, date, type, content, tags, timestamp, NULL FROM entries WHERE id IN ({ids})"
+    SQL_SEARCH_LIKE = ("SELECT id FROM entries "
+                       "WHERE (LOWER(content || ' ' || COALESCE(transcript, '')) LIKE ? OR id IN (SELECT entry_id FROM entry_tags WHERE tag_id = (SELECT id FROM tags WHERE name = ?))) "
+                       "{tag_filter}ORDER BY timestamp DESC LIMIT ?")
+    SQL_ENTRIES_BY_ID = "SELECT id, date, type, content, tags, timestamp, NULL FROM entries WHERE id IN ({tagged}) ORDER BY timestamp DESC, id DESC LIMIT ?"
+    SQL_TAGGED_ENTRY_IDS = "SELECT id FROM entries WHERE id IN ({tagged}) ORDER BY timestamp DESC, id DESC LIMIT ?"
+    # One primary-key range scan of entry_tags per tag; INTERSECT/UNION combine them for "all"/"any" filters.
+    SQL_TAGGED_IDS = "SELECT entry_id FROM entry_tags WHERE tag_id = (SELECT id FROM tags WHERE name = ?)"
+    SQL_TAG_COUNTS = "SELECT name, entry_count FROM tags WHERE entry_count > 0 ORDER BY entry_count DESC, name LIMIT ?"
+    SNIPPET_MARKERS = ("«", "»")
+    SEARCH_PREFIX_LENGTHS = "2 3 4" # FTS5 prefix indexes; longer prefixes match few enough terms to expand directly
+    SEARCH_CACHE_SIZE = 64 # Recent (query, tags) -> ranked id lists, so retyping or backspacing doesn't re-rank
+    # Counts come from the trigger-maintained daily_stats summary, one row per day with entries.
+    SQL_COUNT_ALL = "SELECT COALESCE(SUM(text_count + audio_count), 0) FROM daily_stats"
+    SQL_TOTALS = "SELECT COALESCE(SUM(text_count), 0), COALESCE(SUM(audio_count), 0), MAX(date) FROM daily_stats"
+    SQL_ACTIVITY = "SELECT date, text_count + audio_count FROM daily_stats WHERE date BETWEEN ? AND ?"
+    SQL_TIMELINE_COLUMNS = "SELECT id, date, type, CASE WHEN type = 'text' THEN substr(content, 1, 201) ELSE content END, tags, timestamp FROM entries "
+    SQL_TIMELINE_FIRST = SQL_TIMELINE_COLUMNS + "ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?"
+    SQL_TIMELINE_AFTER = SQL_TIMELINE_COLUMNS + "WHERE (timestamp, id) < (?, ?) ORDER BY timestamp DESC, id DESC LIMIT ?"
+    SQL_AUDIO_BY_SUFFIX = "SELECT id, content FROM entries WHERE type = 'audio' AND lower(content) LIKE ? ORDER BY id"
+    SQL_UPDATE_CONTENT = "UPDATE entries SET content = ? WHERE id = ? AND content = ?"
+    SQL_EXPORT_ENTRIES = "SELECT id, date, type, content, tags, timestamp FROM entries WHERE day BETWEEN ? AND ? {tag_filter}ORDER BY timestamp, id"
+    SQL_EXPORT_COUNT = "SELECT COUNT(*) FROM entries WHERE day BETWEEN ? AND ? {tag_filter}"
+    SQL_TEXT_ENTRIES = "SELECT id, date, content FROM entries WHERE type = 'text' AND id > ? ORDER BY id"
+    # Transcription queue: re-queuing keeps the higher priority and clears earlier failures.
+    SQL_ENQUEUE_TRANSCRIPTION = ("INSERT INTO transcription_queue (entry_id, priority) SELECT id, ? FROM entries "
+                                 "WHERE id = ? AND type = 'audio' AND transcript IS NULL "
+                                 "ON CONFLICT(entry_id) DO UPDATE SET priority = max(priority, excluded.priority), attempts = 0")
+    SQL_ENQUEUE_UNTRANSCRIBED = ("INSERT INTO transcription_queue (entry_id, priority) SELECT id, ? FROM entries "
+                                 "WHERE type = 'audio' AND transcript IS NULL "
+                                 "ON CONFLICT(entry_id) DO UPDATE SET priority = max(priority, excluded.priority), attempts = 0")
+    SQL_NEXT_TRANSCRIPTIONS = ("SELECT q.entry_id, e.content FROM transcription_queue q JOIN entries e ON e.id = q.entry_id "
+                               "WHERE q.attempts < ? ORDER BY q.priority DESC, q.entry_id LIMIT ?")
+    SQL_SAVE_TRANSCRIPT = "UPDATE entries SET transcript = ? WHERE id = ?"
+    SQL_DEQUEUE_TRANSCRIPTION = "DELETE FROM transcription_queue WHERE entry_id = ?"
+    SQL_TRANSCRIPTION_FAILED = "UPDATE transcription_queue SET attempts = attempts + 1, last_error = ? WHERE entry_id = ?"
+    SQL_TRANSCRIPTION_COUNTS = ("SELECT (SELECT COUNT(*) FROM entries WHERE type = 'audio' AND transcript IS NOT NULL), "
+                                "(SELECT COUNT(*) FROM transcription_queue WHERE attempts < ?), "
+                                "(SELECT COUNT(*) FROM transcription_queue WHERE attempts >= ?)")
+    TRANSCRIPTION_ATTEMPTS = 3 # A recording that fails this often is left alone until it is queued again
+    SQL_PERIOD_COUNT = "SELECT COALESCE(SUM(text_count + audio_count), 0) FROM daily_stats WHERE date BETWEEN ? AND ?"
+    SQL_INSERT_TAG = "INSERT OR IGNORE INTO tags (name) VALUES (?)"
+    SQL_LINK_TAG = "INSERT OR IGNORE INTO entry_tags (tag_id, entry_id) SELECT id, ? FROM tags WHERE name = ?"
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._connections = {}
+        self._pool_lock = threading.Lock()
+        self._write_lock = threading.RLock()
+        self.fts_enabled = False
+        self.generation = 0 # Bumped on every commit made through this store
+        self._external_writes = 0 # Bumped when a connection notices a commit made outside this store
+        self._stats_cache = {}
+        self._search_cache = OrderedDict()
+        self._search_cache_lock = threading.Lock()
+        self.setup_schema()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None, check_same_thread=False, cached_statements=128)
+            for pragma in self.PRAGMAS: conn.execute(pragma)
+            self._local.conn = conn
+            with self._pool_lock:
+                # Threads such as the per-recording capture thread come and go; release what they left behind.
+                for ident, (thread, old_conn) in list(self._connections.items()):
+                    if not thread.is_alive(): old_conn.close(); del self._connections[ident]
+                self._connections[threading.get_ident()] = (threading.current_thread(), conn)
+        return conn
+
+    def _execute(self, sql, params=()):
+        if not METRICS.enabled: return self._connection().execute(sql, params)
+        # Covers planning and stepping to the first row, which for the sorted/aggregate queries is nearly all of it.
+        with METRICS.timer(self._sql_label(sql)): return self._connection().execute(sql, params)
+
+    @classmethod
+    def _sql_label(cls, sql):
+        labels = cls.__dict__.get("_sql_labels")
+        if labels is None:
+            labels = cls._sql_labels = {value: f"sql.{name[4:].lower()}" for name, value in vars(cls).items()
+                                        if name.startswith("SQL_") and isinstance(value, str)}
+        label = labels.get(sql)
+        if label is None: label = labels[sql] = "sql: " + " ".join(sql.split())[:48] # Formatted queries (tag filters)
+        return label
+
+    @contextmanager
+    def transaction(self):
+        conn = self._connection()
+        waited = METRICS.enabled and time.perf_counter()
+        with self._write_lock:
+            if conn.in_transaction: yield conn; return
+            if waited: METRICS.record("sql.write_lock_wait", time.perf_counter() - waited)
+            with METRICS.timer("sql.transaction"):
+                conn.execute("BEGIN IMMEDIATE")
+                try: yield conn
+                except BaseException: conn.execute("ROLLBACK"); raise
+                else:
+                    conn.execute("COMMIT")
+                    self.generation += 1
+
+    def backup_to(self, dest_path):
+        """Consistent copy of the database via SQLite's online backup API; copies in steps so writers aren't blocked for long."""
+        dest = sqlite3.connect(dest_path)
+        try: self._connection().backup(dest, pages=4096)
+        finally: dest.close()
+
+    def close(self):
+        with self._pool_lock:
+            for _thread, conn in self._connections.values(): conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def setup_schema(self):
+        """Bring the file up to the latest schema. Each migration commits together with its PRAGMA user_version bump,
+        so an interrupted upgrade rolls back to the last completed step and resumes from there on the next start."""
+        version = self._execute("PRAGMA user_version").fetchone()[0]
+        if version > len(self.MIGRATIONS):
+            raise RuntimeError(f"{self.db_path} uses schema version {version}; this version of Legacy Recorder supports up to {len(self.MIGRATIONS)}.")
+        for number, migration in enumerate(self.MIGRATIONS[version:], start=version + 1):
+            with self.transaction() as conn:
+                if conn.execute("PRAGMA user_version").fetchone()[0] >= number: continue # Upgraded by another process meanwhile
+                getattr(self, migration)(conn)
+                conn.execute(f"PRAGMA user_version = {number}")
+        self.fts_enabled = self._execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='entries_fts'").fetchone() is not None
+
+    def _migrate_base_schema(self, conn):
+        # Version 1 is the layout that predates user_version; every statement tolerates a file that already has it.
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS entries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                date TEXT NOT NULL,
+                type TEXT CHECK(type IN ('text', 'audio')) NOT NULL,
+                content TEXT NOT NULL,
+                tags TEXT,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        self._setup_search_index(conn)
+        self._setup_daily_stats(conn)
+
+    def _migrate_indexes(self, conn):
+        # `day` is the date as a YYYYMMDD integer, derived by SQLite so no writer can let it drift from `date`.
+        conn.execute("ALTER TABLE entries ADD COLUMN day INTEGER GENERATED ALWAYS AS (CAST(replace(date, '-', '') AS INTEGER)) VIRTUAL")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_day ON entries(day)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_date ON entries(date)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_timestamp ON entries(timestamp, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_type_date ON entries(type, date)")
+
+    def _migrate_tag_tables(self, conn):
+        conn.execute("CREATE TABLE IF NOT EXISTS tags (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE COLLATE NOCASE)")
+        conn.execute('''CREATE TABLE IF NOT EXISTS entry_tags (
+            tag_id INTEGER NOT NULL REFERENCES tags(id),
+            entry_id INTEGER NOT NULL REFERENCES entries(id) ON DELETE CASCADE,
+            PRIMARY KEY (tag_id, entry_id)
+        ) WITHOUT ROWID''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_entry_tags_entry ON entry_tags(entry_id)")
+        for entry_id, tags in conn.execute("SELECT id, tags FROM entries WHERE tags IS NOT NULL AND tags != ''").fetchall():
+            self._link_tags(conn, entry_id, tags)
+
+    def _migrate_tag_counts(self, conn):
+        # Per-tag totals kept by triggers so the tag cloud never has to count entry_tags rows.
+        conn.execute("ALTER TABLE tags ADD COLUMN entry_count INTEGER NOT NULL DEFAULT 0")
+        conn.execute('''CREATE TRIGGER IF NOT EXISTS entry_tags_ai AFTER INSERT ON entry_tags BEGIN
+            UPDATE tags SET entry_count = entry_count + 1 WHERE id = new.tag_id;
+        END''')
+        conn.execute('''CREATE TRIGGER IF NOT EXISTS entry_tags_ad AFTER DELETE ON entry_tags BEGIN
+            UPDATE tags SET entry_count = entry_count - 1 WHERE id = old.tag_id;
+        END''')
+        conn.execute("UPDATE tags SET entry_count = (SELECT COUNT(*) FROM entry_tags WHERE tag_id = tags.id)")
+
+    def _migrate_import_log(self, conn):
+        # Hashes of files the bulk importer has handled (entry_id NULL for duplicates), so re-runs resume.
+        conn.execute("CREATE TABLE IF NOT EXISTS import_log (file_hash TEXT PRIMARY KEY, entry_id INTEGER) WITHOUT ROWID")
+
+    def _migrate_transcripts(self, conn):
+        # Transcripts are stored on the audio entry and indexed with it; the queue table makes transcription resumable.
+        conn.execute("ALTER TABLE entries ADD COLUMN transcript TEXT")
+        conn.execute('''CREATE TABLE IF NOT EXISTS transcription_queue (
+            entry_id INTEGER PRIMARY KEY REFERENCES entries(id) ON DELETE CASCADE,
+            priority INTEGER NOT NULL DEFAULT 0,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT
+        )''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_transcription_queue_order ON transcription_queue(priority DESC, entry_id)")
+        # FTS5 tables can't gain columns: recreate the index (and its triggers) with the transcript column.
+        self._rebuild_search_index(conn, ("content", "tags", "transcript"))
+
+    def _migrate_prefix_index(self, conn):
+        # Search-as-you-type turns the word being typed into a prefix query; without prefix indexes FTS5 merges
+        # the doclist of every matching term, for ranking and again for each page of snippets.
+        self._rebuild_search_index(conn, ("content", "tags", "transcript"), self.SEARCH_PREFIX_LENGTHS)
+
+    def _rebuild_search_index(self, conn, columns, prefix=None):
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='entries_fts'").fetchone(): return
+        for trigger in ("entries_fts_ai", "entries_fts_ad", "entries_fts_au"): conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        conn.execute("DROP TABLE entries_fts")
+        self._setup_search_index(conn, columns, prefix)
+
+    @staticmethod
+    def split_tags(tags):
+        """Comma-separated tag string → unique, trimmed tag names in their original order."""
+        seen, names = set(), []
+        for name in (tags or "").split(","):
+            name = " ".join(name.split())
+            if name and name.lower() not in seen: seen.add(name.lower()); names.append(name)
+        return names
+
+    def _link_tags(self, conn, entry_id, tags):
+        for name in self.split_tags(tags):
+            conn.execute(self.SQL_INSERT_TAG, (name,))
+            conn.execute(self.SQL_LINK_TAG, (entry_id, name))
+
+    def _setup_search_index(self, conn, columns=("content", "tags"), prefix=None):
+        # External-content FTS5 index over the given entries columns, kept in sync by triggers.
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='entries_fts'").fetchone()
+        names = ", ".join(columns)
+        old, new = (", ".join(f"{prefix}.{column}" for column in columns) for prefix in ("old", "new"))
+        try:
+            conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5("
+                         f"{names}, content='entries', content_rowid='id', tokenize='unicode61 remove_diacritics 2'"
+                         + (f", prefix='{prefix}')" if prefix else ")"))
+        except sqlite3.OperationalError as e:
+            print(f"Full-text search unavailable, falling back to LIKE queries: {e}")
+            return
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS entries_fts_ai AFTER INSERT ON entries BEGIN
+            INSERT INTO entries_fts(rowid, {names}) VALUES (new.id, {new});
+        END''')
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS entries_fts_ad AFTER DELETE ON entries BEGIN
+            INSERT INTO entries_fts(entries_fts, rowid, {names}) VALUES ('delete', old.id, {old});
+        END''')
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS entries_fts_au AFTER UPDATE OF {names} ON entries BEGIN
+            INSERT INTO entries_fts(entries_fts, rowid, {names}) VALUES ('delete', old.id, {old});
+            INSERT INTO entries_fts(rowid, {names}) VALUES (new.id, {new});
+        END''')
+        if not exists: conn.execute("INSERT INTO entries_fts(entries_fts) VALUES ('rebuild')") # Backfill existing journals
+
+    def add_entry(self, date, entry_type, content, tags):
+        with self.transaction() as conn:
+            entry_id = conn.execute(self.SQL_INSERT_ENTRY, (date, entry_type, content, tags)).lastrowid
+            self._link_tags(conn, entry_id, tags)
+            return entry_id
+
+    def add_entries(self, rows, file_hashes=None, duplicate_hashes=()):
+        """Bulk insert (date, type, content, tags, timestamp) rows with one executemany in one transaction and
+        return their ids. `file_hashes` (parallel to rows) and `duplicate_hashes` (files skipped as duplicates)
+        go to import_log in the same transaction, so an interrupted import never logs files it didn't store."""
+        rows = list(rows)
+        with self.transaction() as conn:
+            # AUTOINCREMENT ids only grow and the write lock keeps other writers out, so the batch's ids are contiguous.
+            first_id = conn.execute(self.SQL_ENTRY_SEQUENCE).fetchone()[0] + 1
+            conn.executemany(self.SQL_INSERT_ENTRY_AT, rows)
+            ids = list(range(first_id, first_id + len(rows)))
+            names = {name for row in rows for name in self.split_tags(row[3])}
+            if names:
+                conn.executemany(self.SQL_INSERT_TAG, ((name,) for name in names))
+                conn.executemany(self.SQL_LINK_TAG, ((entry_id, name) for entry_id, row in zip(ids, rows) for name in self.split_tags(row[3])))
+            if file_hashes: conn.executemany(self.SQL_LOG_IMPORT, zip(file_hashes, ids))
+            conn.executemany(self.SQL_LOG_IMPORT, ((h, None) for h in duplicate_hashes))
+            return ids
+
+    def imported_file_hashes(self):
+        return {row[0] for row in self._execute("SELECT file_hash FROM import_log")}
+
+    def audio_entries_with_suffix(self, suffix):
+        return self._execute(self.SQL_AUDIO_BY_SUFFIX, (f'%{suffix.lower()}',)).fetchall()
+
+    def update_entry_content(self, entry_id, old_content, new_content):
+        with self.transaction() as conn:
+            return conn.execute(self.SQL_UPDATE_CONTENT, (new_content, entry_id, old_content)).rowcount
+
+    def enqueue_transcriptions(self, entry_ids=None, priority=0):
+        """Queue audio entries that have no transcript yet: all of them, or only `entry_ids`. Returns how many rows changed."""
+        with self.transaction() as conn:
+            if entry_ids is None: return conn.execute(self.SQL_ENQUEUE_UNTRANSCRIBED, (priority,)).rowcount
+            return sum(conn.execute(self.SQL_ENQUEUE_TRANSCRIPTION, (priority, entry_id)).rowcount for entry_id in entry_ids)
+
+    def next_transcriptions(self, limit, exclude=()):
+        """Highest-priority queued (entry_id, audio path) pairs, skipping ids already being transcribed."""
+        rows = self._execute(self.SQL_NEXT_TRANSCRIPTIONS, (self.TRANSCRIPTION_ATTEMPTS, limit + len(exclude))).fetchall()
+        return [row for row in rows if row[0] not in exclude][:limit]
+
+    def save_transcripts(self, results):
+        """Store (entry_id, transcript, error) results in one transaction: transcripts leave the queue, errors count an attempt."""
+        with self.transaction() as conn:
+            for entry_id, transcript, error in results:
+                if error is None:
+                    conn.execute(self.SQL_SAVE_TRANSCRIPT, (transcript, entry_id))
+                    conn.execute(self.SQL_DEQUEUE_TRANSCRIPTION, (entry_id,))
+                else: conn.execute(self.SQL_TRANSCRIPTION_FAILED, (error, entry_id))
+
+    def transcription_counts(self):
+        attempts = self.TRANSCRIPTION_ATTEMPTS
+        transcribed, pending, failed = self._execute(self.SQL_TRANSCRIPTION_COUNTS, (attempts, attempts)).fetchone()
+        return {"transcribed": transcribed, "pending": pending, "failed": failed}
+
+    def get_entry(self, entry_id):
+        return self._execute(self.SQL_GET_ENTRY, (entry_id,)).fetchone()
+
+    def recent_entries(self, limit=20):
+        return self._execute(self.SQL_RECENT_ENTRIES, (limit,)).fetchall()
+
+    def _setup_daily_stats(self, conn):
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='daily_stats'").fetchone()
+        conn.execute('''CREATE TABLE IF NOT EXISTS daily_stats (
+            date TEXT PRIMARY KEY,
+            text_count INTEGER NOT NULL DEFAULT 0,
+            audio_count INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID''')
+        conn.execute('''CREATE TRIGGER IF NOT EXISTS daily_stats_ai AFTER INSERT ON entries BEGIN
+            INSERT INTO daily_stats(date, text_count, audio_count) VALUES (new.date, new.type = 'text', new.type = 'audio')
+                ON CONFLICT(date) DO UPDATE SET text_count = text_count + excluded.text_count, audio_count = audio_count + excluded.audio_count;
+        END''')
+        conn.execute('''CREATE TRIGGER IF NOT EXISTS daily_stats_ad AFTER DELETE ON entries BEGIN
+            UPDATE daily_stats SET text_count = text_count - (old.type = 'text'), audio_count = audio_count - (old.type = 'audio') WHERE date = old.date;
+            DELETE FROM daily_stats WHERE date = old.date AND text_count <= 0 AND audio_count <= 0;
+        END''')
+        conn.execute('''CREATE TRIGGER IF NOT EXISTS daily_stats_au AFTER UPDATE OF date, type ON entries BEGIN
+            UPDATE daily_stats SET text_count = text_count - (old.type = 'text'), audio_count = audio_count - (old.type = 'audio') WHERE date = old.date;
+            DELETE FROM daily_stats WHERE date = old.date AND text_count <= 0 AND audio_count <= 0;
+            INSERT INTO daily_stats(date, text_count, audio_count) VALUES (new.date, new.type = 'text', new.type = 'audio')
+                ON CONFLICT(date) DO UPDATE SET text_count = text_count + excluded.text_count, audio_count = audio_count + excluded.audio_count;
+        END''')
+        if not exists:
+            conn.execute("INSERT INTO daily_stats(date, text_count, audio_count) "
+                         "SELECT date, SUM(type = 'text'), SUM(type = 'audio') FROM entries GROUP BY date")
+
+    def _data_stamp(self):
+        """Changes whenever this store commits or another process writes the file. PRAGMA data_version is per
+        connection, so each thread's connection reports what it has seen change into one shared counter."""
+        version = self._connection().execute("PRAGMA data_version").fetchone()[0]
+        if getattr(self._local, 'data_version', None) != version:
+            with self._pool_lock: self._external_writes += 1
+            self._local.data_version = version
+        return self.generation, self._external_writes
+
+    def _cached(self, key, compute):
+        version = self._data_stamp()
+        hit = self._stats_cache.get(key)
+        if hit and hit[0] == version: return hit[1]
+        value = compute()
+        if len(self._stats_cache) > 64: self._stats_cache.clear()
+        self._stats_cache[key] = (version, value)
+        return value
+
+    @staticmethod
+    def fts_query(text):
+        """Turn user input into an FTS5 query: "quoted phrases", prefix* terms, everything else matched literally."""
+        terms = []
+        for token in re.findall(r'"[^"]*"|\S+', text):
+            prefix = token.endswith('*') and not token.startswith('"')
+            words = token.strip('"*')
+            if not any(ch.isalnum() for ch in words): continue
+            terms.append('"' + words.replace('"', '""') + '"' + ('*' if prefix else ''))
+        return " ".join(terms)
+
+    def type_ahead_query(self, text):
+        """`text` with its last word made a prefix term (`grat` finds "gratitude") while that word is still being
+        typed, i.e. there is no trailing space. Single letters are left alone as they would match most entries."""
+        words = re.findall(r'"[^"]*"?|\S+', text)
+        if not self.fts_enabled or not words or text[-1:].isspace(): return text
+        last = words[-1]
+        if last.startswith('"') or last.endswith('*') or len(last) < 2 or not last[-1].isalnum(): return text
+        return text + "*"
+
+    def _tagged_ids_sql(self, tags, match_all):
+        return (" INTERSECT " if match_all else " UNION ").join([self.SQL_TAGGED_IDS] * len(tags))
+
+    def search(self, query, limit=200, tags=(), match_all=True):
+        """Ranked search, optionally restricted to entries carrying all (or any) of `tags`; rows are
+        (id, date, type, content, tags, timestamp, snippet). With no query, the tag filter alone picks the rows."""
+        return self.search_rows(query, self.search_ids(query, limit, tags, match_all))
+
+    def search_ids(self, query, limit=200, tags=(), match_all=True, task=None):
+        """Best-first tuple of matching entry ids, from a small LRU cache that any write to the file invalidates.
+        A `task` that is cancelled while the query runs interrupts SQLite and raises TaskCancelled."""
+        tags = sorted(set(tags), key=str.lower)
+        if not query.strip() and not tags: return ()
+        match = self.fts_query(query) if self.fts_enabled else " ".join(query.lower().split())
+        if query.strip() and not match: return ()
+        key, stamp = (match, tuple(tags), match_all, limit), self._data_stamp()
+        with self._search_cache_lock:
+            hit = self._search_cache.get(key)
+            if hit and hit[0] == stamp:
+                self._search_cache.move_to_end(key)
+                METRICS.count("search.cache_hit")
+                return hit[1]
+        METRICS.count("search.cache_miss")
+        with self._interruptible(task): ids = tuple(row[0] for row in self._search_id_rows(query, match, limit, tags, match_all))
+        with self._search_cache_lock:
+            self._search_cache[key] = (stamp, ids)
+            self._search_cache.move_to_end(key)
+            while len(self._search_cache) > self.SEARCH_CACHE_SIZE: self._search_cache.popitem(last=False)
+        return ids
+
+    def _search_id_rows(self, query, match, limit, tags, match_all):
+        if not match: return self._execute(self.SQL_TAGGED_ENTRY_IDS.format(tagged=self._tagged_ids_sql(tags, match_all)), (*tags, limit)).fetchall()
+        id_column = "rowid" if self.fts_enabled else "id"
+        tag_filter = f"AND {id_column} IN ({self._tagged_ids_sql(tags, match_all)}) " if tags else ""
+        if not self.fts_enabled:
+            params = (f'%{query.lower()}%', " ".join(query.split()), *tags, limit)
+            return self._execute(self.SQL_SEARCH_LIKE.format(tag_filter=tag_filter), params).fetchall()
+        return self._execute(self.SQL_SEARCH_RANKED_IDS.format(tag_filter=tag_filter), (match, *tags, limit)).fetchall()
+
+    def search_rows(self, query, ids):
+        """Result rows (with snippets for a text query) for `ids`, in the order given; used a page at a time."""
+        if not ids: return []
+        match = self.fts_query(query) if self.fts_enabled else ""
+        placeholders = ",".join("?" * len(ids))
+        if match: cursor = self._execute(self.SQL_SEARCH_SNIPPETS.format(ids=placeholders), (*self.SNIPPET_MARKERS, match, *ids))
+        else: cursor = self._execute(self.SQL_SEARCH_ROWS.format(ids=placeholders), tuple(ids))
+        rows = {row[0]: row for row in cursor}
+        return [rows[i] for i in ids if i in rows]
+
+    @contextmanager
+    def _interruptible(self, task):
+        # SQLite calls the handler every few thousand VM steps; returning true aborts the statement.
+        if task is None: yield; return
+        conn = self._connection()
+        conn.set_progress_handler(lambda: task.cancelled, 10000)
+        try: yield
+        except sqlite3.OperationalError:
+            if task.cancelled: raise TaskCancelled()
+            raise
+        finally: conn.set_progress_handler(None, 0)
+
+    def entries_with_tags(self, tags, match_all=True, limit=200):
+        """Newest entries tagged with all (match_all) or any of `tags`, in search-result row shape."""
+        sql = self.SQL_ENTRIES_BY_ID.format(tagged=self._tagged_ids_sql(tags, match_all))
+        return self._execute(sql, (*tags, limit)).fetchall()
+
+    def tag_counts(self, limit=50):
+        """Most used tags as (name, entry_count), read straight from the trigger-maintained counters."""
+        return list(self._cached(("tags", limit), lambda: self._execute(self.SQL_TAG_COUNTS, (limit,)).fetchall()))
+
+    def timeline_page(self, limit, after=None, offset=0):
+        """Newest-first page of (id, date, type, preview, tags, timestamp); `after` is the (timestamp, id) key of the previous row."""
+        if after is not None: return self._execute(self.SQL_TIMELINE_AFTER, (*after, limit)).fetchall()
+        return self._execute(self.SQL_TIMELINE_FIRST, (limit, offset)).fetchall()
+
+    def count_entries(self):
+        return self._cached(("count",), lambda: self._execute(self.SQL_COUNT_ALL).fetchone()[0])
+
+    def dashboard_stats(self):
+        def compute():
+            text_count, audio_count, last_date = self._execute(self.SQL_TOTALS).fetchone()
+            return {"total_entries": text_count + audio_count, "text_entries": text_count,
+                    "audio_entries": audio_count, "last_entry_date": last_date}
+        return dict(self._cached(("totals",), compute))
+
+    def activity_counts(self, start_date, end_date):
+        def compute():
+            counts = {(start_date + datetime.timedelta(days=i)).strftime("%Y-%m-%d"): 0 for i in range((end_date - start_date).days + 1)}
+            for date_str, count in self._execute(self.SQL_ACTIVITY, (start_date.isoformat(), end_date.isoformat())):
+                if date_str in counts: counts[date_str] = count
+            return counts
+        return dict(self._cached(("activity", start_date, end_date), compute))
+
+    @staticmethod
+    def day_range(date_prefix):
+        """'2024' or '2024-05' ('' for everything) → inclusive (first, last) YYYYMMDD bounds for the indexed `day` column."""
+        digits = date_prefix.replace('-', '')
+        return int(digits.ljust(8, '0')), int(digits.ljust(8, '9'))
+
+    def iter_entries(self, first_day, last_day, tags=(), match_all=True, batch_size=256):
+        """Yield (id, date, type, content, tags, timestamp) for YYYYMMDD days first_day..last_day, oldest first,
+        stepping the cursor so only one batch is in memory."""
+        tags = list(tags)
+        tag_filter = f"AND id IN ({self._tagged_ids_sql(tags, match_all)}) " if tags else ""
+        return self._iterate(self._execute(self.SQL_EXPORT_ENTRIES.format(tag_filter=tag_filter), (first_day, last_day, *tags)), batch_size)
+
+    def iter_text_entries(self, batch_size=256, after_id=0):
+        """Yield (id, date, content) for every text entry (with an id above `after_id`) in id order."""
+        return self._iterate(self._execute(self.SQL_TEXT_ENTRIES, (after_id,)), batch_size)
+
+    @staticmethod
+    def _iterate(cursor, batch_size):
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows: return
+                yield from rows
+        finally: cursor.close()
+
+    def count_entries_between(self, first_day, last_day, tags=(), match_all=True):
+        tags = list(tags)
+        if tags:
+            sql = self.SQL_EXPORT_COUNT.format(tag_filter=f"AND id IN ({self._tagged_ids_sql(tags, match_all)}) ")
+            return self._execute(sql, (first_day, last_day, *tags)).fetchone()[0]
+        iso = lambda day: f"{day // 10000:04d}-{day // 100 % 100:02d}-{day % 100:02d}"
+        return self._execute(self.SQL_PERIOD_COUNT, (iso(first_day), iso(last_day))).fetchone()[0]
@@ -0,0 +1,4 @@
+"""Cancellation shared by long-running core services and whatever drives them (GUI task, CLI)."""
+
+class TaskCancelled(Exception):
+    pass
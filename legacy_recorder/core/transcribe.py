@@ -0,0 +1,202 @@
+"""Offline speech-to-text for audio entries.
+
+Backends wrap a local engine (whisper.cpp's CLI or Vosk) and a model on disk; nothing touches the network.
+TranscriptionQueue works through the store's transcription_queue table in priority order, handing batches to a
+process pool whose workers load the model once, run at lowered OS priority and cap their thread count. Results
+are committed batch by batch, so stopping (or crashing) part-way loses at most the batches in flight and the
+next run carries on where this one stopped.
+"""
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import wave
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from importlib.util import find_spec
+from pathlib import Path
+
+SAMPLE_RATE = 16000 # What both engines expect
+
+
+def iter_pcm16(filepath, chunk_frames=1 << 16):
+    """Decode an audio file to 16 kHz mono int16 chunks without holding the whole recording in memory."""
+    import numpy as np
+    from .audio import LinearResampler, open_audio_source
+    source = open_audio_source(filepath)
+    try:
+        resampler = LinearResampler(source.samplerate, SAMPLE_RATE) if source.samplerate != SAMPLE_RATE else None
+        for start in range(0, source.frames, chunk_frames):
+            block = source.read(start, chunk_frames)
+            if resampler: block = resampler.process(block)
+            if len(block): yield (np.clip(block, -1, 1) * 32767).astype('<i2')
+    finally: source.close()
+
+
+class TranscriptionBackend:
+    """One speech-to-text engine. Instances are created inside pool workers and reused for every job they run."""
+    name = None
+
+    def __init__(self, model_path, threads=1):
+        self.model_path = Path(model_path)
+        self.threads = threads
+        if not self.model_path.exists(): raise FileNotFoundError(f"Model not found: {model_path}")
+
+    @classmethod
+    def available(cls):
+        return False
+
+    def transcribe(self, filepath):
+        raise NotImplementedError
+
+
+class VoskBackend(TranscriptionBackend):
+    """Kaldi models via the `vosk` package; `model_path` is an unpacked model folder."""
+    name = "vosk"
+
+    def __init__(self, model_path, threads=1):
+        super().__init__(model_path, threads)
+        import vosk
+        vosk.SetLogLevel(-1)
+        self.vosk = vosk
+        self.model = vosk.Model(str(self.model_path))
+
+    @classmethod
+    def available(cls):
+        return find_spec("vosk") is not None
+
+    def transcribe(self, filepath):
+        recognizer = self.vosk.KaldiRecognizer(self.model, SAMPLE_RATE)
+        parts = []
+        for chunk in iter_pcm16(filepath):
+            if recognizer.AcceptWaveform(chunk.tobytes()): parts.append(json.loads(recognizer.Result()).get("text", ""))
+        parts.append(json.loads(recognizer.FinalResult()).get("text", ""))
+        return " ".join(part for part in parts if part)
+
+
+class WhisperCppBackend(TranscriptionBackend):
+    """whisper.cpp's command-line program with a ggml model file. The binary is found on PATH or via WHISPER_CPP_BIN."""
+    name = "whisper.cpp"
+    BINARIES = ("whisper-cli", "whisper-cpp")
+
+    def __init__(self, model_path, threads=1, language="auto"):
+        super().__init__(model_path, threads)
+        self.binary = self.find_binary()
+        if not self.binary: raise RuntimeError("whisper.cpp not found: put whisper-cli on PATH or set WHISPER_CPP_BIN")
+        self.language = language
+
+    @classmethod
+    def find_binary(cls):
+        return os.environ.get("WHISPER_CPP_BIN") or next(filter(None, map(shutil.which, cls.BINARIES)), None)
+
+    @classmethod
+    def available(cls):
+        return cls.find_binary() is not None
+
+    def transcribe(self, filepath):
+        with tempfile.TemporaryDirectory(prefix="legacy-transcribe-") as tmp:
+            wav_path, out_base = Path(tmp) / "input.wav", Path(tmp) / "transcript"
+            with wave.open(str(wav_path), 'wb') as w:
+                w.setnchannels(1); w.setsampwidth(2); w.setframerate(SAMPLE_RATE)
+                for chunk in iter_pcm16(filepath): w.writeframes(chunk.tobytes())
+            subprocess.run([self.binary, "-m", str(self.model_path), "-f", str(wav_path), "-t", str(self.threads), "-l", self.language,
+                            "-nt", "-np", "-otxt", "-of", str(out_base)], check=True, capture_output=True)
+            return " ".join(out_base.with_suffix(".txt").read_text(encoding='utf-8').split())
+
+
+BACKENDS = {backend.name: backend for backend in (WhisperCppBackend, VoskBackend)}
+
+_worker_backend = None # The backend loaded by _init_worker in each pool process (or the error loading it raised)
+
+
+def _lower_priority():
+    if hasattr(os, "nice"): os.nice(10)
+    elif os.name == "nt":
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        kernel32.SetPriorityClass(kernel32.GetCurrentProcess(), 0x4000) # BELOW_NORMAL_PRIORITY_CLASS
+
+
+def _init_worker(backend_name, model_path, threads):
+    global _worker_backend
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"): os.environ[var] = str(threads)
+    try:
+        _lower_priority()
+        _worker_backend = BACKENDS[backend_name](model_path, threads)
+    except Exception as e: _worker_backend = e
+
+
+def _transcribe_batch(jobs):
+    """[(entry_id, audio path)] -> [(entry_id, transcript, error)]; runs in a pool worker."""
+    if isinstance(_worker_backend, Exception): raise RuntimeError(f"Could not load the speech model: {_worker_backend}")
+    results = []
+    for entry_id, filepath in jobs:
+        try: results.append((entry_id, _worker_backend.transcribe(filepath), None))
+        except Exception as e: results.append((entry_id, None, f"{type(e).__name__}: {e}"))
+    return results
+
+
+class TranscriptionQueue:
+    """Transcribes queued audio entries with `workers` processes of `threads` threads each, `batch_size` entries
+    per pool job. The queue is re-read whenever a worker frees up, so entries queued at a higher priority while
+    a run is going (e.g. a recording just made) are picked up next."""
+    def __init__(self, store, backend_name, model_path, workers=1, threads=1, batch_size=4):
+        if backend_name not in BACKENDS: raise ValueError(f"Unknown transcription backend: {backend_name}")
+        # Checked here too so a missing engine or model fails at once instead of inside every worker.
+        if not BACKENDS[backend_name].available(): raise RuntimeError(f"The {backend_name} speech engine is not installed")
+        if not Path(model_path).exists(): raise FileNotFoundError(f"Speech model not found: {model_path}")
+        self.store = store
+        self.backend_name = backend_name
+        self.model_path = str(model_path)
+        self.workers = max(1, workers)
+        self.threads = max(1, threads)
+        self.batch_size = max(1, batch_size)
+        self.stats = {"transcribed": 0, "failed": 0} # For this run
+        self.total = None
+        self._pool = None
+        self._closed = False
+        self._in_flight = {} # future -> entry ids
+        self._failed_ids = set() # Not retried again in this run; a later run gets them while they have attempts left
+
+    def step(self, task=None, timeout=0.5):
+        """Top up the pool, wait up to `timeout` for a batch and save whatever finished; returns False once the
+        queue is empty. The GUI calls this repeatedly so a run never holds one of its threads for long."""
+        if task: task.check_cancelled()
+        if self._closed: return False
+        if self.total is None: self.total = self.store.transcription_counts()["pending"]
+        if self._pool is None:
+            if not self.total: return False
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=(self.backend_name, self.model_path, self.threads))
+        in_flight = self._in_flight
+        while len(in_flight) < self.workers * 2: # One batch running and one waiting per worker
+            batch = self.store.next_transcriptions(self.batch_size, self._failed_ids.union(*in_flight.values()))
+            if not batch: break
+            in_flight[self._pool.submit(_transcribe_batch, batch)] = [entry_id for entry_id, _path in batch]
+        if not in_flight: return False
+        done, _pending = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            del in_flight[future]
+            results = future.result()
+            self.store.save_transcripts(results)
+            self._failed_ids.update(entry_id for entry_id, _text, error in results if error is not None)
+            failed = sum(error is not None for _id, _text, error in results)
+            self.stats["failed"] += failed; self.stats["transcribed"] += len(results) - failed
+        processed = self.stats["transcribed"] + self.stats["failed"]
+        if done and task: task.report_progress(processed, max(self.total, processed))
+        return True
+
+    def close(self):
+        """Stop the worker processes without waiting for them; unsaved batches stay queued for the next run."""
+        self._closed = True
+        if self._pool is not None: self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, task=None):
+        """Work until the queue is empty; returns {"transcribed", "failed"} for this run."""
+        try:
+            while self.step(task): pass
+            return self.stats
+        finally: self.close()
+
+
+def available_backends():
+    return [name for name, backend in BACKENDS.items() if backend.available()]
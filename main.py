@@ -5,26 +5,78 @@ Purpose: Record or write daily legacy entries for future generations
 Author: Generated for Legacy Preservation
 """
 
+import time
+_PROCESS_START = time.perf_counter()
 import customtkinter as ctk
 import sqlite3
 import os
 import json
 import datetime
+import importlib
 import threading
-import time
 import winreg
 import sys
 from pathlib import Path
 import tkinter as tk
 from tkinter import messagebox, filedialog
-import sounddevice as sd
-import scipy.io.wavfile as wav
-import numpy as np
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.cron import CronTrigger
-import pystray
-from PIL import Image, ImageDraw, ImageFont # Added ImageFont
-import io
+import math
+import queue
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from legacy_recorder.core import EXPORT_WRITERS, METRICS, BackupManager, BulkImporter, EntryStore, TaskCancelled, TextMirror, run_export
+
+
+class StartupReport:
+    """Cold-start timeline in the spirit of `python -X importtime`: milliseconds from process start to each
+    startup phase and to first paint, plus what each deferred import cost when a feature first needed it.
+    Printed to stderr when run with --startup-report or LEGACY_RECORDER_STARTUP_REPORT=1."""
+    def __init__(self, started):
+        self.started = started
+        self.enabled = "--startup-report" in sys.argv or os.environ.get("LEGACY_RECORDER_STARTUP_REPORT") == "1"
+        self.phases, self.imports = [], []
+
+    def mark(self, phase):
+        self.phases.append((phase, (time.perf_counter() - self.started) * 1000))
+
+    def record_import(self, name, seconds):
+        self.imports.append((name, seconds * 1000, (time.perf_counter() - self.started) * 1000))
+
+    def format(self):
+        lines = ["startup:  cumulative ms | phase"]
+        lines += [f"startup: {at:>14.1f} | {phase}" for phase, at in self.phases]
+        lines += [f"import:  {cost:>8.1f} ms at {at:>8.1f} | {name}" for name, cost, at in self.imports]
+        return "\n".join(lines)
+
+    def print_report(self):
+        if self.enabled: print(self.format(), file=sys.stderr, flush=True)
+
+
+STARTUP = StartupReport(_PROCESS_START)
+
+
+class LazyModule:
+    """Stand-in for a heavy module, imported (and timed in STARTUP) on first attribute access."""
+    def __init__(self, name):
+        self._name, self._module = name, None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            started = time.perf_counter()
+            self._module = importlib.import_module(self._name)
+            STARTUP.record_import(self._name, time.perf_counter() - started)
+        value = getattr(self._module, attr)
+        setattr(self, attr, value) # Later lookups skip __getattr__ (hot in the audio callbacks)
+        return value
+
+
+# Deferred until the feature that needs them is first used: audio capture/playback, tray and notifications.
+sd = LazyModule("sounddevice")
+np = LazyModule("numpy")
+audio_services = LazyModule("legacy_recorder.core.audio") # NumPy/SciPy/soundfile behind codecs, writers, playback sources
+peak_services = LazyModule("legacy_recorder.core.peaks") # Waveform thumbnails
+transcribe_services = LazyModule("legacy_recorder.core.transcribe") # Offline speech-to-text
+pystray = LazyModule("pystray")
+Image, ImageDraw, ImageFont = LazyModule("PIL.Image"), LazyModule("PIL.ImageDraw"), LazyModule("PIL.ImageFont")
 
 # Configure CustomTkinter appearance
 ctk.set_appearance_mode("dark") # User can toggle this
@@ -39,43 +91,613 @@ THEME_SIDEBAR_FG_COLOR_DARK = "#212121" # Dark theme sidebar (no alpha)
 THEME_SIDEBAR_FG_COLOR_LIGHT = "#D6D6D6" # Light theme sidebar (no alpha)
 
 
+class AudioPlayer:
+    """Streams an audio file through sd.OutputStream a block at a time, so playback starts immediately and memory
+    stays flat regardless of length. Supports pause/resume, seek and playback speed.
+
+    All control methods are for the GUI thread. poll() delivers on_position(position, duration) there too; the
+    audio callback itself only touches the source and the play position under a lock.
+    """
+    def __init__(self, on_finished=None, on_position=None):
+        self.on_finished = on_finished
+        self.on_position = on_position
+        self.filepath = None
+        self.source = None
+        self.stream = None
+        self.speed = 1.0
+        self.paused = False
+        self.session = 0
+        self._pos = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def is_active(self):
+        return self.stream is not None
+
+    @property
+    def duration(self):
+        return self.source.frames / self.source.samplerate if self.source else 0.0
+
+    @property
+    def position(self):
+        return self._pos / self.source.samplerate if self.source else 0.0
+
+    def play(self, filepath, start=0.0):
+        self.stop()
+        self.source = audio_services.open_audio_source(filepath)
+        self.filepath = filepath
+        self.paused = False
+        self.session += 1
+        self._pos = max(0.0, start * self.source.samplerate)
+        session = self.session
+        self.stream = sd.OutputStream(samplerate=self.source.samplerate, channels=1, dtype='float32',
+                                      callback=self._callback, finished_callback=lambda: self._stream_finished(session))
+        self.stream.start()
+
+    def pause(self):
+        self.paused = True
+
+    def resume(self):
+        self.paused = False
+
+    def seek(self, seconds):
+        if not self.source: return
+        with self._lock: self._pos = min(max(0.0, seconds * self.source.samplerate), float(self.source.frames))
+
+    def set_speed(self, speed):
+        self.speed = max(0.25, min(float(speed), 4.0))
+
+    def stop(self):
+        stream, self.stream = self.stream, None
+        if stream is not None:
+            stream.abort(); stream.close()
+        if self.source is not None:
+            with self._lock: self.source.close(); self.source = None
+        self.filepath = None
+
+    def poll(self):
+        if self.on_position and self.source: self.on_position(self.position, self.duration)
+
+    def _callback(self, outdata, frames, time_info, status):
+        if not METRICS.enabled: return self._fill(outdata, frames)
+        start = time.perf_counter()
+        if status: METRICS.count(f"audio.output_status: {status}")
+        try: self._fill(outdata, frames)
+        finally: METRICS.record("audio.output_callback", time.perf_counter() - start)
+
+    def _fill(self, outdata, frames):
+        with self._lock:
+            if self.paused or self.source is None: outdata.fill(0); return
+            speed = self.speed
+            start = int(self._pos)
+            if speed == 1.0:
+                out = self.source.read(start, frames)
+            else:
+                # Linear interpolation over the source block covering this output block; pitch follows speed.
+                block = self.source.read(start, int(math.ceil(frames * speed)) + 2)
+                positions = (self._pos - start) + np.arange(frames) * speed
+                positions = positions[positions <= len(block) - 1]
+                out = np.interp(positions, np.arange(len(block)), block) if len(block) else block
+            outdata[:len(out), 0] = out
+            outdata[len(out):] = 0
+            self._pos += frames * speed
+            if len(out) < frames or self._pos >= self.source.frames: raise sd.CallbackStop()
+
+    def _stream_finished(self, session):
+        # Runs on PortAudio's thread once the stream drains or is aborted; session tells a stale stream from the current one.
+        if self.on_finished: self.on_finished(session)
+
+
+class Task:
+    """Handle for work submitted to TaskExecutor. Thread-pool work that takes a `task` argument can poll
+    cancellation and report progress through it; callbacks always run on the Tk thread."""
+    def __init__(self, executor, on_success=None, on_error=None, on_progress=None):
+        self.executor = executor
+        self.on_success, self.on_error, self.on_progress = on_success, on_error, on_progress
+        self.future = None
+        self._cancel_event = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def cancel(self):
+        self._cancel_event.set()
+        if self.future is not None: self.future.cancel()
+
+    def check_cancelled(self):
+        if self._cancel_event.is_set(): raise TaskCancelled()
+
+    def report_progress(self, done, total=None):
+        if self.on_progress and not self.cancelled: self.executor.call_soon(self._deliver, self.on_progress, done, total)
+
+    def _deliver(self, callback, *args):
+        if not self.cancelled: callback(*args)
+
+    def _finished(self, future):
+        if future.cancelled() or self.cancelled: return
+        error = future.exception()
+        if error is None:
+            if self.on_success: self.executor.call_soon(self._deliver, self.on_success, future.result())
+        elif isinstance(error, TaskCancelled): return
+        elif self.on_error: self.executor.call_soon(self._deliver, self.on_error, error)
+        else: print(f"Background task failed: {error!r}")
+
+
+class TaskExecutor:
+    """Runs blocking work off the Tk thread on thread pools; jobs with CPU-bound parts (import hashing,
+    transcription) start their own process pools from there.
+
+    Thread work goes to one of three lanes so long jobs can never starve interactive ones: "io" for short
+    requests the user is waiting on (search, pages, saves), "background" for library-wide jobs that can run for
+    minutes or hours (backup, import, export, transcoding, transcription) and "media" for per-row waveform
+    loads. Results come back through a single completion queue that the Tk thread drains from root.after(), so
+    no callback ever touches widgets from a worker thread.
+    """
+    POLL_INTERVAL_MS = 30
+
+    def __init__(self, root, io_workers=4, background_workers=2):
+        self.root = root
+        self._io_pool = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="legacy-io")
+        self._lanes = {"io": self._io_pool,
+                       "background": ThreadPoolExecutor(max_workers=background_workers, thread_name_prefix="legacy-background"),
+                       "media": ThreadPoolExecutor(max_workers=1, thread_name_prefix="legacy-media")}
+        self._completions = queue.SimpleQueue()
+        self._active = set() # Also changed from worker threads as tasks finish, hence the lock
+        self._active_lock = threading.Lock()
+        self._closed = False
+        self._poll_id = self.root.after(self.POLL_INTERVAL_MS, self._poll)
+
+    def submit(self, fn, *args, on_success=None, on_error=None, on_progress=None, with_task=False, lane="io", **kwargs):
+        """Run fn(*args, **kwargs) on the given lane's thread pool; with_task=True also passes the Task as `task=`."""
+        task = Task(self, on_success, on_error, on_progress)
+        if with_task: kwargs["task"] = task
+        with self._active_lock: self._active.add(task)
+        task.future = self._lanes[lane].submit(fn, *args, **kwargs)
+        task.future.add_done_callback(lambda future: (self._forget(task), task._finished(future)))
+        return task
+
+    def _forget(self, task):
+        with self._active_lock: self._active.discard(task)
+
+    def call_soon(self, fn, *args):
+        """Queue fn(*args) to run on the Tk thread; safe to call from any thread."""
+        self._completions.put((fn, args))
+
+    def _poll(self):
+        deadline = time.perf_counter() + 0.02 # Leave the rest of the frame for Tk itself
+        while time.perf_counter() < deadline:
+            try: fn, args = self._completions.get_nowait()
+            except queue.Empty: break
+            try: fn(*args)
+            except Exception as e: print(f"Error in task callback {getattr(fn, '__name__', fn)}: {e!r}")
+        if not self._closed: self._poll_id = self.root.after(self.POLL_INTERVAL_MS, self._poll)
+
+    def shutdown(self, timeout=0):
+        """Cancel everything and stop the pools; waits up to `timeout` seconds for running jobs to notice, so the
+        caller can close the store without pulling it out from under a backup or import."""
+        self._closed = True
+        try: self.root.after_cancel(self._poll_id)
+        except Exception: pass
+        with self._active_lock: active = list(self._active)
+        for task in active: task.cancel() # Long jobs poll this and stop, so exit isn't held up
+        for pool in self._lanes.values(): pool.shutdown(wait=False, cancel_futures=True)
+        if timeout and active:
+            _done, running = wait([task.future for task in active], timeout=timeout)
+            if running: print(f"{len(running)} background task(s) still running at exit")
+
+
+class TimelineSource:
+    """Newest-first entry pages for VirtualEntryList. A page that follows a cached one continues from its last
+    (timestamp, id) key; only jumps (e.g. dragging the scrollbar) fall back to OFFSET."""
+    def __init__(self, store):
+        self.store = store
+
+    def count(self):
+        return self.store.count_entries()
+
+    def page(self, page_no, page_size, previous_rows=None):
+        if previous_rows:
+            last = previous_rows[-1]
+            return self.store.timeline_page(page_size, after=(last[5], last[0]))
+        return self.store.timeline_page(page_size, offset=page_no * page_size)
+
+
+class SearchSource:
+    """Pages of one search's results. The ranked id list is fetched once (and cached by the store); rows and
+    snippets are only built for the pages VirtualEntryList actually shows."""
+    def __init__(self, store, query="", ids=()):
+        self.store = store
+        self.query = query
+        self.ids = ids
+
+    def count(self):
+        return len(self.ids)
+
+    def page(self, page_no, page_size, previous_rows=None):
+        return self.store.search_rows(self.query, self.ids[page_no * page_size:(page_no + 1) * page_size])
+
+
+class VirtualEntryList(ctk.CTkFrame):
+    """Scrollable entry list that keeps only enough row widgets to fill the viewport.
+
+    Rows are fixed height and re-bound to different entries as the list scrolls, and entries are fetched a page at
+    a time into a small LRU cache, so widget count and memory stay constant however long the history is.
+    """
+    ROW_HEIGHT = 96
+    PAGE_SIZE = 50
+    MAX_CACHED_PAGES = 8
+
+    def __init__(self, master, source, make_row, empty_text="No entries yet.", executor=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.source = source
+        self.executor = executor
+        self.make_row = make_row
+        self.empty_text = empty_text
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(0, weight=1)
+        self.viewport = ctk.CTkFrame(self, fg_color="transparent")
+        self.viewport.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+        self.empty_label = ctk.CTkLabel(self.viewport, text=empty_text, font=ctk.CTkFont(size=16))
+        self.rows = []
+        self.offset = 0
+        self.total = 0
+        self._pages = OrderedDict()
+        self._pending_pages = set()
+        self._epoch = 0 # Pages requested before the last reload() are discarded when they arrive
+        self.viewport.bind("<Configure>", lambda _e: self.refresh(), add="+")
+        self._bind_wheel(self.viewport)
+        self.reload()
+
+    def reload(self):
+        self._epoch += 1
+        self._pages.clear()
+        self._pending_pages.clear()
+        self.total = self.source.count()
+        self.offset = min(self.offset, self._max_offset())
+        self.refresh()
+
+    def refresh(self):
+        height = self._viewport_height()
+        if self.total == 0:
+            for row in self.rows: row.place_forget()
+            self.empty_label.place(relx=0.5, y=50, anchor="n")
+            self.scrollbar.set(0, 1)
+            return
+        self.empty_label.place_forget()
+        while len(self.rows) < math.ceil(height / self.ROW_HEIGHT) + 1:
+            row = self.make_row(self.viewport)
+            row.grid_propagate(False)
+            self._bind_wheel(row)
+            self.rows.append(row)
+        first = self.offset // self.ROW_HEIGHT
+        shift = self.offset % self.ROW_HEIGHT
+        for slot, row in enumerate(self.rows):
+            index = first + slot
+            y = slot * self.ROW_HEIGHT - shift
+            if index >= self.total or y >= height: row.place_forget(); continue
+            entry = self._entry_at(index)
+            if entry is None: row.place_forget(); continue
+            row.show_entry(entry)
+            row.place(x=0, y=y, relwidth=1)
+        content_height = self.total * self.ROW_HEIGHT
+        self.scrollbar.set(self.offset / content_height, min(1.0, (self.offset + height) / content_height))
+
+    def for_each_row(self, callback):
+        for row in self.rows: callback(row)
+
+    def scroll_to(self, offset):
+        offset = max(0, min(int(offset), self._max_offset()))
+        if offset != self.offset:
+            self.offset = offset
+            self.refresh()
+
+    def _viewport_height(self):
+        # Row geometry is in CTk's unscaled units; winfo_* reports real pixels.
+        return max(1, int(self.viewport.winfo_height() / self._get_widget_scaling()))
+
+    def _max_offset(self):
+        return max(0, self.total * self.ROW_HEIGHT - self._viewport_height())
+
+    def _entry_at(self, index):
+        page_no, pos = divmod(index, self.PAGE_SIZE)
+        rows = self._pages.get(page_no)
+        if rows is None:
+            if self.executor is None: self._store_page(self._epoch, page_no, self.source.page(page_no, self.PAGE_SIZE, self._pages.get(page_no - 1)))
+            elif page_no not in self._pending_pages:
+                self._pending_pages.add(page_no)
+                self.executor.submit(self.source.page, page_no, self.PAGE_SIZE, self._pages.get(page_no - 1),
+                                     on_success=lambda rows, epoch=self._epoch, p=page_no: self._page_loaded(epoch, p, rows))
+            rows = self._pages.get(page_no)
+            if rows is None: return None
+        self._pages.move_to_end(page_no)
+        return rows[pos] if pos < len(rows) else None
+
+    def _store_page(self, epoch, page_no, rows):
+        if epoch != self._epoch: return False
+        self._pages[page_no] = rows
+        while len(self._pages) > self.MAX_CACHED_PAGES: self._pages.popitem(last=False)
+        return True
+
+    def _page_loaded(self, epoch, page_no, rows):
+        self._pending_pages.discard(page_no)
+        if self._store_page(epoch, page_no, rows) and self.winfo_exists(): self.refresh()
+
+    def _on_scrollbar(self, action, value, unit=None):
+        if action == "moveto": self.scroll_to(float(value) * self.total * self.ROW_HEIGHT)
+        elif action == "scroll":
+            step = self._viewport_height() if unit == "pages" else self.ROW_HEIGHT // 3
+            self.scroll_to(self.offset + int(value) * step)
+
+    def _on_mousewheel(self, event):
+        if event.num == 4: delta = -1
+        elif event.num == 5: delta = 1
+        else: delta = -1 if event.delta > 0 else 1
+        self.scroll_to(self.offset + delta * self.ROW_HEIGHT // 2)
+        return "break"
+
+    def _bind_wheel(self, widget):
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"): tk.Misc.bind(widget, sequence, self._on_mousewheel, "+")
+        for child in widget.winfo_children(): self._bind_wheel(child)
+
+
+class TimelineRow(ctk.CTkFrame):
+    """One recyclable timeline row; show_entry() re-binds it to another entry without creating widgets."""
+    def __init__(self, master, app):
+        super().__init__(master, height=VirtualEntryList.ROW_HEIGHT - 8, corner_radius=THEME_CORNER_RADIUS-2, fg_color=app._get_current_card_fg_color())
+        self.app = app
+        self.entry = None
+        self.grid_columnconfigure(1, weight=1) # Main content
+        self.grid_columnconfigure(2, weight=0) # Button column
+        self.icon_label = ctk.CTkLabel(self, text="", font=ctk.CTkFont(size=20))
+        self.icon_label.grid(row=0, column=0, rowspan=3, padx=15, pady=10, sticky="ns")
+        self.date_label = ctk.CTkLabel(self, text="", font=ctk.CTkFont(size=12, weight="bold"), anchor="w")
+        self.date_label.grid(row=0, column=1, sticky="ew", padx=10, pady=(5, 0))
+        self.preview_label = ctk.CTkLabel(self, text="", font=ctk.CTkFont(size=11), wraplength=350, anchor="w", justify="left")
+        self.preview_label.grid(row=1, column=1, sticky="ew", padx=10)
+        self.thumbnail = WaveformThumbnail(self)
+        self.thumbnail.grid(row=1, column=1, sticky="w", padx=10)
+        self.thumbnail.grid_remove()
+        self.tags_label = ctk.CTkLabel(self, text="", font=ctk.CTkFont(size=10), text_color="gray", anchor="w")
+        self.tags_label.grid(row=2, column=1, sticky="ew", padx=10, pady=(0, 5))
+        self.action_btn = ctk.CTkButton(self, text="", width=60, height=THEME_BUTTON_HEIGHT-10, corner_radius=THEME_CORNER_RADIUS-2, command=self._on_action)
+        self.action_btn.grid(row=0, column=2, rowspan=3, padx=10, pady=10, sticky="e")
+
+    def show_entry(self, entry):
+        if entry == self.entry: return
+        previous, self.entry = self.entry, entry
+        entry_id, date, entry_type, content, tags, timestamp = entry
+        play_buttons = self.app.timeline_play_buttons
+        if previous and play_buttons.get(previous[3]) is self.action_btn: del play_buttons[previous[3]]
+        if previous and previous[0] != entry_id and previous[2] == 'audio': self.app.release_peaks(previous[0])
+        self.icon_label.configure(text="📝" if entry_type == "text" else "🎙️")
+        dt = datetime.datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+        self.date_label.configure(text=dt.strftime("%B %d, %Y at %I:%M %p"))
+        if entry_type == "text":
+            self.thumbnail.grid_remove(); self.preview_label.grid()
+            self.preview_label.configure(text=(content[:100] + "...") if len(content) > 100 else content)
+        else:
+            self.preview_label.grid_remove(); self.thumbnail.grid()
+            self.show_peaks(self.app.cached_peaks(entry_id, content))
+        self.tags_label.configure(text=f"🏷️ {tags}" if tags else "")
+        if entry_type == 'audio':
+            play_buttons[content] = self.action_btn
+            self.action_btn.configure(text="⏹️ Stop" if self.app.currently_playing_file == content else "▶️ Play")
+        else: self.action_btn.configure(text="📄 View")
+
+    def show_peaks(self, peaks):
+        # Thumbnail from the peaks cache; the file name and length go on the date line. None draws a flat line
+        # until the media lane has loaded or computed the peaks.
+        _entry_id, _date, _type, content, _tags, timestamp = self.entry
+        dt = datetime.datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+        length = f" · {int(peaks.duration // 60)}:{int(peaks.duration % 60):02d}" if peaks else ""
+        self.date_label.configure(text=f"{dt.strftime('%B %d, %Y at %I:%M %p')} · {Path(content).name}{length}")
+        self.thumbnail.draw(peaks, self.app._get_current_card_fg_color())
+
+    def _on_action(self):
+        if self.entry is None: return
+        entry_id, _date, entry_type, content = self.entry[:4]
+        if entry_type == 'audio': self.app.toggle_audio_playback(content, self.action_btn)
+        else: self.app.show_text_entry_dialog(entry_id)
+
+
+class SearchResultRow(TimelineRow):
+    """Timeline row for a search hit: the match snippet (of the text, or of a recording's transcript) replaces the
+    plain preview."""
+    def __init__(self, master, app):
+        super().__init__(master, app)
+        self.snippet = None
+
+    def show_entry(self, entry):
+        if entry[:6] == self.entry and entry[6] != self.snippet: self.entry = None # Same entry under a new query
+        super().show_entry(entry[:6])
+        self.snippet = entry[6]
+        if self.snippet:
+            self.thumbnail.grid_remove(); self.preview_label.grid()
+            self.preview_label.configure(text=self.snippet.replace("\n", " "))
+
+
+class ActivityChart(tk.Canvas):
+    """Daily activity bars drawn on one canvas. Bars and labels are created once; update_data() only moves and
+    recolours existing canvas items, so a redraw costs O(days) item updates and no widget creation."""
+    def __init__(self, master, days, bar_area_height, bar_width, font_size, zero_bar_height=0, label_for=None, bg_color=None):
+        self.ui_scale = master._get_widget_scaling() if hasattr(master, '_get_widget_scaling') else 1.0
+        self.days = days
+        self.bar_area_height = int(bar_area_height * self.ui_scale)
+        self.bar_width = max(1, int(bar_width * self.ui_scale))
+        self.zero_bar_height = int(zero_bar_height * self.ui_scale)
+        self.label_for = label_for or (lambda idx, num_days, day: str(day.day))
+        self.bg_color = bg_color
+        self.font = ctk.CTkFont(size=int(font_size * self.ui_scale))
+        self.label_height = self.font.metrics("linespace") * 2 + 2
+        super().__init__(master, height=self.bar_area_height + self.label_height, highlightthickness=0, bd=0)
+        self.bars = [self.create_rectangle(0, 0, 0, 0, width=0) for _ in range(days)]
+        self.labels = [self.create_text(0, 0, text="", anchor="n", font=self.font, justify="center") for _ in range(days)]
+        self.heights = [0] * days
+        self.bind("<Configure>", lambda _e: self._layout())
+
+    @staticmethod
+    def _themed(color):
+        if isinstance(color, (list, tuple)): return color[0] if ctk.get_appearance_mode() == "Light" else color[1]
+        return color
+
+    @staticmethod
+    def sparse_day_label(idx, num_days, day):
+        # Show day number. If it's 1st, also show month abbreviation; otherwise only start, end and periodic days.
+        if day.day == 1: return f"{day.strftime('%b')}\n{day.day}"
+        if idx == 0 or idx == num_days - 1 or (idx % 7 == 0 and num_days > 14) or (num_days <= 14 and idx % 2 == 0): return str(day.day)
+        return ""
+
+    def update_data(self, activity_data):
+        items = sorted(activity_data.items())[-self.days:]
+        max_val = max([count for _date, count in items] + [1])
+        light = ctk.get_appearance_mode() == "Light"
+        bar_color = self._themed(ctk.ThemeManager.theme["CTkButton"]["fg_color"])
+        zero_color = "#F0F0F0" if light else "#303030" # Subtle indication for zero days
+        text_color = self._themed(ctk.ThemeManager.theme["CTkLabel"]["text_color"])
+        self.configure(bg=self._themed(self.bg_color() if callable(self.bg_color) else self.bg_color or ctk.ThemeManager.theme["CTk"]["fg_color"]))
+        for idx, (date_key, count) in enumerate(items):
+            day = datetime.datetime.strptime(date_key, "%Y-%m-%d")
+            self.heights[idx] = int(count / max_val * self.bar_area_height) if count > 0 else self.zero_bar_height
+            self.itemconfigure(self.bars[idx], fill=bar_color if count > 0 else zero_color, state="normal" if self.heights[idx] else "hidden")
+            self.itemconfigure(self.labels[idx], text=self.label_for(idx, len(items), day), fill=text_color)
+        self._layout()
+
+    def _layout(self):
+        slot = max(self.winfo_width(), 1) / self.days
+        for idx in range(self.days):
+            center = slot * idx + slot / 2
+            self.coords(self.bars[idx], center - self.bar_width / 2, self.bar_area_height - self.heights[idx], center + self.bar_width / 2, self.bar_area_height)
+            self.coords(self.labels[idx], center, self.bar_area_height + 2)
+
+
+class WaveformPreview(tk.Canvas):
+    """Scrolling min/max waveform of a LevelMeter's history with a peak-hold marker; one polygon, redrawn in place."""
+    def __init__(self, master, width=300, height=60):
+        super().__init__(master, width=width, height=height, highlightthickness=0, bd=0)
+        self.wave = self.create_polygon(0, 0, 0, 0, width=0)
+        self.peak_lines = (self.create_line(0, 0, 0, 0, dash=(3, 2)), self.create_line(0, 0, 0, 0, dash=(3, 2)))
+
+    def draw(self, history, held_peak):
+        mode = 0 if ctk.get_appearance_mode() == "Light" else 1
+        self.configure(bg=ctk.ThemeManager.theme["CTk"]["fg_color"][mode])
+        width, height = max(self.winfo_width(), 2), max(self.winfo_height(), 2)
+        mid = height / 2
+        points = list(history) # Single C-level copy, so the audio thread's appends can't interleave
+        if len(points) < 2: points = [(0.0, 0.0), (0.0, 0.0)]
+        step = width / (max(getattr(history, 'maxlen', None) or len(points), 2) - 1)
+        x0 = width - step * (len(points) - 1)
+        top = [coord for i, (_low, high) in enumerate(points) for coord in (x0 + i * step, mid - min(high, 1.0) * mid)]
+        bottom = [coord for i, (low, _high) in reversed(list(enumerate(points))) for coord in (x0 + i * step, mid - max(low, -1.0) * mid)]
+        self.coords(self.wave, *top, *bottom)
+        self.itemconfigure(self.wave, fill=ctk.ThemeManager.theme["CTkButton"]["fg_color"][mode])
+        peak_y = min(held_peak, 1.0) * mid
+        line_color = ctk.ThemeManager.theme["CTkLabel"]["text_color"][mode]
+        for line, y in zip(self.peak_lines, (mid - peak_y, mid + peak_y)):
+            self.coords(line, 0, y, width, y)
+            self.itemconfigure(line, fill=line_color)
+
+
+class WaveformThumbnail(tk.Canvas):
+    """Static min/max outline of a whole recording, drawn from its cached Peaks; one polygon, reused across entries."""
+    def __init__(self, master, width=180, height=24):
+        super().__init__(master, width=width, height=height, highlightthickness=0, bd=0)
+        self.wave = self.create_polygon(0, 0, 0, 0, width=0)
+
+    def draw(self, peaks, background):
+        mode = 0 if ctk.get_appearance_mode() == "Light" else 1
+        self.configure(bg=background)
+        width, height = int(self.cget("width")), int(self.cget("height"))
+        mid = height / 2
+        if peaks is None: self.coords(self.wave, 0, mid, width, mid, width, mid, 0, mid)
+        else:
+            mins, maxs = peaks.envelope(width)
+            xs = np.linspace(0, width, len(maxs)) if len(maxs) > 1 else np.array([0.0, width])
+            if len(maxs) == 1: mins, maxs = np.repeat(mins, 2), np.repeat(maxs, 2)
+            top = np.column_stack((xs, mid - maxs * mid)).ravel()
+            bottom = np.column_stack((xs, mid - mins * mid))[::-1].ravel()
+            self.coords(self.wave, *top.tolist(), *bottom.tolist())
+        self.itemconfigure(self.wave, fill=ctk.ThemeManager.theme["CTkButton"]["fg_color"][mode])
+
+
 class LegacyRecorder:
+    LEVEL_METER_INTERVAL_MS = 33 # ~30 Hz
+    EVENT_LOOP_PROBE_MS = 250
+    DIAGNOSTICS_REFRESH_MS = 1000
+    SEARCH_DEBOUNCE_MS = 200 # Typing pause before a search runs
+    SEARCH_RESULT_LIMIT = 5000 # Ranked ids fetched per query; rows are only built for the pages on screen
+    SHUTDOWN_TIMEOUT = 10 # Seconds on exit for cancelled backups, imports etc. to stop before the store is closed
+
     def __init__(self):
         self.app_dir = Path.home() / "LegacyRecorder"
         self.entries_dir = self.app_dir / "entries"
         self.config_dir = self.app_dir / "config"
         self.db_path = self.app_dir / "legacy.db"
         self.settings_path = self.config_dir / "settings.json"
+        self.metrics_log_path = self.app_dir / "logs" / "metrics.jsonl"
+        self.backup_dir = self.app_dir / "backups"
         
         self.is_recording = False
-        self.audio_data = []
+        self.audio_writer = None
+        self.audio_sink = None # The writer, or a VoiceActivityGate in front of it
+        self.level_meter = None # Created on first recording so startup does not import the audio services
+        self._peak_cache = None # Likewise on first use (timeline thumbnails, recording)
+        self._peaks_pending = {} # entry_id -> Task loading its peaks on the media lane
+        self._search_after_id = None
+        self._search_key = None
         self.sample_rate = 44100
-        self.current_playback_thread = None
+        self.player = AudioPlayer(on_finished=self._playback_finished, on_position=self._show_playback_position)
+        self._playback_poll_scheduled = False
         self.is_playing_audio = False
         self.sidebar_visible = False 
         self.currently_playing_file = None 
         self.dashboard_frame_cached = None
+        self.input_devices = None # Filled in by the background probe
+        self.audio_codecs = None # Likewise, the first time Settings is opened
         
-        self.scheduler = BackgroundScheduler()
-        
+        STARTUP.mark("imports")
         self.setup_directories()
         self.setup_database()
+        STARTUP.mark("database")
         self.load_settings()
         self.setup_gui()
+        STARTUP.mark("dashboard built")
+        self.root.after_idle(self._after_first_paint)
+
+    def _after_first_paint(self):
+        # Everything not needed to show the dashboard starts once the window is up.
+        STARTUP.mark("first paint")
+        self.tasks.submit(self.text_mirror.rebuild_missing, self.store, with_task=True, lane="background",
+                          on_success=lambda rebuilt: rebuilt and print(f"Rebuilt {rebuilt} missing text mirror files"))
+        self.tasks.submit(self.probe_audio_devices, on_success=self._audio_devices_probed, on_error=lambda e: print(f"Error querying audio devices: {e}"))
         self.setup_scheduler()
         self.setup_autostart()
-        
-        try:
-            print("Available audio input devices:")
-            devices = sd.query_devices()
-            input_devices = [device for device in devices if device['max_input_channels'] > 0]
-            if not input_devices:
-                print("  No input devices found by sounddevice.")
-            for i, device in enumerate(input_devices):
-                print(f"  {i}: {device['name']} (Input Channels: {device['max_input_channels']})")
-            print("-" * 30)
-        except Exception as e:
-            print(f"Error querying audio devices: {e}")
+        self.apply_diagnostics()
+        STARTUP.mark("background services started")
+        STARTUP.print_report()
+
+    def probe_audio_devices(self):
+        # PortAudio initialisation can take a noticeable moment; this runs on the I/O pool.
+        return [device for device in sd.query_devices() if device['max_input_channels'] > 0]
+
+    def probe_audio_codecs(self):
+        return [codec for codec in audio_services.AUDIO_CODECS if audio_services.audio_codec_available(codec)]
+
+    def _audio_codecs_probed(self, codecs):
+        self.audio_codecs = codecs
+        if hasattr(self, 'codec_combo') and self.codec_combo.winfo_exists():
+            self.codec_combo.configure(values=codecs, state="normal")
+            self.codec_combo.set(self.settings["audio_codec"] if self.settings["audio_codec"] in codecs else "wav")
+
+    def _audio_devices_probed(self, input_devices):
+        self.input_devices = input_devices
+        print("Available audio input devices:")
+        if not input_devices: print("  No input devices found by sounddevice.")
+        for i, device in enumerate(input_devices):
+            print(f"  {i}: {device['name']} (Input Channels: {device['max_input_channels']})")
+        print("-" * 30)
             
     def setup_directories(self):
         self.app_dir.mkdir(exist_ok=True)
@@ -89,25 +711,20 @@ class LegacyRecorder:
         month_dir.mkdir(parents=True, exist_ok=True)
     
     def setup_database(self):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS entries (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                date TEXT NOT NULL,
-                type TEXT CHECK(type IN ('text', 'audio')) NOT NULL,
-                content TEXT NOT NULL,
-                tags TEXT,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        conn.commit()
-        conn.close()
+        restored = BackupManager.apply_staged_restore(self.app_dir)
+        if restored: print(f"Restored backup snapshot {restored}")
+        self.store = EntryStore(self.db_path)
+        self.backups = BackupManager(self.store, self.app_dir, self.backup_dir)
+        self.text_mirror = TextMirror(self.entries_dir)
     
     def load_settings(self):
         default_settings = {
             "theme": "dark", "reminders_enabled": True,
-            "morning_reminder": "08:00", "evening_reminder": "21:00", "font_size": 12
+            "morning_reminder": "08:00", "evening_reminder": "21:00", "font_size": 12,
+            "audio_codec": "flac", "daily_backup": True, "backup_time": "12:30", "backups_to_keep": 30,
+            "diagnostics_enabled": False, "diagnostics_log": False, "voice_activated": False, "vad_max_silence": 1.5,
+            "transcription_backend": "vosk", "transcription_model": "", "transcription_workers": max(1, (os.cpu_count() or 2) // 2),
+            "transcription_auto": False
         }
         if self.settings_path.exists():
             try:
@@ -123,6 +740,7 @@ class LegacyRecorder:
     
     def setup_gui(self):
         self.root = ctk.CTk()
+        self.tasks = TaskExecutor(self.root)
         self.root.title("Legacy Recorder - Preserve Your Journey")
         self.root.geometry("800x600")
         self.root.minsize(600, 400)
@@ -217,6 +835,7 @@ class LegacyRecorder:
         else:
             self.home_button.pack_forget()
             
+    @METRICS.timed("view.show_dashboard")
     def show_dashboard(self):
         self._update_home_button_visibility(False) 
 
@@ -276,8 +895,9 @@ class LegacyRecorder:
             
             activity_chart_header = ctk.CTkLabel(self.engagement_frame_cached_ref, text="📈 Recent Activity (7 Days)", font=ctk.CTkFont(size=14, weight="bold"))
             activity_chart_header.pack(pady=(20,5), padx=10, anchor="w")
-            self.activity_chart_frame = ctk.CTkFrame(self.engagement_frame_cached_ref, height=100, fg_color="transparent")
-            self.activity_chart_frame.pack(fill="x", expand=True, padx=10, pady=5)
+            self.activity_chart = ActivityChart(self.engagement_frame_cached_ref, days=7, bar_area_height=60, bar_width=15, font_size=9,
+                                                bg_color=self._get_current_card_fg_color)
+            self.activity_chart.pack(fill="x", expand=True, padx=10, pady=5)
             
             self.nav_cards_frame_cached_ref = nav_cards_frame
             # Store reference to engagement frame for theme updates if needed
@@ -295,41 +915,17 @@ class LegacyRecorder:
         if self.sidebar_visible: self.toggle_sidebar()
 
     def load_dashboard_stats(self):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
         try:
-            cursor.execute("SELECT COUNT(*) FROM entries")
-            self.stats_labels["total_entries"].configure(text=f"Total Entries: {cursor.fetchone()[0]}")
-            cursor.execute("SELECT COUNT(*) FROM entries WHERE type='text'")
-            self.stats_labels["text_entries"].configure(text=f"Text Entries: {cursor.fetchone()[0]}")
-            cursor.execute("SELECT COUNT(*) FROM entries WHERE type='audio'")
-            self.stats_labels["audio_entries"].configure(text=f"Audio Entries: {cursor.fetchone()[0]}")
-            cursor.execute("SELECT MAX(date) FROM entries")
-            last_date = cursor.fetchone()[0]
+            stats = self.store.dashboard_stats()
+            self.stats_labels["total_entries"].configure(text=f"Total Entries: {stats['total_entries']}")
+            self.stats_labels["text_entries"].configure(text=f"Text Entries: {stats['text_entries']}")
+            self.stats_labels["audio_entries"].configure(text=f"Audio Entries: {stats['audio_entries']}")
+            last_date = stats["last_entry_date"]
             self.stats_labels["last_entry_date"].configure(text=f"Last Entry: {datetime.datetime.strptime(last_date, '%Y-%m-%d').strftime('%b %d, %Y') if last_date else 'None'}")
 
-            for widget in self.activity_chart_frame.winfo_children(): widget.destroy() 
             end_date, start_date = datetime.date.today(), datetime.date.today() - datetime.timedelta(days=6)
-            activity_data = { (start_date + datetime.timedelta(days=i)).strftime("%Y-%m-%d"): 0 for i in range(7) }
-            cursor.execute("SELECT date, COUNT(*) FROM entries WHERE date BETWEEN ? AND ? GROUP BY date", (start_date, end_date))
-            for date_str, count in cursor.fetchall(): activity_data[date_str] = count
-            
-            max_val = max(activity_data.values() or [1])
-            self.activity_chart_frame.grid_columnconfigure(list(range(7)), weight=1)
-            for idx, (date_key, count) in enumerate(sorted(activity_data.items())):
-                ratio = count / max_val
-                h = int(ratio * 60)
-                day_f = ctk.CTkFrame(self.activity_chart_frame, fg_color="transparent")
-                day_f.grid(row=0, column=idx, sticky="nsew", padx=1)
-                day_f.grid_rowconfigure(0, weight=1); day_f.grid_rowconfigure(1, weight=0); day_f.grid_columnconfigure(0, weight=1)
-                bar_c = ctk.ThemeManager.theme["CTkButton"]["fg_color"] if count > 0 else "transparent"
-                bar = ctk.CTkFrame(day_f, width=15, height=h, fg_color=bar_c, corner_radius=2)
-                bar.grid(row=0, column=0, sticky="s", pady=(max(0, 60-h),0))
-                dt = datetime.datetime.strptime(date_key, "%Y-%m-%d")
-                date_lbl = ctk.CTkLabel(day_f, text=str(dt.day), font=ctk.CTkFont(size=9))
-                date_lbl.grid(row=1, column=0, sticky="n", pady=(2,0))
+            self.activity_chart.update_data(self.store.activity_counts(start_date, end_date))
         except Exception as e: print(f"Error loading dashboard stats: {e}")
-        finally: conn.close()
             
     def show_new_entry(self):
         self.clear_main_frame()
@@ -360,8 +956,8 @@ class LegacyRecorder:
         self.tags_entry = ctk.CTkEntry(tags_frame, placeholder_text="prayer, wisdom, family, lesson")
         self.tags_entry.grid(row=0, column=1, sticky="ew", padx=(0, 20), pady=15)
         
-        save_btn = ctk.CTkButton(self.main_frame, text="💾 Save Entry", command=self.save_text_entry, height=THEME_BUTTON_HEIGHT, corner_radius=THEME_CORNER_RADIUS, font=ctk.CTkFont(size=16, weight="bold"))
-        save_btn.grid(row=4, column=0, pady=20)
+        self.save_entry_btn = ctk.CTkButton(self.main_frame, text="💾 Save Entry", command=self.save_text_entry, height=THEME_BUTTON_HEIGHT, corner_radius=THEME_CORNER_RADIUS, font=ctk.CTkFont(size=16, weight="bold"))
+        self.save_entry_btn.grid(row=4, column=0, pady=20)
     
     def show_audio_recorder(self):
         self.clear_main_frame()
@@ -376,8 +972,12 @@ class LegacyRecorder:
         self.record_btn = ctk.CTkButton(self.main_frame, text="🔴 Start Recording", command=self.toggle_recording, height=60, corner_radius=THEME_CORNER_RADIUS, font=ctk.CTkFont(size=18, weight="bold"))
         self.record_btn.grid(row=2, column=0, pady=20)
         
-        self.audio_level = ctk.CTkProgressBar(self.main_frame, width=300)
-        self.audio_level.grid(row=3, column=0, pady=20)
+        meter_frame = ctk.CTkFrame(self.main_frame, fg_color="transparent")
+        meter_frame.grid(row=3, column=0, pady=20)
+        self.waveform_preview = WaveformPreview(meter_frame, width=300, height=60)
+        self.waveform_preview.grid(row=0, column=0, pady=(0, 5))
+        self.audio_level = ctk.CTkProgressBar(meter_frame, width=300)
+        self.audio_level.grid(row=1, column=0)
         self.audio_level.set(0)
         
         tags_frame = ctk.CTkFrame(self.main_frame)
@@ -389,7 +989,16 @@ class LegacyRecorder:
         
         self.audio_tags_entry = ctk.CTkEntry(tags_frame, placeholder_text="voice, reflection, prayer")
         self.audio_tags_entry.grid(row=0, column=1, sticky="ew", padx=(0, 20), pady=15)
+        
+        self.vad_switch = ctk.CTkSwitch(self.main_frame, text=f"Voice-activated (skip pauses over {self.settings['vad_max_silence']:g}s)", command=self._vad_toggled)
+        self.vad_switch.grid(row=5, column=0, pady=(0, 20))
+        if self.settings["voice_activated"]: self.vad_switch.select()
+    
+    def _vad_toggled(self):
+        self.settings["voice_activated"] = bool(self.vad_switch.get())
+        self.save_settings()
     
+    @METRICS.timed("view.show_timeline")
     def show_timeline(self):
         self.clear_main_frame()
         self._update_home_button_visibility(True)
@@ -404,13 +1013,12 @@ class LegacyRecorder:
 
         self.create_timeline_activity_chart() 
         
-        # Ensure timeline_frame is created correctly for entries
-        self.timeline_frame = ctk.CTkScrollableFrame(self.main_frame, fg_color="transparent") 
-        self.timeline_frame.grid(row=2, column=0, sticky="nsew", pady=(10,20), padx=20) 
-        self.timeline_frame.grid_columnconfigure(0, weight=1) 
-        
         self.timeline_play_buttons = {} 
-        self.load_timeline_entries() 
+        self.timeline_frame = VirtualEntryList(self.main_frame, TimelineSource(self.store), lambda parent: TimelineRow(parent, self),
+                                               empty_text="No entries yet. Start recording your legacy!", executor=self.tasks, fg_color="transparent")
+        self.timeline_frame.grid(row=2, column=0, sticky="nsew", pady=(10,10), padx=20) 
+        self.main_frame.grid_rowconfigure(3, weight=0)
+        self.create_playback_bar(row=3)
     
     def create_timeline_activity_chart(self):
         # This method places its content in self.main_frame at row=1
@@ -423,84 +1031,20 @@ class LegacyRecorder:
         chart_title = ctk.CTkLabel(chart_container, text="Activity - Last 30 Days", font=ctk.CTkFont(size=12, weight="bold")) # Smaller title
         chart_title.grid(row=0, column=0, pady=(0,2), sticky="w")
 
-        self.timeline_activity_bars_frame = ctk.CTkFrame(chart_container, fg_color="transparent", height=60) # Reduced height
-        self.timeline_activity_bars_frame.grid(row=1, column=0, sticky="nsew")
+        self.timeline_activity_chart = ActivityChart(chart_container, days=30, bar_area_height=40, bar_width=5, font_size=7,
+                                                     zero_bar_height=2, label_for=ActivityChart.sparse_day_label)
+        self.timeline_activity_chart.grid(row=1, column=0, sticky="nsew")
+        self.update_timeline_activity_chart()
 
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def update_timeline_activity_chart(self):
         try:
             end_date = datetime.date.today()
             start_date = end_date - datetime.timedelta(days=29)
-            
-            activity_data = {}
-            current_date_iter = start_date
-            while current_date_iter <= end_date:
-                activity_data[current_date_iter.strftime("%Y-%m-%d")] = 0
-                current_date_iter += datetime.timedelta(days=1)
-            
-            cursor.execute("SELECT date, COUNT(*) FROM entries WHERE date BETWEEN ? AND ? GROUP BY date", (start_date, end_date))
-            
-            raw_counts = cursor.fetchall()
-            for date_str, count_val in raw_counts: 
-                if date_str in activity_data: 
-                    activity_data[date_str] = count_val
-
-            max_val = max(activity_data.values() or [1]) # Ensure max_val is at least 1
-            
-            num_days = len(activity_data)
-            
-            for widget in self.timeline_activity_bars_frame.winfo_children():
-                widget.destroy()
-
-            self.timeline_activity_bars_frame.grid_columnconfigure(list(range(num_days)), weight=1) 
-            self.timeline_activity_bars_frame.grid_rowconfigure(0, weight=1) # Bar area
-            self.timeline_activity_bars_frame.grid_rowconfigure(1, weight=0) # Label area
-            
-            sorted_dates_keys = sorted(activity_data.keys())
-
-            for idx, date_key in enumerate(sorted_dates_keys):
-                count_val = activity_data[date_key] 
-                bar_height_ratio = count_val / max_val if max_val > 0 else 0
-                bar_pixel_height = int(bar_height_ratio * 40) # Max bar height of 40px for this chart
-                
-                day_column_frame = ctk.CTkFrame(self.timeline_activity_bars_frame, fg_color="transparent")
-                day_column_frame.grid(row=0, column=idx, sticky="nsew", padx=1) # Use row 0 for the combined bar+label column
-                day_column_frame.grid_rowconfigure(0, weight=1) 
-                day_column_frame.grid_rowconfigure(1, weight=0) 
-                day_column_frame.grid_columnconfigure(0, weight=1)
-
-                # Use a very light gray for zero-count days if theme is light, else transparent
-                theme_mode = ctk.get_appearance_mode()
-                zero_bar_color = "#F0F0F0" if theme_mode == "Light" else "#303030" # Subtle indication for zero days
-                bar_color = ctk.ThemeManager.theme["CTkButton"]["fg_color"] if count_val > 0 else zero_bar_color
-                
-                current_bar_height = bar_pixel_height if count_val > 0 else 2 # Min height for zero-count bars
-                
-                bar = ctk.CTkFrame(day_column_frame, width=5, height=current_bar_height, 
-                                   fg_color=bar_color, corner_radius=1)
-                bar.grid(row=0, column=0, sticky="s", pady=(max(0, 40 - current_bar_height),0)) 
-                
-                dt_obj = datetime.datetime.strptime(date_key, "%Y-%m-%d")
-                # Labeling logic: Show day number. If it's 1st, also show month abbreviation.
-                day_label_text = str(dt_obj.day)
-                if dt_obj.day == 1:
-                    day_label_text = f"{dt_obj.strftime('%b')}\n{dt_obj.day}"
-                elif idx == 0 or idx == (num_days - 1) or (idx % 7 == 0 and num_days > 14): # Start, end, or weekly for longer views
-                    pass # Just day number is fine
-                elif num_days <= 14 and idx % 2 == 0: # More frequent for shorter views
-                    pass
-                else: # Don't show label for other days to reduce clutter
-                    day_label_text = ""
-                   
-                if day_label_text: # Only create label if there's text
-                    date_lbl = ctk.CTkLabel(day_column_frame, text=day_label_text, font=ctk.CTkFont(size=7)) # Smaller font
-                    date_lbl.grid(row=1, column=0, sticky="n", pady=(1,0))
+            self.timeline_activity_chart.update_data(self.store.activity_counts(start_date, end_date))
         except sqlite3.Error as e:
             print(f"Database error loading timeline activity chart: {e}")
-        finally:
-            if conn:
-                conn.close()
 
+    @METRICS.timed("view.show_search")
     def show_search(self):
         self.clear_main_frame()
         self._update_home_button_visibility(True)
@@ -515,14 +1059,45 @@ class LegacyRecorder:
         search_label = ctk.CTkLabel(search_frame, text="Search:")
         search_label.grid(row=0, column=0, padx=(20, 10), pady=15)
         
-        self.search_entry = ctk.CTkEntry(search_frame, placeholder_text="Enter keywords...")
+        self.search_entry = ctk.CTkEntry(search_frame, placeholder_text='Keywords, "exact phrase" or prefix*')
         self.search_entry.grid(row=0, column=1, sticky="ew", padx=(0, 10), pady=15)
+        self.search_entry.bind("<Return>", lambda _e: self.perform_search())
+        self.search_entry.bind("<KeyRelease>", self._search_typed)
         
         search_btn = ctk.CTkButton(search_frame, text="🔍 Search", command=self.perform_search)
         search_btn.grid(row=0, column=2, padx=(0, 20), pady=15)
         
-        self.search_results = ctk.CTkScrollableFrame(self.main_frame, height=300)
-        self.search_results.grid(row=2, column=0, sticky="nsew", pady=20)
+        self.selected_tags = []
+        self._search_key = None
+        self.tag_cloud_frame = ctk.CTkFrame(self.main_frame, fg_color="transparent")
+        self.tag_cloud_frame.grid(row=2, column=0, sticky="ew", padx=10)
+        self.tag_match_mode = ctk.CTkSegmentedButton(self.tag_cloud_frame, values=["All tags", "Any tag"], command=lambda _v: self.perform_search())
+        self.tag_match_mode.set("All tags")
+        self.tasks.submit(self.store.tag_counts, 40, on_success=self.show_tag_cloud)
+        
+        for row, weight in enumerate((0, 0, 0, 1)): self.main_frame.grid_rowconfigure(row, weight=weight)
+        self.timeline_play_buttons = {}
+        self.search_list = VirtualEntryList(self.main_frame, SearchSource(self.store), lambda parent: SearchResultRow(parent, self),
+                                            empty_text="Type to search your journal.", executor=self.tasks, fg_color="transparent")
+        self.search_list.grid(row=3, column=0, sticky="nsew", pady=20, padx=20)
+
+    def show_tag_cloud(self, tag_counts):
+        if not self.tag_cloud_frame.winfo_exists() or not tag_counts: return
+        self.tag_match_mode.grid(row=0, column=0, columnspan=6, sticky="w", padx=5, pady=(0, 5))
+        self.tag_buttons = {}
+        for i, (name, count) in enumerate(tag_counts):
+            btn = ctk.CTkButton(self.tag_cloud_frame, text=f"🏷️ {name} ({count})", height=24, width=0, corner_radius=12,
+                                font=ctk.CTkFont(size=11), fg_color="transparent", border_width=1,
+                                command=lambda n=name: self.toggle_tag_filter(n))
+            btn.grid(row=1 + i // 6, column=i % 6, padx=3, pady=3, sticky="w")
+            self.tag_buttons[name] = btn
+
+    def toggle_tag_filter(self, name):
+        if name in self.selected_tags: self.selected_tags.remove(name)
+        else: self.selected_tags.append(name)
+        btn = self.tag_buttons[name]
+        btn.configure(fg_color=ctk.ThemeManager.theme["CTkButton"]["fg_color"] if name in self.selected_tags else "transparent")
+        self.perform_search()
     
     def show_export(self):
         self.clear_main_frame()
@@ -538,7 +1113,7 @@ class LegacyRecorder:
         date_label.grid(row=0, column=0, columnspan=2, pady=(20, 10))
         
         current_year = datetime.datetime.now().year
-        years = [str(year) for year in range(current_year-2, current_year+1)]
+        years = ["All years"] + [str(year) for year in range(current_year-2, current_year+1)]
         
         self.year_combo = ctk.CTkComboBox(export_frame, values=years, width=120)
         self.year_combo.grid(row=1, column=0, padx=20, pady=10)
@@ -550,11 +1125,32 @@ class LegacyRecorder:
         self.month_combo.grid(row=1, column=1, padx=20, pady=10)
         self.month_combo.set("All")
         
-        export_txt_btn = ctk.CTkButton(export_frame, text="📄 Export as TXT", command=self.export_txt, height=THEME_BUTTON_HEIGHT, corner_radius=THEME_CORNER_RADIUS)
-        export_txt_btn.grid(row=2, column=0, padx=20, pady=20)
+        self.export_from_entry = ctk.CTkEntry(export_frame, placeholder_text="From YYYY-MM-DD", width=120)
+        self.export_from_entry.grid(row=2, column=0, padx=20, pady=5)
+        self.export_to_entry = ctk.CTkEntry(export_frame, placeholder_text="To YYYY-MM-DD", width=120)
+        self.export_to_entry.grid(row=2, column=1, padx=20, pady=5)
+        
+        self.export_tags_entry = ctk.CTkEntry(export_frame, placeholder_text="Only these tags (comma separated)")
+        self.export_tags_entry.grid(row=3, column=0, columnspan=2, padx=20, pady=5, sticky="ew")
+        self.export_tag_mode = ctk.CTkSegmentedButton(export_frame, values=["All tags", "Any tag"])
+        self.export_tag_mode.grid(row=4, column=0, columnspan=2, padx=20, pady=5)
+        self.export_tag_mode.set("All tags")
         
-        export_docx_btn = ctk.CTkButton(export_frame, text="📄 Export as DOCX", command=self.export_docx, height=THEME_BUTTON_HEIGHT, corner_radius=THEME_CORNER_RADIUS)
-        export_docx_btn.grid(row=2, column=1, padx=20, pady=20)
+        self.export_format_combo = ctk.CTkComboBox(export_frame, values=list(EXPORT_WRITERS), width=140)
+        self.export_format_combo.grid(row=5, column=0, padx=20, pady=(15, 5))
+        self.export_format_combo.set("TXT")
+        self.export_embed_audio = ctk.CTkCheckBox(export_frame, text="Embed audio (HTML)")
+        self.export_embed_audio.grid(row=5, column=1, padx=20, pady=(15, 5))
+        
+        export_btn = ctk.CTkButton(export_frame, text="📤 Export", command=self.export_entries, height=THEME_BUTTON_HEIGHT, corner_radius=THEME_CORNER_RADIUS)
+        export_btn.grid(row=6, column=0, columnspan=2, padx=20, pady=20)
+        
+        self.export_cancel_btn = ctk.CTkButton(export_frame, text="✖ Cancel Export", command=self.cancel_export, fg_color="gray", height=THEME_BUTTON_HEIGHT-10, corner_radius=THEME_CORNER_RADIUS)
+        self.export_cancel_btn.grid(row=7, column=0, columnspan=2, pady=(0, 20))
+        if not self._export_running(): self.export_cancel_btn.grid_remove()
+        
+        self.import_btn = ctk.CTkButton(export_frame, text="📥 Import Folder...", command=self.import_folder, height=THEME_BUTTON_HEIGHT, corner_radius=THEME_CORNER_RADIUS)
+        self.import_btn.grid(row=8, column=0, columnspan=2, padx=20, pady=(0, 20))
     
     def show_settings(self):
         self.clear_main_frame()
@@ -581,8 +1177,109 @@ class LegacyRecorder:
         self.font_slider.grid(row=2, column=1, pady=(20, 10), sticky="ew", padx=(20, 0))
         self.font_slider.set(self.settings["font_size"])
         
+        codec_label = ctk.CTkLabel(settings_frame, text="🎧 Audio Format:")
+        codec_label.grid(row=3, column=0, pady=10, sticky="w")
+        
+        # Probing codecs imports the audio stack, so the list is filled in from the I/O pool on first open.
+        self.codec_combo = ctk.CTkComboBox(settings_frame, values=[self.settings["audio_codec"]], width=120, state="disabled")
+        self.codec_combo.grid(row=3, column=1, pady=10, sticky="w", padx=(20, 0))
+        self.codec_combo.set(self.settings["audio_codec"])
+        if self.audio_codecs is None:
+            self.tasks.submit(self.probe_audio_codecs, on_success=self._audio_codecs_probed, on_error=lambda e: print(f"Error probing audio codecs: {e}"))
+        else: self._audio_codecs_probed(self.audio_codecs)
+        
+        self.transcode_btn = ctk.CTkButton(settings_frame, text="🗜️ Compress Existing Recordings", command=self.transcode_existing_audio, height=THEME_BUTTON_HEIGHT, corner_radius=THEME_CORNER_RADIUS)
+        self.transcode_btn.grid(row=4, column=0, columnspan=2, pady=(10, 0))
+        
+        backup_label = ctk.CTkLabel(settings_frame, text="🗄️ Backups", font=ctk.CTkFont(size=16, weight="bold"))
+        backup_label.grid(row=5, column=0, columnspan=2, pady=(20, 10), sticky="w")
+        
+        self.backup_switch = ctk.CTkSwitch(settings_frame, text=f"Back up daily at {self.settings['backup_time']}")
+        self.backup_switch.grid(row=6, column=0, columnspan=2, pady=5, sticky="w")
+        if self.settings["daily_backup"]: self.backup_switch.select()
+        
+        self.backup_btn = ctk.CTkButton(settings_frame, text="🗄️ Back Up Now", command=self.start_backup, height=THEME_BUTTON_HEIGHT, corner_radius=THEME_CORNER_RADIUS)
+        self.backup_btn.grid(row=7, column=0, columnspan=2, pady=(10, 0))
+        
+        snapshots = self.backups.snapshots()
+        self.snapshot_combo = ctk.CTkComboBox(settings_frame, values=snapshots or ["No backups yet"], width=180)
+        self.snapshot_combo.grid(row=8, column=0, pady=10, sticky="w")
+        self.snapshot_combo.set(snapshots[0] if snapshots else "No backups yet")
+        restore_btn = ctk.CTkButton(settings_frame, text="♻️ Restore Snapshot", command=self.restore_snapshot, height=THEME_BUTTON_HEIGHT-10, corner_radius=THEME_CORNER_RADIUS)
+        restore_btn.grid(row=8, column=1, pady=10, sticky="w", padx=(20, 0))
+        
+        transcription_label = ctk.CTkLabel(settings_frame, text="📝 Transcription", font=ctk.CTkFont(size=16, weight="bold"))
+        transcription_label.grid(row=9, column=0, columnspan=2, pady=(20, 10), sticky="w")
+        
+        backends = transcribe_services.available_backends()
+        self.transcription_backend_combo = ctk.CTkComboBox(settings_frame, values=backends or ["No engine installed"], width=120)
+        self.transcription_backend_combo.grid(row=10, column=0, pady=5, sticky="w")
+        self.transcription_backend_combo.set(self.settings["transcription_backend"] if self.settings["transcription_backend"] in backends else (backends or ["No engine installed"])[0])
+        model_frame = ctk.CTkFrame(settings_frame, fg_color="transparent")
+        model_frame.grid(row=10, column=1, pady=5, sticky="ew", padx=(20, 0))
+        self.transcription_model_entry = ctk.CTkEntry(model_frame, placeholder_text="Speech model file or folder", width=220)
+        self.transcription_model_entry.grid(row=0, column=0, sticky="ew")
+        if self.settings["transcription_model"]: self.transcription_model_entry.insert(0, self.settings["transcription_model"])
+        ctk.CTkButton(model_frame, text="Browse", width=70, command=self.browse_transcription_model).grid(row=0, column=1, padx=(5, 0))
+        
+        self.transcription_auto_switch = ctk.CTkSwitch(settings_frame, text="Transcribe new recordings automatically")
+        self.transcription_auto_switch.grid(row=11, column=0, columnspan=2, pady=5, sticky="w")
+        if self.settings["transcription_auto"]: self.transcription_auto_switch.select()
+        
+        self.transcribe_btn = ctk.CTkButton(settings_frame, text="📝 Transcribe Recordings", command=self.transcribe_recordings, height=THEME_BUTTON_HEIGHT, corner_radius=THEME_CORNER_RADIUS)
+        self.transcribe_btn.grid(row=12, column=0, columnspan=2, pady=(10, 0))
+        self._set_transcription_busy(getattr(self, 'transcription_task', None) is not None)
+        
         save_settings_btn = ctk.CTkButton(settings_frame, text="💾 Save Settings", command=self.save_user_settings, height=THEME_BUTTON_HEIGHT, corner_radius=THEME_CORNER_RADIUS)
-        save_settings_btn.grid(row=3, column=0, columnspan=2, pady=20)
+        save_settings_btn.grid(row=13, column=0, columnspan=2, pady=20)
+        self.create_diagnostics_panel()
+
+    def create_diagnostics_panel(self):
+        panel = ctk.CTkFrame(self.main_frame)
+        panel.grid(row=2, column=0, pady=(0, 20), padx=50, sticky="nsew")
+        panel.grid_columnconfigure(2, weight=1)
+        panel.grid_rowconfigure(2, weight=1)
+        ctk.CTkLabel(panel, text="🩺 Diagnostics", font=ctk.CTkFont(size=16, weight="bold")).grid(row=0, column=0, columnspan=3, pady=(10, 5), padx=10, sticky="w")
+        self.diagnostics_switch = ctk.CTkSwitch(panel, text="Collect timings", command=self._diagnostics_toggled)
+        self.diagnostics_switch.grid(row=1, column=0, padx=10, sticky="w")
+        self.diagnostics_log_switch = ctk.CTkSwitch(panel, text="Write JSON log", command=self._diagnostics_toggled)
+        self.diagnostics_log_switch.grid(row=1, column=1, padx=10, sticky="w")
+        if self.settings["diagnostics_enabled"]: self.diagnostics_switch.select()
+        if self.settings["diagnostics_log"]: self.diagnostics_log_switch.select()
+        ctk.CTkButton(panel, text="Reset", width=80, command=METRICS.reset).grid(row=1, column=2, padx=10, sticky="e")
+        self.diagnostics_text = ctk.CTkTextbox(panel, height=160, font=ctk.CTkFont(family="Courier", size=11), wrap="none")
+        self.diagnostics_text.grid(row=2, column=0, columnspan=3, padx=10, pady=10, sticky="nsew")
+        self._refresh_diagnostics()
+
+    def _diagnostics_toggled(self):
+        self.settings["diagnostics_enabled"] = bool(self.diagnostics_switch.get())
+        self.settings["diagnostics_log"] = bool(self.diagnostics_log_switch.get())
+        self.save_settings()
+        self.apply_diagnostics()
+
+    def _refresh_diagnostics(self):
+        if not (hasattr(self, 'diagnostics_text') and self.diagnostics_text.winfo_exists()): return
+        text = METRICS.format() if METRICS.enabled else "Timings are off. Turn on \"Collect timings\" and use the app to see where time goes."
+        self.diagnostics_text.configure(state="normal")
+        self.diagnostics_text.delete("1.0", "end"); self.diagnostics_text.insert("1.0", text)
+        self.diagnostics_text.configure(state="disabled")
+        self.root.after(self.DIAGNOSTICS_REFRESH_MS, self._refresh_diagnostics)
+
+    def apply_diagnostics(self):
+        METRICS.enabled = bool(self.settings["diagnostics_enabled"])
+        if METRICS.enabled and self.settings["diagnostics_log"]: METRICS.start_log(str(self.metrics_log_path))
+        else: METRICS.stop_log()
+        if METRICS.enabled and getattr(self, '_heartbeat_id', None) is None:
+            self._heartbeat_due = time.perf_counter() + self.EVENT_LOOP_PROBE_MS / 1000
+            self._heartbeat_id = self.root.after(self.EVENT_LOOP_PROBE_MS, self._event_loop_heartbeat)
+
+    def _event_loop_heartbeat(self):
+        # How late a timer fires is how long queued Tk events waited behind whatever was running on this thread.
+        if not METRICS.enabled: self._heartbeat_id = None; return
+        now = time.perf_counter()
+        METRICS.record("tk.event_loop_latency", max(0.0, now - self._heartbeat_due))
+        self._heartbeat_due = now + self.EVENT_LOOP_PROBE_MS / 1000
+        self._heartbeat_id = self.root.after(self.EVENT_LOOP_PROBE_MS, self._event_loop_heartbeat)
     
     def save_text_entry(self):
         content = self.text_entry.get("1.0", "end-1c").strip()
@@ -590,139 +1287,153 @@ class LegacyRecorder:
         if not content or content == "Dear Future Generation,\n\nToday I want to share with you...":
             messagebox.showwarning("Empty Entry", "Please write something before saving.")
             return
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
         today = datetime.datetime.now().strftime("%Y-%m-%d")
-        cursor.execute("INSERT INTO entries (date, type, content, tags) VALUES (?, ?, ?, ?)", (today, 'text', content, tags))
-        conn.commit()
-        conn.close()
-        self.save_text_to_file(content, today)
+        self.save_entry_btn.configure(state="disabled")
+        self.update_status("Saving entry...")
+        self.tasks.submit(self._store_text_entry, today, content, tags, on_success=self._text_entry_saved, on_error=self._text_entry_save_failed)
+
+    def _store_text_entry(self, today, content, tags):
+        entry_id = self.store.add_entry(today, 'text', content, tags)
+        self.text_mirror.write(entry_id, today, content)
+        return entry_id
+
+    def _text_entry_saved(self, _entry_id):
         messagebox.showinfo("Success", "Entry saved successfully!")
-        self.text_entry.delete("1.0", "end")
-        self.tags_entry.delete(0, "end")
+        if self.text_entry.winfo_exists():
+            self.text_entry.delete("1.0", "end")
+            self.tags_entry.delete(0, "end")
+            self.save_entry_btn.configure(state="normal")
         self.update_status("Entry saved")
         if self.dashboard_frame_cached: self.load_dashboard_stats()
-    
-    def save_text_to_file(self, content, date):
-        year, month, day = datetime.datetime.now().year, datetime.datetime.now().strftime("%B"), datetime.datetime.now().day
-        month_dir = self.entries_dir / str(year) / month
-        month_dir.mkdir(parents=True, exist_ok=True)
-        filepath = month_dir / f"{day:02d}_written.txt"
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(f"Date: {date}\nType: Text Entry\n{'-'*50}\n{content}")
+
+    def _text_entry_save_failed(self, error):
+        if self.save_entry_btn.winfo_exists(): self.save_entry_btn.configure(state="normal")
+        messagebox.showerror("Save Error", f"Could not save entry: {error}", parent=self.root)
     
     def toggle_recording(self):
         if not self.is_recording: self.start_recording()
         else: self.stop_recording()
     
     def start_recording(self):
+        today = datetime.datetime.now()
+        stem_path = self.entries_dir / str(today.year) / today.strftime("%B") / f"{today.day:02d}_audio_{int(time.time())}"
+        try: self.audio_writer = audio_services.open_audio_writer(stem_path, self.settings["audio_codec"], self.sample_rate)
+        except Exception as e:
+            messagebox.showerror("Audio Save Error", f"Failed to create audio file: {e}"); return
+        # In voice-activated mode the gate sits in front of the writer and only lets speech (plus pre-roll) through.
+        sink = (audio_services.VoiceActivityGate(self.audio_writer, max_silence=self.settings["vad_max_silence"])
+                if self.settings["voice_activated"] else self.audio_writer)
         self.is_recording = True
-        self.audio_data = []
         self.record_btn.configure(text="⏹️ Stop Recording")
-        self.recording_status.configure(text="🔴 Recording...")
-        self.recording_thread = threading.Thread(target=self.record_audio, daemon=True)
+        self.recording_status.configure(text="🔴 Listening..." if sink is not self.audio_writer else "🔴 Recording...")
+        if self.level_meter is None: self.level_meter = audio_services.LevelMeter()
+        self.audio_writer.peaks = peak_services.PeakBuilder(self.audio_writer.sample_rate)
+        self.level_meter.reset()
+        self.audio_sink = sink
+        self.recording_thread = threading.Thread(target=self.record_audio, args=(sink,), daemon=True)
         self.recording_thread.start()
+        self.poll_level_meter()
         self.update_status("Recording audio...")
     
-    def record_audio(self):
-        def callback(indata, frames, time_info, status):
-            if status: pass
-            if self.is_recording:
-                self.audio_data.extend(indata.copy())
-                rms = np.sqrt(np.mean(indata**2))
-                normalized_rms = min(rms * 10, 1.0) 
-                self.root.after(0, self.update_audio_level_display, normalized_rms)
+    def record_audio(self, writer):
         try:
-            with sd.InputStream(callback=callback, samplerate=self.sample_rate, channels=1, dtype='float32'):
-                while self.is_recording: time.sleep(0.1) 
+            audio_services.record_stream(writer, self.level_meter, lambda: self.is_recording)
         except Exception as e:
             print(f"Error during audio recording stream: {e}")
-            messagebox.showerror("Audio Error", f"Could not start audio recording: {e}")
             self.is_recording = False 
-            self.record_btn.configure(text="🔴 Start Recording")
-            self.recording_status.configure(text="Error: Could not record")
+            writer.error = e
+        finally:
+            # Only the queued tail is left to flush, so finalizing is quick regardless of recording length.
+            writer.close()
+            self.tasks.call_soon(self.finish_recording, writer)
     
     def stop_recording(self):
         self.is_recording = False
         self.record_btn.configure(text="🔴 Start Recording")
         self.recording_status.configure(text="Processing...")
-        if len(self.audio_data) > 0:
-            try: audio_array = np.array(self.audio_data, dtype=np.float32)
-            except Exception as e:
-                messagebox.showerror("Audio Processing Error", f"Failed to process audio data: {e}")
-                self.recording_status.configure(text="Ready to record"); return
-            today = datetime.datetime.now()
-            month_dir = self.entries_dir / str(today.year) / today.strftime("%B")
-            month_dir.mkdir(parents=True, exist_ok=True)
-            filepath = month_dir / f"{today.day:02d}_audio_{int(time.time())}.wav"
-            try: wav.write(str(filepath), self.sample_rate, audio_array)
-            except Exception as e:
-                messagebox.showerror("Audio Save Error", f"Failed to save audio file: {e}")
-                self.recording_status.configure(text="Ready to record"); return
-            self.save_audio_entry(str(filepath), self.audio_tags_entry.get().strip())
-            messagebox.showinfo("Success", f"Audio recorded and saved!\nFile: {filepath.name}")
-            self.audio_tags_entry.delete(0, "end")
-            self.update_status("Audio saved")
-            if self.dashboard_frame_cached: self.load_dashboard_stats()
-        else: messagebox.showwarning("No Audio", "No audio was recorded.")
-        self.recording_status.configure(text="Ready to record")
     
-    def save_audio_entry(self, filepath, tags):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def finish_recording(self, writer):
+        filepath = writer.filepath
+        if writer.error:
+            if writer.frames_written == 0: filepath.unlink(missing_ok=True)
+            if hasattr(self, 'record_btn') and self.record_btn.winfo_exists(): self.record_btn.configure(text="🔴 Start Recording")
+            messagebox.showerror("Audio Error", f"Could not record audio: {writer.error}")
+        elif writer.frames_written > 0:
+            if writer.dropped_blocks: print(f"Audio writer fell behind; dropped {writer.dropped_blocks} blocks")
+            tags = self.audio_tags_entry.get().strip() if self.audio_tags_entry.winfo_exists() else ""
+            skipped = getattr(writer, 'trimmed_samples', 0) / writer.sample_rate
+            self.tasks.submit(self.save_audio_entry, str(filepath), tags, writer.peaks,
+                              on_success=lambda entry_id: self._audio_entry_saved(entry_id, filepath, skipped),
+                              on_error=lambda e: messagebox.showerror("Audio Save Error", f"Failed to save audio entry: {e}", parent=self.root))
+        else:
+            filepath.unlink(missing_ok=True)
+            messagebox.showwarning("No Audio", "No speech was detected." if hasattr(writer, 'segments') else "No audio was recorded.")
+        if hasattr(self, 'recording_status') and self.recording_status.winfo_exists():
+            self.recording_status.configure(text="Ready to record")
+    
+    def _audio_entry_saved(self, entry_id, filepath, skipped=0.0):
+        if self.settings["transcription_auto"]: self.transcribe_recordings([entry_id], quiet=True)
+        messagebox.showinfo("Success", f"Audio recorded and saved!\nFile: {filepath.name}")
+        if self.audio_tags_entry.winfo_exists(): self.audio_tags_entry.delete(0, "end")
+        self.update_status(f"Audio saved ({skipped:.0f}s of silence skipped)" if skipped >= 1 else "Audio saved")
+        if self.dashboard_frame_cached: self.load_dashboard_stats()
+
+    def save_audio_entry(self, filepath, tags, peaks=None):
         today = datetime.datetime.now().strftime("%Y-%m-%d")
-        cursor.execute("INSERT INTO entries (date, type, content, tags) VALUES (?, ?, ?, ?)", (today, 'audio', filepath, tags))
-        conn.commit()
-        conn.close()
+        entry_id = self.store.add_entry(today, 'audio', filepath, tags)
+        # The writer built the envelope while recording, so the new entry's thumbnail costs no extra decode.
+        if peaks is not None:
+            try: self.peak_cache.put(entry_id, filepath, peaks.finish())
+            except OSError as e: print(f"Could not save waveform peaks: {e}")
+        return entry_id
+
+    @property
+    def peak_cache(self):
+        if self._peak_cache is None: self._peak_cache = peak_services.PeakCache(self.app_dir / "cache" / "peaks")
+        return self._peak_cache
+
+    def cached_peaks(self, entry_id, audio_path):
+        """Peaks for an audio entry if they are in memory; otherwise return None and load (or build) them on the
+        media lane, so scrolling never stats or reads a file on the Tk thread. Rows fill in when they arrive."""
+        peaks = self.peak_cache.peek(entry_id, audio_path)
+        if peaks is None and entry_id not in self._peaks_pending:
+            self._peaks_pending[entry_id] = self.tasks.submit(
+                self.peak_cache.load, entry_id, audio_path, with_task=True, lane="media",
+                on_success=lambda loaded: self._peaks_built(entry_id, loaded),
+                on_error=lambda e: self._peaks_failed(entry_id, audio_path, e))
+        return peaks
+
+    def release_peaks(self, entry_id):
+        # A row scrolled away from the entry; drop its pending load unless another row still shows it.
+        if entry_id in self._peaks_pending and not self._rows_showing(entry_id): self._peaks_pending.pop(entry_id).cancel()
+
+    def _rows_showing(self, entry_id):
+        rows = []
+        for entry_list in (getattr(self, 'timeline_frame', None), getattr(self, 'search_list', None)):
+            if entry_list is not None and entry_list.winfo_exists():
+                entry_list.for_each_row(lambda row: row.entry and row.entry[0] == entry_id and rows.append(row))
+        return rows
+
+    def _peaks_built(self, entry_id, peaks):
+        self._peaks_pending.pop(entry_id, None)
+        for row in self._rows_showing(entry_id): row.show_peaks(peaks)
+
+    def _peaks_failed(self, entry_id, audio_path, error):
+        self._peaks_pending.pop(entry_id, None)
+        print(f"Could not compute peaks for {audio_path}: {error}")
     
     def load_timeline_entries(self):
-        for widget in self.timeline_frame.winfo_children(): widget.destroy()
-        self.timeline_play_buttons.clear() 
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, date, type, content, tags, timestamp FROM entries ORDER BY timestamp DESC LIMIT 20") # Added id
-        entries = cursor.fetchall()
-        conn.close()
-        if not entries:
-            ctk.CTkLabel(self.timeline_frame, text="No entries yet. Start recording your legacy!", font=ctk.CTkFont(size=16)).grid(row=0, column=0, pady=50, padx=20, sticky="ew")
-            return
-        for i, (entry_id, date, entry_type, content, tags, timestamp) in enumerate(entries): # Added entry_id
-            entry_frame = ctk.CTkFrame(self.timeline_frame, corner_radius=THEME_CORNER_RADIUS-2, fg_color=self._get_current_card_fg_color())
-            entry_frame.grid(row=i, column=0, sticky="ew", pady=5, padx=5) 
-            entry_frame.grid_columnconfigure(1, weight=1) # Main content
-            entry_frame.grid_columnconfigure(2, weight=0) # Button column
-
-            icon = "📝" if entry_type == "text" else "🎙️"
-            ctk.CTkLabel(entry_frame, text=icon, font=ctk.CTkFont(size=20)).grid(row=0, column=0, rowspan=3, padx=15, pady=10, sticky="ns")
-            
-            details_frame = ctk.CTkFrame(entry_frame, fg_color="transparent") 
-            details_frame.grid(row=0, column=1, sticky="ew", padx=(0, 15), pady=5)
-            details_frame.grid_columnconfigure(0, weight=1)
-            
-            dt = datetime.datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-            ctk.CTkLabel(details_frame, text=dt.strftime("%B %d, %Y at %I:%M %p"), font=ctk.CTkFont(size=12, weight="bold")).grid(row=0, column=0, sticky="w", padx=10, pady=(5, 0))
-            
-            preview_content = content
-            if entry_type == "text":
-                preview_content = (content[:100] + "...") if len(content) > 100 else content
-            else: # audio
-                preview_content = f"Audio file: {Path(content).name}"
-            ctk.CTkLabel(details_frame, text=preview_content, font=ctk.CTkFont(size=11), wraplength=350, anchor="w", justify="left").grid(row=1, column=0, sticky="ew", padx=10, pady=(0, 5))
-            
-            if tags: ctk.CTkLabel(details_frame, text=f"🏷️ {tags}", font=ctk.CTkFont(size=10), text_color="gray", anchor="w").grid(row=2, column=0, sticky="ew", padx=10, pady=(0, 5))
-            
-            action_button_frame = ctk.CTkFrame(entry_frame, fg_color="transparent")
-            action_button_frame.grid(row=0, column=2, rowspan=3, padx=10, pady=10, sticky="e")
-
-            if entry_type == 'audio':
-                btn = ctk.CTkButton(action_button_frame, text="▶️ Play", width=60, height=THEME_BUTTON_HEIGHT-10, corner_radius=THEME_CORNER_RADIUS-2)
-                btn.configure(command=lambda c=content, b=btn: self.toggle_audio_playback(c, b))
-                btn.pack(pady=2) # Use pack for simple vertical layout
-                self.timeline_play_buttons[content] = btn
-            elif entry_type == 'text':
-                view_btn = ctk.CTkButton(action_button_frame, text="📄 View", width=60, height=THEME_BUTTON_HEIGHT-10, corner_radius=THEME_CORNER_RADIUS-2)
-                view_btn.configure(command=lambda current_id=entry_id: self.show_text_entry_dialog(current_id))
-                view_btn.pack(pady=2)
+        if hasattr(self, 'timeline_frame') and self.timeline_frame.winfo_exists(): self.timeline_frame.reload()
+
+    def poll_level_meter(self):
+        # The GUI samples the meter at a fixed frame rate instead of being called once per audio block.
+        rms, held_peak = self.level_meter.poll() if self.is_recording else (0.0, 0.0)
+        self.update_audio_level_display(min(rms * 10, 1.0))
+        if self.is_recording and self.audio_sink is not self.audio_writer and self.recording_status.winfo_exists():
+            self.recording_status.configure(text="🔴 Recording..." if self.audio_sink.open else "🔴 Listening...")
+        if hasattr(self, 'waveform_preview') and self.waveform_preview.winfo_exists():
+            self.waveform_preview.draw(self.level_meter.history if self.is_recording else (), held_peak)
+        if self.is_recording: self.root.after(self.LEVEL_METER_INTERVAL_MS, self.poll_level_meter)
 
     def update_audio_level_display(self, level):
         if hasattr(self, 'audio_level') and self.audio_level.winfo_exists(): self.audio_level.set(level)
@@ -742,86 +1453,121 @@ class LegacyRecorder:
     def play_audio_entry(self, audio_filepath, button_widget=None): 
         if not Path(audio_filepath).exists():
             messagebox.showerror("Playback Error", f"Audio file not found: {audio_filepath}", parent=self.root); return
+        try: self.player.play(audio_filepath)
+        except Exception as e:
+            if button_widget and button_widget.winfo_exists(): button_widget.configure(text="▶️ Play")
+            messagebox.showerror("Playback Error", f"Could not play audio: {e}", parent=self.root); return
         self.currently_playing_file = audio_filepath 
-        def _play():
-            self.is_playing_audio = True
-            try:
-                samplerate, audio_data_arr = wav.read(audio_filepath)
-                sd.play(audio_data_arr, samplerate); sd.wait()  
-            except Exception as e: messagebox.showerror("Playback Error", f"Could not play audio: {e}", parent=self.root)
-            finally:
-                self.is_playing_audio = False; self.currently_playing_file = None
-                if button_widget and button_widget.winfo_exists(): self.root.after(0, lambda bw=button_widget: bw.configure(text="▶️ Play"))
-                self.current_playback_thread = None
-        self.current_playback_thread = threading.Thread(target=_play, daemon=True); self.current_playback_thread.start()
+        self.is_playing_audio = True
+        self.playback_button = button_widget
+        self.update_playback_bar()
+
+    def _playback_finished(self, session):
+        # Also fires for streams stop() aborted; ignore it if another file has started playing since.
+        self.tasks.call_soon(lambda: session == self.player.session and self.stop_current_audio_playback())
 
     def stop_current_audio_playback(self):
+        self.player.stop()
         if self.is_playing_audio:
-            sd.stop(); self.is_playing_audio = False
+            self.is_playing_audio = False
             if hasattr(self, 'timeline_play_buttons'):
                 for btn in self.timeline_play_buttons.values():
                     if btn.winfo_exists(): btn.configure(text="▶️ Play")
+            if getattr(self, 'playback_button', None) and self.playback_button.winfo_exists(): self.playback_button.configure(text="▶️ Play")
             self.currently_playing_file = None 
+            self.update_playback_bar()
 
-    def perform_search(self):
-        query = self.search_entry.get().strip().lower()
-        if not query: return
-        for widget in self.search_results.winfo_children(): widget.destroy()
-        conn = sqlite3.connect(self.db_path); cursor = conn.cursor()
-        cursor.execute("SELECT id, date, type, content, tags, timestamp FROM entries WHERE LOWER(content) LIKE ? OR LOWER(tags) LIKE ? ORDER BY timestamp DESC", (f'%{query}%', f'%{query}%')) # Added id
-        results = cursor.fetchall(); conn.close()
-        if not results: ctk.CTkLabel(self.search_results, text="No matching entries found.").grid(row=0, column=0, pady=20); return
-        for i, (entry_id, date, entry_type, content, tags, timestamp) in enumerate(results): # Added entry_id
-            result_frame = ctk.CTkFrame(self.search_results, corner_radius=THEME_CORNER_RADIUS-2, fg_color=self._get_current_card_fg_color()) # Use card color
-            result_frame.grid(row=i, column=0, sticky="ew", pady=5, padx=10)
-            result_frame.grid_columnconfigure(1, weight=1) # Details column
-            result_frame.grid_columnconfigure(2, weight=0) # Button column
-
-            icon = "📝" if entry_type == "text" else "🎙️"
-            ctk.CTkLabel(result_frame, text=icon, font=ctk.CTkFont(size=18)).grid(row=0, column=0, rowspan=2, padx=10, pady=5, sticky="ns")
-
-            details_inner_frame = ctk.CTkFrame(result_frame, fg_color="transparent")
-            details_inner_frame.grid(row=0, column=1, sticky="ew", pady=5, padx=5)
-            details_inner_frame.grid_columnconfigure(0, weight=1)
-
-            dt = datetime.datetime.fromisoformat(timestamp.replace('Z', '+00:00')); date_str = dt.strftime("%B %d, %Y")
-            ctk.CTkLabel(details_inner_frame, text=f"{date_str}", font=ctk.CTkFont(size=12, weight="bold")).grid(row=0, column=0, sticky="w")
-            
-            preview_content = content
-            if entry_type == "text":
-                preview_content = (content[:150] + "...") if len(content) > 150 else content
-            else: # audio
-                preview_content = f"Audio file: {Path(content).name}"
-            ctk.CTkLabel(details_inner_frame, text=preview_content, font=ctk.CTkFont(size=11), wraplength=350, anchor="w", justify="left").grid(row=1, column=0, sticky="w")
-            if tags: ctk.CTkLabel(details_inner_frame, text=f"🏷️ {tags}", font=ctk.CTkFont(size=10), text_color="gray", anchor="w").grid(row=2, column=0, sticky="w")
-
-            action_button_frame_search = ctk.CTkFrame(result_frame, fg_color="transparent")
-            action_button_frame_search.grid(row=0, column=2, rowspan=2, padx=10, pady=5, sticky="e")
-
-            if entry_type == 'text':
-                view_btn_search = ctk.CTkButton(action_button_frame_search, text="📄 View", width=60, height=THEME_BUTTON_HEIGHT-10, corner_radius=THEME_CORNER_RADIUS-2)
-                view_btn_search.configure(command=lambda current_id=entry_id: self.show_text_entry_dialog(current_id))
-                view_btn_search.pack(pady=2)
-            elif entry_type == 'audio': # Add play button for audio in search too, for consistency
-                play_btn_search = ctk.CTkButton(action_button_frame_search, text="▶️ Play", width=60, height=THEME_BUTTON_HEIGHT-10, corner_radius=THEME_CORNER_RADIUS-2)
-                # Need to ensure self.timeline_play_buttons is managed or a separate dict for search play buttons
-                # For simplicity, reusing toggle_audio_playback, but it might need adjustment if state is tied to timeline_play_buttons
-                play_btn_search.configure(command=lambda c=content, b=play_btn_search: self.toggle_audio_playback(c, b))
-                play_btn_search.pack(pady=2)
-                # If managing play button states for search results is needed, a similar dict to self.timeline_play_buttons would be required.
-                # For now, this provides the button; state management for play/stop text might need more if many audio results are played.
+    def create_playback_bar(self, row):
+        self.playback_bar = ctk.CTkFrame(self.main_frame, fg_color=self._get_current_card_fg_color(), corner_radius=THEME_CORNER_RADIUS)
+        self.playback_bar.grid(row=row, column=0, sticky="ew", padx=20, pady=(0, 10))
+        self.playback_bar.grid_columnconfigure(2, weight=1)
+        self.playback_pause_btn = ctk.CTkButton(self.playback_bar, text="⏸️", width=40, command=self.toggle_playback_pause)
+        self.playback_pause_btn.grid(row=0, column=0, padx=(10, 5), pady=8)
+        self.playback_name_label = ctk.CTkLabel(self.playback_bar, text="", font=ctk.CTkFont(size=11), width=140, anchor="w")
+        self.playback_name_label.grid(row=0, column=1, padx=5)
+        self.playback_scrubber = ctk.CTkSlider(self.playback_bar, from_=0, to=1, command=self._on_scrub)
+        self.playback_scrubber.grid(row=0, column=2, sticky="ew", padx=5)
+        self.playback_time_label = ctk.CTkLabel(self.playback_bar, text="0:00 / 0:00", font=ctk.CTkFont(size=11), width=90)
+        self.playback_time_label.grid(row=0, column=3, padx=5)
+        self.playback_speed_combo = ctk.CTkComboBox(self.playback_bar, values=["0.75x", "1x", "1.25x", "1.5x", "2x"], width=80,
+                                                    command=lambda value: self.player.set_speed(value.rstrip("x")))
+        self.playback_speed_combo.grid(row=0, column=4, padx=(5, 10))
+        self.playback_speed_combo.set(f"{self.player.speed:g}x")
+        self._scrubbing_until = 0.0
+        self.update_playback_bar()
+
+    def update_playback_bar(self):
+        if not (hasattr(self, 'playback_bar') and self.playback_bar.winfo_exists()): return
+        if not self.player.is_active: self.playback_bar.grid_remove(); return
+        self.playback_bar.grid()
+        self.playback_name_label.configure(text=Path(self.player.filepath).name)
+        self.playback_pause_btn.configure(text="▶️" if self.player.paused else "⏸️")
+        if not self._playback_poll_scheduled:
+            self._playback_poll_scheduled = True
+            self.root.after(100, self._poll_playback)
+
+    def _poll_playback(self):
+        self._playback_poll_scheduled = False
+        if self.player.is_active and hasattr(self, 'playback_bar') and self.playback_bar.winfo_exists():
+            self.player.poll()
+            self._playback_poll_scheduled = True
+            self.root.after(100, self._poll_playback)
+
+    def _show_playback_position(self, position, duration):
+        if not (hasattr(self, 'playback_bar') and self.playback_bar.winfo_exists()): return
+        fmt = lambda seconds: f"{int(seconds // 60)}:{int(seconds % 60):02d}"
+        self.playback_time_label.configure(text=f"{fmt(position)} / {fmt(duration)}")
+        if time.monotonic() >= self._scrubbing_until and duration: self.playback_scrubber.set(position / duration)
+
+    def _on_scrub(self, fraction):
+        self._scrubbing_until = time.monotonic() + 0.3 # Don't fight the user's drag with position updates
+        self.player.seek(float(fraction) * self.player.duration)
+
+    def toggle_playback_pause(self):
+        if not self.player.is_active: return
+        if self.player.paused: self.player.resume()
+        else: self.player.pause()
+        self.update_playback_bar()
+
+    def _search_typed(self, _event=None):
+        # Restart the timer on every keystroke so only a pause in typing runs a query.
+        if self._search_after_id: self.root.after_cancel(self._search_after_id)
+        self._search_after_id = self.root.after(self.SEARCH_DEBOUNCE_MS, self._debounced_search)
+
+    def _debounced_search(self):
+        self._search_after_id = None
+        self.perform_search(force=False)
+
+    def perform_search(self, force=True):
+        if self._search_after_id: self.root.after_cancel(self._search_after_id); self._search_after_id = None
+        if not self.search_entry.winfo_exists(): return
+        query = self.store.type_ahead_query(self.search_entry.get()).strip()
+        tags = list(getattr(self, 'selected_tags', ()))
+        match_all = self.tag_match_mode.get() == "All tags"
+        key = (query, tuple(tags), match_all)
+        if key == self._search_key and not force: return # e.g. an arrow key or Shift
+        self._search_key = key
+        if getattr(self, 'search_task', None): self.search_task.cancel() # Drops its result and interrupts its query if still running
+        if not query and not tags: self.show_search_results(query, ()); return
+        self.search_task = self.tasks.submit(self.store.search_ids, query, self.SEARCH_RESULT_LIMIT, tags, match_all, with_task=True,
+                                             on_success=lambda ids: self.show_search_results(query, ids),
+                                             on_error=lambda e: messagebox.showerror("Search Error", f"Could not run search: {e}", parent=self.root))
+
+    @METRICS.timed("view.show_search_results")
+    def show_search_results(self, query, ids):
+        if not self.search_list.winfo_exists(): return
+        searched = bool(query or getattr(self, 'selected_tags', ()))
+        self.search_list.empty_label.configure(text="No matching entries found." if searched else self.search_list.empty_text)
+        self.search_list.source = SearchSource(self.store, query, ids)
+        self.search_list.offset = 0
+        self.search_list.reload()
 
     def show_text_entry_dialog(self, entry_id):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
         try:
-            cursor.execute("SELECT date, content, tags, timestamp FROM entries WHERE id = ?", (entry_id,))
-            entry_data = cursor.fetchone()
+            entry_data = self.store.get_entry(entry_id)
         except sqlite3.Error as e:
             messagebox.showerror("Database Error", f"Could not fetch entry: {e}", parent=self.root)
             return
-        finally:
-            conn.close()
 
         if not entry_data:
             messagebox.showerror("Error", "Entry not found.", parent=self.root)
@@ -860,37 +1606,220 @@ class LegacyRecorder:
         dialog.grab_set() # Make dialog modal
         self.root.wait_window(dialog) # Wait for dialog to close
 
-    def export_txt(self):
+    def _export_range(self):
+        """(first_day, last_day, title, file name part) from the custom From/To dates, else the year/month pickers."""
+        start, end = self.export_from_entry.get().strip(), self.export_to_entry.get().strip()
+        if start or end:
+            parse = lambda text: int(datetime.date.fromisoformat(text).strftime("%Y%m%d"))
+            first_day, last_day = parse(start) if start else 0, parse(end) if end else 99999999
+            return first_day, last_day, f"{start or 'start'} to {end or 'today'}", f"{start or 'start'}_{end or 'today'}"
         year, month = self.year_combo.get(), self.month_combo.get()
-        conn = sqlite3.connect(self.db_path); cursor = conn.cursor()
-        query_str = "SELECT date, type, content, tags, timestamp FROM entries WHERE date LIKE ? ORDER BY timestamp"
-        params = (f'{year}%',)
+        if year == "All years": return (*EntryStore.day_range(""), "All years", "all")
+        date_prefix = year
         if month != "All":
             month_num = datetime.datetime.strptime(month, "%B").month
-            params = (f'{year}-{month_num:02d}%',)
-        cursor.execute(query_str, params)
-        entries = cursor.fetchall(); conn.close()
-        if not entries: messagebox.showinfo("No Data", "No entries found for the selected period."); return
-        export_content = f"Legacy Recorder Export\nPeriod: {month} {year}\nGenerated: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n{'='*50}\n\n"
-        for date, entry_type, content, tags, timestamp in entries:
-            dt = datetime.datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-            export_content += f"Date: {dt.strftime('%B %d, %Y at %I:%M %p')}\nType: {'Text Entry' if entry_type == 'text' else 'Audio Entry'}\n"
-            if tags: export_content += f"Tags: {tags}\n"
-            export_content += f"{'-'*30}\n{content if entry_type == 'text' else f'Audio file: {Path(content).name}'}\n\n{'='*50}\n\n"
-        filepath = filedialog.asksaveasfilename(defaultextension=".txt", filetypes=[("Text files", "*.txt")], initialname=f"legacy_export_{year}_{month}_{int(time.time())}.txt")
-        if filepath:
-            with open(filepath, 'w', encoding='utf-8') as f: f.write(export_content)
-            messagebox.showinfo("Export Complete", f"Entries exported to:\n{filepath}")
-    
-    def export_docx(self): messagebox.showinfo("Feature Coming Soon", "DOCX export will be available in the next update.\nFor now, use TXT export.")
+            date_prefix = f'{year}-{month_num:02d}'
+        return (*EntryStore.day_range(date_prefix), f"{month} {year}", f"{year}_{month}")
+
+    def export_entries(self):
+        if self._export_running(): messagebox.showinfo("Export", "An export is already running.", parent=self.root); return
+        try: first_day, last_day, period, name = self._export_range()
+        except ValueError: messagebox.showerror("Export", "Dates must be in YYYY-MM-DD format.", parent=self.root); return
+        tags = EntryStore.split_tags(self.export_tags_entry.get())
+        match_all = self.export_tag_mode.get() == "All tags"
+        if tags: period += f" (tags: {', '.join(tags)})"
+        writer_class = EXPORT_WRITERS[self.export_format_combo.get()]
+        filepath = filedialog.asksaveasfilename(defaultextension=writer_class.extension, filetypes=[(writer_class.label, f"*{writer_class.extension}")],
+                                                initialfile=f"legacy_export_{name}_{int(time.time())}{writer_class.extension}")
+        if not filepath: return
+        writer = writer_class(embed_audio=bool(self.export_embed_audio.get()))
+        self.update_status("Exporting...")
+        self.export_task = self.tasks.submit(run_export, self.store, writer, filepath, first_day, last_day, tags, match_all, period, with_task=True, lane="background",
+                          on_progress=lambda done, total: self.status_label.configure(text=f"Exporting {done}/{total}..."),
+                          on_success=lambda count: self._export_finished(filepath, count),
+                          on_error=self._export_failed)
+        self._show_export_cancel(True)
+
+    def import_folder(self):
+        folder = filedialog.askdirectory(title="Import text, Markdown and audio files from", parent=self.root)
+        if not folder: return
+        if getattr(self, 'import_task', None) and not self.import_task.future.done(): return
+        def finished(stats):
+            if self.import_btn.winfo_exists(): self.import_btn.configure(state="normal")
+            self.update_status("Import complete")
+            messagebox.showinfo("Import Complete", f"Imported {stats['text']} text and {stats['audio']} audio entries from {stats['files']} files.\n"
+                                f"{stats['duplicates']} duplicates skipped, {stats['failed']} could not be read.", parent=self.root)
+        def failed(error):
+            if self.import_btn.winfo_exists(): self.import_btn.configure(state="normal")
+            messagebox.showerror("Import Error", f"Import stopped: {error}\nRun it again to resume.", parent=self.root)
+        self.import_btn.configure(state="disabled")
+        self.update_status("Importing...")
+        importer = BulkImporter(self.store, self.entries_dir, self.text_mirror)
+        self.import_task = self.tasks.submit(importer.run, [folder], with_task=True, lane="background", on_success=finished, on_error=failed,
+                                             on_progress=lambda done, total: self.status_label.configure(text=f"Importing {done}/{total}..."))
+
+    def _export_running(self):
+        task = getattr(self, 'export_task', None)
+        return bool(task and not task.cancelled and not task.future.done())
+
+    def _show_export_cancel(self, visible):
+        btn = getattr(self, 'export_cancel_btn', None)
+        if btn and btn.winfo_exists(): btn.grid() if visible else btn.grid_remove()
+
+    def cancel_export(self):
+        if self._export_running(): self.export_task.cancel()
+        self._show_export_cancel(False)
+        self.update_status("Export cancelled")
+
+    def _export_failed(self, error):
+        self._show_export_cancel(False)
+        self.update_status("Export failed")
+        messagebox.showerror("Export Error", f"Could not export entries: {error}", parent=self.root)
+
+    def _export_finished(self, filepath, count):
+        self._show_export_cancel(False)
+        if not count: self.update_status("Nothing to export"); messagebox.showinfo("No Data", "No entries found for the selected period."); return
+        self.update_status("Export complete")
+        messagebox.showinfo("Export Complete", f"Entries exported to:\n{filepath}")
     
     def save_user_settings(self):
         self.settings["reminders_enabled"] = self.reminders_switch.get()
         self.settings["font_size"] = int(self.font_slider.get())
+        self.settings["audio_codec"] = self.codec_combo.get()
+        self.settings["daily_backup"] = bool(self.backup_switch.get())
+        self._read_transcription_settings()
         self.save_settings()
         messagebox.showinfo("Settings Saved", "Your settings have been saved successfully!")
         self.setup_scheduler()
     
+    def start_backup(self, quiet=False):
+        if getattr(self, 'backup_task', None) and not self.backup_task.future.done(): return
+        def run(task):
+            stats = self.backups.backup(task)
+            stats["pruned_chunks"] = self.backups.prune(self.settings["backups_to_keep"])
+            return stats
+        def finished(stats):
+            self._set_backup_busy(False)
+            saved = f"{stats['bytes_written'] / 1048576:.1f} MB new"
+            self.update_status(f"Backup {stats['snapshot']} complete ({stats['files']} files, {saved})")
+            if hasattr(self, 'snapshot_combo') and self.snapshot_combo.winfo_exists():
+                snapshots = self.backups.snapshots(); self.snapshot_combo.configure(values=snapshots); self.snapshot_combo.set(snapshots[0])
+            if not quiet: messagebox.showinfo("Backup Complete", f"Snapshot {stats['snapshot']} saved.\n{stats['files']} files, {stats['reused']} unchanged, {saved}.", parent=self.root)
+        def failed(error):
+            self._set_backup_busy(False)
+            self.update_status("Backup failed")
+            messagebox.showerror("Backup Error", f"Backup failed: {error}", parent=self.root)
+        self._set_backup_busy(True)
+        self.update_status("Backing up...")
+        self.backup_task = self.tasks.submit(run, with_task=True, lane="background", on_success=finished, on_error=failed,
+                                             on_progress=lambda done, total: self.update_status(f"Backing up {done}/{total} files..."))
+
+    def _set_backup_busy(self, busy):
+        if hasattr(self, 'backup_btn') and self.backup_btn.winfo_exists(): self.backup_btn.configure(state="disabled" if busy else "normal")
+
+    def restore_snapshot(self):
+        snapshot_id = self.snapshot_combo.get()
+        if snapshot_id not in self.backups.snapshots(): return
+        if not messagebox.askyesno("Restore Snapshot", f"Restore your journal to snapshot {snapshot_id}?\n\nThe current state is backed up first; entries made since the snapshot are removed. "
+                                   "The restore is verified now and applied the next time Legacy Recorder starts.", parent=self.root): return
+        def finished(count):
+            self.update_status("Restore staged")
+            messagebox.showinfo("Restore Ready", f"{count} files from {snapshot_id} verified and staged.\nRestart Legacy Recorder to complete the restore.", parent=self.root)
+        self.update_status("Preparing restore...")
+        # The safety snapshot taken first means the restore can itself be undone.
+        self.tasks.submit(self.backups.prepare_restore, snapshot_id, with_task=True, lane="background", on_success=finished,
+                          on_error=lambda e: (self.update_status("Restore failed"), messagebox.showerror("Restore Error", str(e), parent=self.root)))
+
+    def browse_transcription_model(self):
+        # Vosk models are folders, whisper.cpp models single ggml files.
+        if self.transcription_backend_combo.get() == "vosk": path = filedialog.askdirectory(title="Vosk model folder", parent=self.root)
+        else: path = filedialog.askopenfilename(title="whisper.cpp model", filetypes=[("ggml model", "*.bin"), ("All files", "*.*")], parent=self.root)
+        if path: self.transcription_model_entry.delete(0, "end"); self.transcription_model_entry.insert(0, path)
+
+    def _read_transcription_settings(self):
+        if self.transcription_backend_combo.get() in transcribe_services.BACKENDS: self.settings["transcription_backend"] = self.transcription_backend_combo.get()
+        self.settings["transcription_model"] = self.transcription_model_entry.get().strip()
+        self.settings["transcription_auto"] = bool(self.transcription_auto_switch.get())
+
+    def transcribe_recordings(self, entry_ids=None, quiet=False):
+        """Queue untranscribed recordings (or `entry_ids`, ahead of the rest) and work through the queue in worker processes.
+        Entries queued while a run is going are picked up by that run."""
+        if hasattr(self, 'transcription_model_entry') and self.transcription_model_entry.winfo_exists():
+            self._read_transcription_settings(); self.save_settings()
+        running = getattr(self, 'transcription_task', None) is not None
+        def start():
+            self.store.enqueue_transcriptions(entry_ids, priority=10 if entry_ids else 0)
+            if running: return None
+            return transcribe_services.TranscriptionQueue(self.store, self.settings["transcription_backend"], self.settings["transcription_model"],
+                                                          self.settings["transcription_workers"])
+        if running: self.tasks.submit(start, lane="background", on_error=lambda e: print(f"Could not queue transcriptions: {e}")); return
+        if not self.settings["transcription_model"]:
+            if not quiet: messagebox.showinfo("Transcription", "Choose a speech model first.", parent=self.root)
+            return
+        self._set_transcription_busy(True)
+        self.update_status("Transcribing recordings...")
+        def started(queue):
+            self.transcription_queue = queue
+            self._transcription_step(quiet)
+        self.transcription_task = self.tasks.submit(start, lane="background", on_success=started,
+                                                    on_error=lambda e: self._transcription_done(quiet, error=e))
+
+    def _transcription_step(self, quiet):
+        # One short step per submission, so a run that takes hours still hands its background worker back between
+        # batches and other long jobs queued behind it get their turn.
+        queue = self.transcription_queue
+        def stepped(more):
+            if task is not self.transcription_task: return
+            if more: self._transcription_step(quiet)
+            else: self._transcription_done(quiet, stats=queue.stats)
+        task = self.transcription_task = self.tasks.submit(queue.step, with_task=True, lane="background", on_success=stepped,
+                                                           on_error=lambda e: self._transcription_done(quiet, error=e),
+                                                           on_progress=lambda done, total: self.status_label.configure(text=f"Transcribing {done}/{total}..."))
+
+    def _transcription_done(self, quiet, stats=None, error=None):
+        self.stop_transcription(report=False)
+        if stats is not None:
+            self.update_status(f"Transcribed {stats['transcribed']} recording(s)" + (f", {stats['failed']} failed" if stats["failed"] else ""))
+            if not quiet: messagebox.showinfo("Transcription", f"Transcribed {stats['transcribed']} recording(s)." +
+                                              (f"\n{stats['failed']} could not be transcribed." if stats["failed"] else ""), parent=self.root)
+        else:
+            self.update_status("Transcription stopped")
+            if not quiet: messagebox.showerror("Transcription", f"Transcription stopped: {error}", parent=self.root)
+            else: print(f"Transcription stopped: {error}")
+
+    def stop_transcription(self, report=True):
+        # Neither cancelling nor closing waits: the worker processes are dropped and unsaved batches stay queued.
+        task, self.transcription_task = getattr(self, 'transcription_task', None), None
+        queue, self.transcription_queue = getattr(self, 'transcription_queue', None), None
+        if task is not None: task.cancel()
+        if queue is not None: queue.close()
+        self._set_transcription_busy(False)
+        if report and task is not None: self.update_status("Transcription stopped")
+
+    def _set_transcription_busy(self, busy):
+        if hasattr(self, 'transcribe_btn') and self.transcribe_btn.winfo_exists():
+            self.transcribe_btn.configure(text="⏹️ Stop Transcribing" if busy else "📝 Transcribe Recordings",
+                                          command=self.stop_transcription if busy else self.transcribe_recordings)
+
+    def transcode_existing_audio(self):
+        codec = self.codec_combo.get()
+        if codec == "wav": messagebox.showinfo("Compress Recordings", "Choose FLAC or Opus as the audio format first.", parent=self.root); return
+        if getattr(self, 'transcode_task', None) and not self.transcode_task.future.done(): return
+        self.transcode_btn.configure(state="disabled")
+        self.update_status("Compressing recordings...")
+        def finished(stats):
+            if self.transcode_btn.winfo_exists(): self.transcode_btn.configure(state="normal")
+            self.update_status("Compression complete")
+            message = f"Compressed {stats['files']} recording(s), saving {stats['bytes_saved'] / (1024 * 1024):.1f} MB."
+            if stats["failed"]: message += f"\n{stats['failed']} file(s) could not be converted and were left as WAV."
+            messagebox.showinfo("Compress Recordings", message, parent=self.root)
+        def failed(error):
+            if self.transcode_btn.winfo_exists(): self.transcode_btn.configure(state="normal")
+            messagebox.showerror("Compress Recordings", f"Compression stopped: {error}", parent=self.root)
+        self.transcode_task = self.tasks.submit(audio_services.AudioTranscoder(self.store, codec).run, with_task=True, lane="background",
+                                                on_success=finished, on_error=failed,
+                                                on_progress=lambda done, total: self.status_label.configure(text=f"Compressing {done}/{total}..."))
+
     def toggle_theme(self):
         current_mode = ctk.get_appearance_mode().lower()
         new_mode = "light" if current_mode == "dark" else "dark"
@@ -913,17 +1842,22 @@ class LegacyRecorder:
             self.load_dashboard_stats() 
         
         if hasattr(self, 'timeline_frame') and self.timeline_frame.winfo_exists(): 
-            self.create_timeline_activity_chart() # Recreate for theme
-            self.load_timeline_entries() # Re-style entries
+            self.update_timeline_activity_chart() # Re-colour bars for theme
+            self.timeline_frame.for_each_row(lambda row: row.configure(fg_color=self._get_current_card_fg_color()))
 
     def setup_scheduler(self):
+        from apscheduler.schedulers.background import BackgroundScheduler
+        from apscheduler.triggers.cron import CronTrigger
         if hasattr(self, 'scheduler') and self.scheduler.running: self.scheduler.shutdown()
-        if not self.settings["reminders_enabled"]: return
         self.scheduler = BackgroundScheduler()
-        m_time, e_time = self.settings["morning_reminder"].split(":"), self.settings["evening_reminder"].split(":")
-        self.scheduler.add_job(self.show_reminder, CronTrigger(hour=int(m_time[0]), minute=int(m_time[1])), args=["Good morning! Time to record your thoughts and reflections."], id="morning_reminder")
-        self.scheduler.add_job(self.show_reminder, CronTrigger(hour=int(e_time[0]), minute=int(e_time[1])), args=["Good evening! Take a moment to reflect on your day."], id="evening_reminder")
-        self.scheduler.start()
+        if self.settings["reminders_enabled"]:
+            m_time, e_time = self.settings["morning_reminder"].split(":"), self.settings["evening_reminder"].split(":")
+            self.scheduler.add_job(self.show_reminder, CronTrigger(hour=int(m_time[0]), minute=int(m_time[1])), args=["Good morning! Time to record your thoughts and reflections."], id="morning_reminder")
+            self.scheduler.add_job(self.show_reminder, CronTrigger(hour=int(e_time[0]), minute=int(e_time[1])), args=["Good evening! Take a moment to reflect on your day."], id="evening_reminder")
+        if self.settings["daily_backup"]:
+            b_time = self.settings["backup_time"].split(":")
+            self.scheduler.add_job(lambda: self.tasks.call_soon(self.start_backup, True), CronTrigger(hour=int(b_time[0]), minute=int(b_time[1])), id="daily_backup")
+        if self.scheduler.get_jobs(): self.scheduler.start()
     
     def show_reminder(self, message):
         def show_notification():
@@ -931,11 +1865,13 @@ class LegacyRecorder:
             except IOError: font = ImageFont.load_default()
             image = Image.new('RGB', (64, 64), color='blue'); draw = ImageDraw.Draw(image)
             draw.text((10, 20), "LR", fill='white', font=font) # Adjusted text position
-            menu = pystray.Menu(pystray.MenuItem("Open Legacy Recorder", self.bring_to_front), pystray.MenuItem("Dismiss", lambda: None))
+            menu = pystray.Menu(pystray.MenuItem("Open Legacy Recorder", lambda: self.tasks.call_soon(self.bring_to_front)), pystray.MenuItem("Dismiss", lambda: None))
             icon = pystray.Icon("Legacy Recorder", image, menu=menu)
             icon.notify(message, "Legacy Recorder Reminder")
-        if self.root.winfo_viewable(): messagebox.showinfo("Reminder", message)
-        else: threading.Thread(target=show_notification, daemon=True).start()
+        def show_on_gui_thread():
+            if self.root.winfo_viewable(): messagebox.showinfo("Reminder", message)
+            else: threading.Thread(target=show_notification, daemon=True).start()
+        self.tasks.call_soon(show_on_gui_thread) # Called from the scheduler thread
     
     def bring_to_front(self):
         self.root.deiconify(); self.root.lift(); self.root.focus_force()
@@ -955,7 +1891,7 @@ class LegacyRecorder:
         if hasattr(self, 'scheduler') and self.scheduler.running: self.scheduler.shutdown()
         result = messagebox.askyesnocancel("Legacy Recorder", "Minimize to system tray to keep reminders active?\n\nYes = Minimize | No = Close | Cancel = Stay", parent=self.root )
         if result is True: self.root.withdraw(); self.create_system_tray()
-        elif result is False: self.stop_current_audio_playback(); self.root.destroy()
+        elif result is False: self.stop_current_audio_playback(); self.stop_transcription(report=False); self.tasks.shutdown(timeout=self.SHUTDOWN_TIMEOUT); self.text_mirror.flush(); self.store.close(); self.root.destroy()
     
     def create_system_tray(self):
         def create_tray():
@@ -964,11 +1900,12 @@ class LegacyRecorder:
             image = Image.new('RGB', (64, 64), color='blue'); draw = ImageDraw.Draw(image)
             bbox = draw.textbbox((0,0), "LR", font=font); w, h = bbox[2]-bbox[0], bbox[3]-bbox[1]
             draw.text(((64-w)/2, (64-h)/2), "LR", fill='white', font=font)
+            # Menu callbacks run on the tray thread; hand them to the Tk thread.
             menu = pystray.Menu(
-                pystray.MenuItem("Open", self.bring_to_front),
-                pystray.MenuItem("New Entry", lambda: self.bring_to_front_and_show('entry')),
-                pystray.MenuItem("Record Audio", lambda: self.bring_to_front_and_show('audio')),
-                pystray.MenuItem("Quit", self.quit_from_tray)
+                pystray.MenuItem("Open", lambda: self.tasks.call_soon(self.bring_to_front)),
+                pystray.MenuItem("New Entry", lambda: self.tasks.call_soon(self.bring_to_front_and_show, 'entry')),
+                pystray.MenuItem("Record Audio", lambda: self.tasks.call_soon(self.bring_to_front_and_show, 'audio')),
+                pystray.MenuItem("Quit", lambda: self.tasks.call_soon(self.quit_from_tray))
             )
             self.tray_icon = pystray.Icon("Legacy Recorder", image, "Legacy Recorder", menu)
             self.tray_icon.run()
@@ -983,16 +1920,19 @@ class LegacyRecorder:
         self.stop_current_audio_playback() 
         if hasattr(self, 'tray_icon') and self.tray_icon: self.tray_icon.stop()
         if hasattr(self, 'scheduler') and self.scheduler.running: self.scheduler.shutdown()
+        self.stop_transcription(report=False)
+        self.tasks.shutdown(timeout=self.SHUTDOWN_TIMEOUT)
+        self.text_mirror.flush()
+        self.store.close()
         self.root.destroy() # Changed from self.root.quit() for cleaner exit
     
     def run(self): self.root.mainloop()
 
 def check_requirements():
+    # find_spec locates packages without importing them, so the check doesn't undo the deferred imports.
+    from importlib.util import find_spec
     required = ['customtkinter', 'sounddevice', 'scipy', 'numpy', 'apscheduler', 'pystray', 'pillow']
-    missing = []
-    for pkg in required:
-        try: __import__('PIL' if pkg == 'pillow' else pkg)
-        except ImportError: missing.append(pkg)
+    missing = [pkg for pkg in required if find_spec('PIL' if pkg == 'pillow' else pkg) is None]
     if missing:
         print(f"Missing required packages: {', '.join(missing)}\nInstall with: pip install {' '.join(missing)}")
         return False
@@ -85,9 +85,9 @@ def main():
     print("Setting up Legacy Recorder - Your personal journaling companion")
     print()
     
-    # Check Python version - FIXED: Changed from 3.12.0 to 3.8.0
-    if sys.version_info < (3, 8, 0):
-        print("❌ Python 3.8 or higher is required")
+    # Check Python version - 3.9 for Executor.shutdown(cancel_futures=True), which cancelling imports and jobs relies on
+    if sys.version_info < (3, 9, 0):
+        print("❌ Python 3.9 or higher is required")
         print(f"Current version: {sys.version}")
         input("Press Enter to exit...")
         return